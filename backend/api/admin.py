@@ -1,22 +1,141 @@
+import json
+
 from django.contrib import admin
+from django.contrib.admin.views.main import ChangeList
 from django.contrib.auth.models import User
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Count, OuterRef, Q, Subquery
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Coalesce, Length, Lower, Substr
+from django.utils import timezone
+from django.utils.functional import cached_property
 from django.utils.html import format_html
-from django.db.models import Count
-from .models import UserProfile, Chat, ChatSession
+from .ai_service import ai_service
+from .models import UserProfile, Chat, ChatSession, Job
+from .search import matching_ids_sql, query_terms, supported as search_supported
+from .usage import cached_usage_summary
+
+PREVIEW_LENGTH = 50
+
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator that trusts the planner's row estimate for large result sets.
+
+    On PostgreSQL the changelist count comes from ``EXPLAIN`` instead of a
+    full ``COUNT(*)`` once the estimate passes ``exact_count_threshold``;
+    smaller results (and other databases) still get an exact count.
+    """
+
+    exact_count_threshold = 10000
+
+    def _estimate(self):
+        queryset = self.object_list
+        if connections[queryset.db].vendor != 'postgresql':
+            return None
+        try:
+            plan = json.loads(queryset.order_by().explain(format='json'))
+            return int(plan[0]['Plan']['Plan Rows'])
+        except Exception:
+            return None
+
+    @cached_property
+    def count(self):
+        estimate = self._estimate()
+        if estimate is not None and estimate >= self.exact_count_threshold:
+            return estimate
+        return super().count
+
+
+class IndexedSearchMixin:
+    """Restrict admin search to indexed lookups: exact id, username or email.
+
+    Emails match case-insensitively through the ``LOWER(email)`` index of
+    migration 0008. Substring search over message or summary text cannot
+    use an index and scans the whole table, so it is not offered here.
+    """
+
+    search_fields = ('user__username', 'user__email')
+    search_help_text = 'Search by id, exact username or exact email'
+
+    def get_search_results(self, request, queryset, search_term):
+        term = search_term.strip()
+        if not term:
+            return queryset, False
+        # Resolve the user first so both branches stay on indexed columns
+        # of this table (an OR across the user join cannot use an index)
+        users = User.objects.filter(username=term)
+        if '@' in term:
+            users = users | User.objects.alias(email_lower=Lower('email')).filter(email_lower=term.lower())
+        user_ids = list(users.values_list('pk', flat=True))
+        condition = Q(user_id__in=user_ids)
+        if term.isdigit():
+            condition |= Q(pk=int(term))
+        return queryset.filter(condition), False
+
+
+class ModelFilter(admin.SimpleListFilter):
+    """Model filter built from the configured catalogue instead of ``SELECT DISTINCT``."""
+
+    title = 'model'
+    parameter_name = 'model'
+
+    def lookups(self, request, model_admin):
+        return [(model['id'], model['name']) for model in ai_service.available_models]
+
+    def queryset(self, request, queryset):
+        if self.value():
+            return queryset.filter(model=self.value())
+        return queryset
+
+
+class FallbackFilter(admin.SimpleListFilter):
+    """Whether the Hugging Face fallback answered instead of OpenRouter."""
+
+    title = 'fallback'
+    parameter_name = 'fallback'
+
+    def lookups(self, request, model_admin):
+        return [('yes', 'Yes'), ('no', 'No')]
+
+    def queryset(self, request, queryset):
+        if self.value() == 'yes':
+            return queryset.exclude(fallback_reason='')
+        if self.value() == 'no':
+            return queryset.filter(fallback_reason='')
+        return queryset
+
+
+class ChatChangeList(ChangeList):
+    def get_queryset(self, request):
+        # The list only shows a preview, so leave the full texts in the database
+        return super().get_queryset(request).defer('user_message', 'ai_response').annotate(
+            preview=Substr('user_message', 1, PREVIEW_LENGTH),
+            message_length=Length('user_message'),
+        )
 
 
 @admin.register(UserProfile)
-class UserProfileAdmin(admin.ModelAdmin):
+class UserProfileAdmin(IndexedSearchMixin, admin.ModelAdmin):
     list_display = ('id', 'user', 'user_email', 'language_preference', 'chat_count', 'session_count', 'created_at')
     list_filter = ('language_preference', 'created_at', 'summary_updated_at')
-    search_fields = ('user__username', 'user__email', 'ai_summary')
-    readonly_fields = ['created_at', 'updated_at', 'summary_updated_at', 'get_profile_summary']
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    raw_id_fields = ['user']
+    readonly_fields = [
+        'created_at', 'updated_at', 'summary_updated_at', 'get_profile_summary',
+        'total_chats', 'model_counts', 'last_chat_at'
+    ]
     list_select_related = ['user']
     
     fieldsets = (
         ('User Information', {
             'fields': ('user', 'language_preference')
         }),
+        ('Chat Counters', {
+            'fields': ('total_chats', 'model_counts', 'last_chat_at'),
+            'classes': ('collapse',)
+        }),
         ('AI Summary', {
             'fields': ('ai_summary', 'summary_updated_at'),
             'classes': ('wide',)
@@ -38,16 +157,24 @@ class UserProfileAdmin(admin.ModelAdmin):
     user_email.admin_order_field = 'user__email'
     
     def chat_count(self, obj):
-        count = obj.user.chats.count()
-        return format_html('<strong>{}</strong>', count)
+        return format_html('<strong>{}</strong>', obj.total_chats)
     
     chat_count.short_description = 'Total Chats'
+    chat_count.admin_order_field = 'total_chats'
     
     def session_count(self, obj):
-        count = obj.user.chat_sessions.count()
-        return format_html('<strong>{}</strong>', count)
+        return format_html('<strong>{}</strong>', obj.session_total)
     
     session_count.short_description = 'Sessions'
+    session_count.admin_order_field = 'session_total'
+
+    def get_queryset(self, request):
+        # Correlated subquery: only evaluated for the rows on the current page
+        sessions = (
+            ChatSession.objects.filter(user_id=OuterRef('user_id'))
+            .order_by().values('user_id').annotate(total=Count('*')).values('total')
+        )
+        return super().get_queryset(request).annotate(session_total=Coalesce(Subquery(sessions), 0))
     
     # Simplified get_profile_summary method
 
@@ -55,8 +182,8 @@ class UserProfileAdmin(admin.ModelAdmin):
         if not obj.pk:
             return "Save profile to see summary"
         
-        total_chats = obj.user.chats.count()
-        total_sessions = obj.user.chat_sessions.count()
+        total_chats = obj.total_chats
+        total_sessions = obj.session_total
         
         # Simple text summary instead of complex HTML
         summary = f"""
@@ -74,46 +201,82 @@ class UserProfileAdmin(admin.ModelAdmin):
 
 
 @admin.register(Chat)
-class ChatAdmin(admin.ModelAdmin):
-    list_display = ('id', 'user', 'model', 'language', 'created_at', 'message_preview')
-    list_filter = ('model', 'language', 'created_at')
-    search_fields = ('user__username', 'user_message', 'ai_response')
-    readonly_fields = ['created_at']
+class ChatAdmin(IndexedSearchMixin, admin.ModelAdmin):
+    list_display = ('id', 'user', 'model', 'provider', 'latency', 'language', 'created_at', 'message_preview')
+    # No date_hierarchy: its date drill-down scans the whole chats table
+    list_filter = (ModelFilter, 'provider', FallbackFilter, 'language', 'created_at')
+    readonly_fields = [
+        'created_at', 'provider', 'upstream_latency_ms', 'prompt_tokens', 'completion_tokens', 'fallback_reason'
+    ]
+    raw_id_fields = ['user', 'session']
     list_select_related = ['user']
-    date_hierarchy = 'created_at'
+    # Newest first through the primary key index
+    ordering = ('-id',)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    search_help_text = 'Search by id, exact username or email, or message words'
     
     fieldsets = (
         ('Chat Information', {
-            'fields': ('user', 'model', 'language')
+            'fields': ('user', 'model', 'language', 'session')
         }),
         ('Conversation', {
             'fields': ('user_message', 'ai_response'),
             'classes': ('wide',)
         }),
+        ('Upstream', {
+            'fields': ('provider', 'upstream_latency_ms', 'prompt_tokens', 'completion_tokens', 'fallback_reason'),
+            'classes': ('collapse',)
+        }),
         ('Metadata', {
             'fields': ('created_at',),
             'classes': ('collapse',)
         }),
     )
 
+    def get_changelist(self, request, **kwargs):
+        return ChatChangeList
+
+    def changelist_view(self, request, extra_context=None):
+        # Last day's totals above the list (see templates/admin/api/chat/change_list.html),
+        # recomputed at most every USAGE_CACHE_TTL seconds
+        extra_context = {**(extra_context or {}), 'usage': cached_usage_summary()}
+        return super().changelist_view(request, extra_context=extra_context)
+
+    def get_search_results(self, request, queryset, search_term):
+        results, may_have_duplicates = super().get_search_results(request, queryset, search_term)
+        terms = query_terms(search_term)
+        if terms and search_supported():
+            # Message words go through the full-text index, not a LIKE scan
+            results |= queryset.filter(pk__in=RawSQL(*matching_ids_sql(terms)))
+        return results, may_have_duplicates
+
     def message_preview(self, obj):
-        return obj.user_message[:50] + '...' if len(obj.user_message) > 50 else obj.user_message
+        return obj.preview + '...' if obj.message_length > PREVIEW_LENGTH else obj.preview
     
     message_preview.short_description = 'Message Preview'
 
+    def latency(self, obj):
+        return f'{obj.upstream_latency_ms} ms' if obj.upstream_latency_ms is not None else '-'
+
+    latency.short_description = 'Latency'
+    latency.admin_order_field = 'upstream_latency_ms'
+
 
 @admin.register(ChatSession)
-class ChatSessionAdmin(admin.ModelAdmin):
-    list_display = ('id', 'user', 'get_title_display', 'created_at', 'updated_at')
+class ChatSessionAdmin(IndexedSearchMixin, admin.ModelAdmin):
+    list_display = ('id', 'user', 'get_title_display', 'message_count', 'created_at', 'updated_at')
     list_filter = ('created_at', 'updated_at')
-    search_fields = ('user__username', 'title', 'id')  # Added 'id' to search
-    readonly_fields = ['created_at', 'updated_at', 'get_session_summary']
+    readonly_fields = ['created_at', 'updated_at', 'message_count', 'get_session_summary']
+    raw_id_fields = ['user']
     list_select_related = ['user']
-    date_hierarchy = 'created_at'
+    ordering = ('-id',)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     
     fieldsets = (
         ('Session Information', {
-            'fields': ('user', 'title')
+            'fields': ('user', 'title', 'message_count')
         }),
         ('Session Summary', {
             'fields': ('get_session_summary',),
@@ -154,13 +317,28 @@ class ChatSessionAdmin(admin.ModelAdmin):
                 <p style="margin: 8px 0;"><strong>Created:</strong> {obj.created_at.strftime('%Y-%m-%d %H:%M:%S')}</p>
                 <p style="margin: 8px 0;"><strong>Last Updated:</strong> {obj.updated_at.strftime('%Y-%m-%d %H:%M:%S')}</p>
                 <p style="margin: 8px 0;"><strong>Duration:</strong> {days} day{'s' if days != 1 else ''}, {hours} hour{'s' if hours != 1 else ''}, {minutes} minute{'s' if minutes != 1 else ''}</p>
-            </div>
-            
-            <div style="background: #d1ecf1; padding: 10px; border-radius: 6px; margin-top: 15px; border-left: 4px solid #0c5460;">
-                <strong>ℹ️ Note:</strong> Add a ForeignKey relationship from Chat to ChatSession to track chats within this session.
+                <p style="margin: 8px 0;"><strong>Messages:</strong> {obj.message_count}</p>
             </div>
         </div>
         """
         return format_html(html)
     
-    get_session_summary.short_description = 'Session Summary'
\ No newline at end of file
+    get_session_summary.short_description = 'Session Summary'
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'kind', 'user', 'status', 'progress', 'attempts', 'created_at', 'finished_at')
+    list_filter = ('status', 'kind')
+    list_select_related = ['user']
+    raw_id_fields = ['user']
+    ordering = ('-id',)
+    readonly_fields = ['created_at', 'finished_at', 'locked_by', 'locked_at', 'result', 'error']
+    actions = ['requeue']
+
+    @admin.action(description='Re-queue selected jobs')
+    def requeue(self, request, queryset):
+        updated = queryset.exclude(status=Job.RUNNING).update(
+            status=Job.QUEUED, attempts=0, error='', run_after=timezone.now(), finished_at=None,
+        )
+        self.message_user(request, f'{updated} job(s) re-queued.')
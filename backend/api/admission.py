@@ -0,0 +1,398 @@
+import os
+import math
+import time
+import asyncio
+import logging
+import threading
+from collections import defaultdict, deque
+from email.utils import parsedate_to_datetime
+from typing import Any, Dict, Iterable, List, Optional
+
+from django.utils import timezone
+
+from . import metrics
+
+logger = logging.getLogger('api.admission')
+
+# Weight of the newest call in the running average of how long a slot is held
+_HOLD_SMOOTHING = 0.2
+
+
+class AdmissionRejected(Exception):
+    """The upstream call would wait longer than the queue budget allows.
+
+    ``retry_after`` is the estimated wait in whole seconds (at least 1).
+    """
+
+    def __init__(self, retry_after: int, reason: str):
+        super().__init__(f"Upstream busy ({reason}); retry after {retry_after}s")
+        self.retry_after = retry_after
+        self.reason = reason
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Seconds from a ``Retry-After`` header (delta-seconds or HTTP date)."""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        return max(0.0, (parsedate_to_datetime(value) - timezone.now()).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+
+class _Limit:
+    """Concurrency cap and token bucket of one provider or model key.
+
+    A cap or rate of 0 means unlimited.
+    """
+
+    def __init__(self, key: str, max_concurrent: int, rate: float, burst: float):
+        self.key = key
+        self.max_concurrent = max_concurrent
+        self.rate = rate
+        self.burst = max(1.0, burst)
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+        self.in_flight = 0
+        self.waiting = 0
+        self.paused_until = 0.0
+        self.hold_seconds: Optional[float] = None
+        self.admitted = 0
+        self.rejected = 0
+
+    def _refill(self, now: float):
+        if self.rate:
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def ready(self, now: float) -> bool:
+        self._refill(now)
+        if now < self.paused_until:
+            return False
+        if self.max_concurrent and self.in_flight >= self.max_concurrent:
+            return False
+        return not self.rate or self.tokens >= 1
+
+    def take(self, now: float):
+        self._refill(now)
+        if self.rate:
+            self.tokens -= 1
+        self.in_flight += 1
+        self.admitted += 1
+
+    def give_back(self, held: float):
+        self.in_flight -= 1
+        if self.hold_seconds is None:
+            self.hold_seconds = held
+        else:
+            self.hold_seconds += _HOLD_SMOOTHING * (held - self.hold_seconds)
+
+    def retry_in(self, now: float) -> float:
+        """Seconds until time alone can make this limit ready (inf: needs a release)."""
+        self._refill(now)
+        wait = max(0.0, self.paused_until - now)
+        if self.rate and self.tokens < 1:
+            wait = max(wait, (1 - self.tokens) / self.rate)
+        if self.max_concurrent and self.in_flight >= self.max_concurrent:
+            return math.inf
+        return wait
+
+    def estimate_wait(self, now: float, ahead: int) -> float:
+        """Expected wait of a request queued behind ``ahead`` others."""
+        self._refill(now)
+        wait = max(0.0, self.paused_until - now)
+        if self.rate:
+            wait = max(wait, (ahead + 1 - self.tokens) / self.rate)
+        if self.max_concurrent and self.in_flight + ahead >= self.max_concurrent:
+            rounds = (self.in_flight + ahead - self.max_concurrent) // self.max_concurrent + 1
+            wait = max(wait, rounds * (self.hold_seconds or 0.0))
+        return wait
+
+    def snapshot(self, now: float) -> Dict[str, Any]:
+        self._refill(now)
+        return {
+            'in_flight': self.in_flight,
+            'waiting': self.waiting,
+            'max_concurrent': self.max_concurrent,
+            'rate': self.rate,
+            'tokens': round(self.tokens, 2) if self.rate else None,
+            'paused_for_seconds': round(max(0.0, self.paused_until - now), 1),
+            'avg_hold_seconds': round(self.hold_seconds, 3) if self.hold_seconds is not None else None,
+            'admitted': self.admitted,
+            'rejected': self.rejected,
+        }
+
+
+class _Ticket:
+    __slots__ = ('user', 'limits', 'granted', 'event', 'loop', 'future')
+
+    def __init__(self, user, limits: List[_Limit], loop=None):
+        self.user = user
+        self.limits = limits
+        self.granted = False
+        self.loop = loop
+        self.event = None if loop else threading.Event()
+        self.future = loop.create_future() if loop else None
+
+    def wake(self):
+        if self.loop is None:
+            self.event.set()
+        else:
+            self.loop.call_soon_threadsafe(self._resolve)
+
+    def _resolve(self):
+        if not self.future.done():
+            self.future.set_result(None)
+
+
+class Permit:
+    """An admitted upstream call; release it (or leave the ``with`` block) when done."""
+
+    def __init__(self, admission: Optional['Admission'] = None, ticket: Optional[_Ticket] = None):
+        self._admission = admission
+        self._ticket = ticket
+        self._started = time.monotonic()
+
+    def release(self):
+        if self._ticket is not None:
+            ticket, self._ticket = self._ticket, None
+            self._admission._release(ticket, time.monotonic() - self._started)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+class Admission:
+    """Admission control for upstream AI calls, per worker process.
+
+    Every call needs a slot and a token from each of its keys: the provider
+    (``openrouter``) and the model (``openrouter:<model id>``), same as the
+    circuit breakers. Waiting calls are served round-robin across users, so
+    a user with many requests in flight cannot starve the others, and no
+    user has more than ``AI_ADMISSION_USER_CONCURRENCY`` calls upstream. A
+    provider ``Retry-After`` pauses the keys of the call that received it.
+    A call whose estimated or actual wait exceeds ``AI_ADMISSION_MAX_WAIT``
+    seconds, or that finds ``AI_ADMISSION_MAX_QUEUE`` calls waiting, raises
+    :class:`AdmissionRejected`. Configure with:
+
+    - ``AI_ADMISSION_ENABLED``: master switch (default on)
+    - ``AI_ADMISSION_PROVIDER_CONCURRENCY`` / ``AI_ADMISSION_MODEL_CONCURRENCY``: slots per key
+    - ``AI_ADMISSION_PROVIDER_RATE`` / ``AI_ADMISSION_MODEL_RATE``: tokens per second (0 = no bucket)
+    - ``AI_ADMISSION_PROVIDER_BURST`` / ``AI_ADMISSION_MODEL_BURST``: bucket size
+    - ``AI_ADMISSION_USER_CONCURRENCY``: upstream calls per user (0 = unlimited)
+    - ``AI_ADMISSION_MAX_WAIT`` / ``AI_ADMISSION_MAX_QUEUE``: queueing budget
+    """
+
+    def __init__(self):
+        self.enabled = os.getenv('AI_ADMISSION_ENABLED', 'True').lower() in ('1', 'true', 'yes')
+        self.provider_config = {
+            'max_concurrent': int(os.getenv('AI_ADMISSION_PROVIDER_CONCURRENCY', '32')),
+            'rate': float(os.getenv('AI_ADMISSION_PROVIDER_RATE', '0')),
+            'burst': float(os.getenv('AI_ADMISSION_PROVIDER_BURST', '20')),
+        }
+        self.model_config = {
+            'max_concurrent': int(os.getenv('AI_ADMISSION_MODEL_CONCURRENCY', '8')),
+            'rate': float(os.getenv('AI_ADMISSION_MODEL_RATE', '0')),
+            'burst': float(os.getenv('AI_ADMISSION_MODEL_BURST', '5')),
+        }
+        self.user_concurrency = int(os.getenv('AI_ADMISSION_USER_CONCURRENCY', '2'))
+        self.max_wait = float(os.getenv('AI_ADMISSION_MAX_WAIT', '10'))
+        self.max_queue = int(os.getenv('AI_ADMISSION_MAX_QUEUE', '100'))
+        self._limits: Dict[str, _Limit] = {}
+        self._waiting: Dict[Any, deque] = {}  # user -> tickets, oldest first
+        self._turns: deque = deque()  # users with waiting tickets, next turn first
+        self._user_in_flight = defaultdict(int)
+        self._queued = 0
+        self._lock = threading.Lock()
+
+    def _limit(self, key: str) -> _Limit:
+        limit = self._limits.get(key)
+        if limit is None:
+            config = self.model_config if ':' in key else self.provider_config
+            limit = self._limits[key] = _Limit(key, **config)
+        return limit
+
+    # Queue ---------------------------------------------------------------
+
+    def _user_ready(self, user) -> bool:
+        return user is None or not self.user_concurrency or self._user_in_flight[user] < self.user_concurrency
+
+    def _dispatch(self, now: float):
+        """Grant waiting tickets, one per user per turn, while their limits have room."""
+        progressed = True
+        while progressed and self._turns:
+            progressed = False
+            for user in list(self._turns):
+                ticket = self._waiting[user][0]
+                if not self._user_ready(user) or not all(limit.ready(now) for limit in ticket.limits):
+                    continue
+                self._dequeue(ticket)
+                self._grant(ticket, now)
+                ticket.wake()
+                progressed = True
+
+    def _enqueue(self, ticket: _Ticket):
+        queue = self._waiting.get(ticket.user)
+        if queue is None:
+            queue = self._waiting[ticket.user] = deque()
+            self._turns.append(ticket.user)
+        queue.append(ticket)
+        self._queued += 1
+        for limit in ticket.limits:
+            limit.waiting += 1
+
+    def _dequeue(self, ticket: _Ticket):
+        queue = self._waiting[ticket.user]
+        queue.remove(ticket)
+        self._queued -= 1
+        for limit in ticket.limits:
+            limit.waiting -= 1
+        # The user's next ticket waits for the user's next turn
+        self._turns.remove(ticket.user)
+        if queue:
+            self._turns.append(ticket.user)
+        else:
+            del self._waiting[ticket.user]
+
+    def _grant(self, ticket: _Ticket, now: float):
+        for limit in ticket.limits:
+            limit.take(now)
+        if ticket.user is not None:
+            self._user_in_flight[ticket.user] += 1
+        ticket.granted = True
+
+    def _release(self, ticket: _Ticket, held: float):
+        with self._lock:
+            for limit in ticket.limits:
+                limit.give_back(held)
+            if ticket.user is not None:
+                self._user_in_flight[ticket.user] -= 1
+                if not self._user_in_flight[ticket.user]:
+                    del self._user_in_flight[ticket.user]
+            self._dispatch(time.monotonic())
+
+    def _estimate(self, limits: List[_Limit], now: float) -> float:
+        return max(limit.estimate_wait(now, limit.waiting) for limit in limits)
+
+    def _reject(self, ticket: _Ticket, now: float, reason: str, estimate: float) -> AdmissionRejected:
+        for limit in ticket.limits:
+            limit.rejected += 1
+        metrics.ADMISSIONS.labels(ticket.limits[-1].key, 'rejected').inc()
+        retry_after = max(1, math.ceil(estimate)) if math.isfinite(estimate) else max(1, math.ceil(self.max_wait))
+        logger.warning(f"Shedding upstream call to {ticket.limits[-1].key} ({reason}); retry after {retry_after}s")
+        return AdmissionRejected(retry_after, reason)
+
+    def _try_admit(self, ticket: _Ticket, now: float) -> bool:
+        """Queue the ticket; True if granted at once, raises if it would wait too long."""
+        if not ticket.limits:
+            return True
+        estimate = self._estimate(ticket.limits, now)
+        if self._queued >= self.max_queue:
+            raise self._reject(ticket, now, 'queue_full', estimate)
+        if estimate > self.max_wait:
+            raise self._reject(ticket, now, 'wait_budget', estimate)
+        self._enqueue(ticket)
+        self._dispatch(now)
+        return ticket.granted
+
+    def _next_check(self, ticket: _Ticket, now: float, deadline: float) -> float:
+        wait = max(limit.retry_in(now) for limit in ticket.limits)
+        # Limits ready but the user is at its cap: only a release can help
+        if not wait:
+            wait = math.inf
+        return max(0.0, min(deadline - now, wait))
+
+    def _timed_out(self, ticket: _Ticket, now: float) -> AdmissionRejected:
+        self._dequeue(ticket)
+        return self._reject(ticket, now, 'wait_budget', self._estimate(ticket.limits, now))
+
+    def _admitted(self, ticket: _Ticket, started: float) -> Permit:
+        waited = time.monotonic() - started
+        metrics.ADMISSIONS.labels(ticket.limits[-1].key, 'admitted').inc()
+        metrics.ADMISSION_WAIT.labels(ticket.limits[-1].key).observe(waited)
+        return Permit(self, ticket)
+
+    # Public API ----------------------------------------------------------
+
+    def admit(self, keys: Iterable[str], user=None) -> Permit:
+        """Wait for room on every key, fairly across users; raise if over budget."""
+        if not self.enabled:
+            return Permit()
+        started = time.monotonic()
+        deadline = started + self.max_wait
+        with self._lock:
+            ticket = _Ticket(user, [self._limit(key) for key in keys])
+            if self._try_admit(ticket, started):
+                return self._admitted(ticket, started)
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                timeout = self._next_check(ticket, now, deadline)
+            ticket.event.wait(timeout)
+            with self._lock:
+                now = time.monotonic()
+                if not ticket.granted:
+                    self._dispatch(now)
+                if ticket.granted:
+                    return self._admitted(ticket, started)
+                if now >= deadline:
+                    raise self._timed_out(ticket, now)
+
+    async def aadmit(self, keys: Iterable[str], user=None) -> Permit:
+        """Async counterpart of :meth:`admit`; waits without blocking the event loop."""
+        if not self.enabled:
+            return Permit()
+        started = time.monotonic()
+        deadline = started + self.max_wait
+        with self._lock:
+            ticket = _Ticket(user, [self._limit(key) for key in keys], loop=asyncio.get_running_loop())
+            if self._try_admit(ticket, started):
+                return self._admitted(ticket, started)
+        try:
+            while True:
+                with self._lock:
+                    timeout = self._next_check(ticket, time.monotonic(), deadline)
+                await asyncio.wait({ticket.future}, timeout=timeout)
+                with self._lock:
+                    now = time.monotonic()
+                    if not ticket.granted:
+                        self._dispatch(now)
+                    if ticket.granted:
+                        return self._admitted(ticket, started)
+                    if now >= deadline:
+                        raise self._timed_out(ticket, now)
+        except asyncio.CancelledError:
+            with self._lock:
+                if not ticket.granted:
+                    self._dequeue(ticket)
+                    raise
+            # Granted as the task was cancelled: hand the slot on
+            Permit(self, ticket).release()
+            raise
+
+    def pause(self, keys: Iterable[str], seconds: float):
+        """Hold calls on ``keys`` for ``seconds`` (a provider's ``Retry-After``)."""
+        keys = tuple(keys)
+        if not self.enabled or seconds <= 0:
+            return
+        until = time.monotonic() + seconds
+        with self._lock:
+            for key in keys:
+                limit = self._limit(key)
+                limit.paused_until = max(limit.paused_until, until)
+        logger.warning(f"Provider asked to retry after {seconds:.0f}s; pausing {', '.join(keys)}")
+
+    def snapshot(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        with self._lock:
+            return {
+                'queued': self._queued,
+                'users_waiting': len(self._turns),
+                'limits': {key: limit.snapshot(now) for key, limit in sorted(self._limits.items())},
+            }
@@ -1,11 +1,79 @@
 import os
+import json
+import time
+import asyncio
+import contextvars
 from dotenv import load_dotenv
 import logging
 
 load_dotenv()
 logger = logging.getLogger('api.ai_service')
+import httpx
 import requests
-from typing import Dict, Any, List
+from concurrent.futures import FIRST_COMPLETED, TimeoutError as FuturesTimeout, wait
+from dataclasses import dataclass, replace
+from typing import Dict, Any, Iterator, AsyncIterator, List, Optional
+from .admission import Admission, AdmissionRejected, parse_retry_after
+from .circuit_breaker import BreakerBoard
+from .context import ChatContext, estimate_tokens
+from . import metrics
+from .hedging import HedgePolicy
+from .http_client import AsyncProviderTransport, ProviderTransport
+from .model_registry import AUTO_MODEL_ID, ModelRegistry
+from .models import Chat
+from .near_duplicates import index_from_env
+from .response_cache import ResponseCache
+from .single_flight import SingleFlight, flight_key
+
+
+def _flatten(history):
+    return [text for turn in history for text in turn]
+
+
+def _clip(text: str, tokens: int) -> str:
+    limit = tokens * 4
+    return text if len(text) <= limit else text[:limit].rstrip() + '…'
+
+
+def _elapsed_ms(started: float) -> int:
+    return int((time.monotonic() - started) * 1000)
+
+
+class UpstreamStreamError(Exception):
+    """Raised when a provider reports an error inside an open stream."""
+
+
+@dataclass(frozen=True)
+class AIResult:
+    """A reply and how it was produced.
+
+    ``provider`` is one of the ``Chat`` provider values, or empty when no
+    provider was reached (unknown model, no fallback configured). Latency is
+    the upstream call's wall time; it and the token counts are None when not
+    measured or not reported. ``fallback_reason`` says why OpenRouter did not
+    answer when the Hugging Face fallback did.
+    """
+
+    content: str
+    provider: str = ''
+    latency_ms: Optional[int] = None
+    prompt_tokens: Optional[int] = None
+    completion_tokens: Optional[int] = None
+    fallback_reason: str = ''
+
+    @property
+    def ok(self) -> bool:
+        return bool(self.content) and not self.content.startswith('Error')
+
+    def chat_fields(self) -> Dict[str, Any]:
+        """Accounting columns of the ``Chat`` row storing this reply."""
+        return {
+            'provider': self.provider,
+            'upstream_latency_ms': self.latency_ms,
+            'prompt_tokens': self.prompt_tokens,
+            'completion_tokens': self.completion_tokens,
+            'fallback_reason': self.fallback_reason,
+        }
 
 class AIService:
     """Service to handle multiple AI model integrations via OpenRouter"""
@@ -16,7 +84,7 @@ class AIService:
             logger.info("OpenRouter API key loaded from environment")
         else:
             logger.warning("OPENROUTER_API_KEY not found in environment")
-        self.api_url = "https://openrouter.ai/api/v1/chat/completions"
+        self.api_url = os.getenv('OPENROUTER_API_URL', "https://openrouter.ai/api/v1/chat/completions")
 
         # Hugging Face
         self.hf_api_key = os.getenv('HUGGINGFACE_API_KEY')
@@ -24,10 +92,48 @@ class AIService:
             logger.info("Hugging Face API key loaded from environment")
         else:
             logger.warning("HUGGINGFACE_API_KEY not found in environment")
-        self.hf_api_url = "https://api-inference.huggingface.co/models/"
+        self.hf_api_url = os.getenv('HUGGINGFACE_API_URL', "https://api-inference.huggingface.co/models/")
+
+        # Pooled keep-alive sessions, one per provider
+        self.transport = ProviderTransport()
+        self.transport.register('openrouter', self.api_url)
+        self.transport.register('huggingface', self.hf_api_url)
+        self.async_transport = AsyncProviderTransport()
+
+        # Per-provider and per-model circuit breakers; an open OpenRouter
+        # breaker sends requests straight to the Hugging Face fallback
+        self.breakers = BreakerBoard()
+
+        # Optional hedging: fire the Hugging Face fallback in parallel once
+        # OpenRouter is slower than the model's recent p95
+        self.hedging = HedgePolicy()
+
+        # Identical concurrent prompts share one upstream call
+        self.single_flight = SingleFlight()
+
+        # Per-provider and per-model concurrency caps and token buckets for
+        # OpenRouter, queueing callers fairly across users
+        self.admission = Admission()
+
+        # Prompt budget for profile summaries: the newest chats that fit are
+        # sent, each clipped so one long answer cannot take the whole budget
+        self.summary_token_budget = int(os.getenv('SUMMARY_TOKEN_BUDGET', '1500'))
+        self.summary_chat_tokens = int(os.getenv('SUMMARY_CHAT_TOKENS', '200'))
+
+        # Upper bound on conversation context (summary, earlier turns and the
+        # new message) per request; each model's own context_budget, sized
+        # for its Hugging Face fallback, applies below it
+        self.context_token_cap = int(os.getenv('CHAT_CONTEXT_TOKENS', '8000'))
+
+        # Opt-in cache of answers to identical prompts
+        self.response_cache = ResponseCache()
+        # Opt-in MinHash/LSH index that reuses answers to near-identical prompts
+        self.near_duplicates = index_from_env()
         
         # 4 Free models that work with OpenRouter (with approximate HF fallbacks)
         # api/ai_service.py - Updated models section
+        # context_budget: conversation tokens per request, sized so the prompt
+        # still fits the (smaller) context window of the Hugging Face fallback
 
         self.available_models = [
             {
@@ -35,159 +141,975 @@ class AIService:
                 "name": "LLaMA 3.3 30B Instruct",
                 "provider": "Meta",
                 "description": "Powerful 70B parameter model with advanced reasoning capabilities",
-                "hf_repo": "meta-llama/Meta-Llama-3-8B-Instruct"
+                "hf_repo": "meta-llama/Meta-Llama-3-8B-Instruct",
+                "languages": ["en"],
+                "context_budget": 6000
             },
             {
                 "id": "qwen/qwen3-235b-a22b:free",
                 "name": "Qwen3 235B",
                 "provider": "Qwen",
                 "description": "Massive 253B parameter model optimized for coding and long-context tasks",
-                "hf_repo": "Qwen/Qwen2.5-Coder-32B-Instruct"
+                "hf_repo": "Qwen/Qwen2.5-Coder-32B-Instruct",
+                "languages": ["en", "ar"],
+                "context_budget": 12000
             },
             {
                 "id": "google/gemma-3-27b-it:free",
                 "name": "gemma-3-27b",
                 "provider": "Google",
                 "description": "Google's latest Gemma model with 27B parameters",
-                "hf_repo": "google/gemma-2-9b-it"
+                "hf_repo": "google/gemma-2-9b-it",
+                "languages": ["en", "ar"],
+                "context_budget": 6000
             },
             {
                 "id": "mistralai/mistral-small-3.2-24b-instruct:free",
                 "name": "mistral-small-3.2",
                 "provider": "Mistral AI",
                 "description": "Efficient 24B model with multilingual support and fast responses",
-                "hf_repo": "mistralai/Mistral-7B-Instruct-v0.3"
+                "hf_repo": "mistralai/Mistral-7B-Instruct-v0.3",
+                "languages": ["en", "ar"],
+                "context_budget": 12000
             }
         ]
+        # O(1) lookups, live latency/error stats and the virtual "auto" model
+        self.registry = ModelRegistry(self.available_models)
 
-        
-    def get_available_models(self) -> List[Dict[str, str]]:
-        """Get list of available models"""
-        return self.available_models
-    
-    def get_response(self, model: str, message: str, language: str = 'en') -> str:
-        """Try OpenRouter first; if unavailable or rate-limited, fallback to Hugging Face if configured."""
-        # Resolve selected model metadata
-        selected_model = None
-        for m in self.available_models:
-            if m['id'] == model or m['name'] == model:
-                selected_model = m
-                break
-        if not selected_model:
-            return f"Error: Model '{model}' not found in available models"
+    def warm_connections(self) -> Dict[str, int]:
+        """Pre-open pooled connections to every configured provider."""
+        providers = []
+        if self.api_key:
+            providers.append('openrouter')
+        if self.hf_api_key:
+            providers.append('huggingface')
+        if not providers:
+            return {}
+        return self.transport.warm(providers)
 
-        system_prompt = self._get_system_prompt(language)
+    def get_available_models(self) -> List[Dict[str, Any]]:
+        """Get list of available models with their live stats, including ``auto``"""
+        return self.registry.describe()
 
-        # Attempt OpenRouter
-        if self.api_key:
-            try:
-                headers = {
-                    "Authorization": f"Bearer {self.api_key}",
-                    "Content-Type": "application/json",
-                    "HTTP-Referer": "http://localhost:5173",
-                    "X-Title": "AI Chatbot"
-                }
-                data = {
-                    "model": selected_model['id'],
-                    "messages": [
-                        {"role": "system", "content": system_prompt},
-                        {"role": "user", "content": message}
-                    ],
-                    "temperature": 0.7,
-                    "max_tokens": 1000
-                }
-                logger.info(f"Sending request with model: {selected_model['id']}")
-                response = requests.post(self.api_url, json=data, headers=headers, timeout=30)
-                if response.status_code == 200:
-                    result = response.json()
-                    if 'choices' in result and len(result['choices']) > 0:
-                        return result['choices'][0]['message']['content']
-                    return f"Error: Unexpected response format - {result}"
-                else:
-                    logger.error(f"OpenRouter error {response.status_code}: {response.text[:500]}")
-                    # On rate limit or server error, try HF fallback
-                    if response.status_code in (429, 500, 503):
-                        logger.info("Falling back to Hugging Face due to OpenRouter unavailability")
-                    else:
-                        # Non-retriable
-                        return f"Error: {response.status_code} - {response.text}"
-            except requests.exceptions.Timeout:
-                logger.exception("OpenRouter request timed out; falling back to Hugging Face")
-            except requests.exceptions.RequestException:
-                logger.exception("OpenRouter network error; falling back to Hugging Face")
-            except Exception:
-                logger.exception("Unexpected error in OpenRouter call; falling back to Hugging Face")
-
-        # Hugging Face fallback
+    def _resolve_model(self, model: str, language: str = 'en'):
+        return self.registry.resolve(model, language)
+
+    def resolve_model_id(self, model: str, language: str = 'en') -> str:
+        """Concrete model id that will serve ``model`` (resolves ``auto``); unknown ids pass through."""
+        if model != AUTO_MODEL_ID:
+            return model
+        selected_model = self._resolve_model(model, language)
+        return selected_model['id'] if selected_model else model
+
+    def context_budget(self, model: str, language: str = 'en') -> int:
+        """Token budget for the conversation context sent with a message to ``model``."""
+        selected_model = self._resolve_model(model, language)
+        budget = selected_model.get('context_budget', self.context_token_cap) if selected_model else 0
+        return min(budget, self.context_token_cap)
+
+    def _record_outcome(self, selected_model: Dict[str, Any], started: float, result: AIResult,
+                        interactive: bool = True):
+        # Auto-routing ranks models by what chat users experience; background
+        # calls (long summary prompts) would skew its latency and error stats
+        if interactive:
+            self.registry.record(selected_model['id'], time.monotonic() - started, result.ok)
+        metrics.observe_result(selected_model['id'], result)
+
+    def _openrouter_request(self, selected_model: Dict[str, Any], system_prompt: str, message: str, history=()):
+        headers = {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json",
+            "HTTP-Referer": "http://localhost:5173",
+            "X-Title": "AI Chatbot"
+        }
+        data = {
+            "model": selected_model['id'],
+            "messages": [
+                {"role": "system", "content": system_prompt},
+                *self._history_messages(history),
+                {"role": "user", "content": message}
+            ],
+            "temperature": 0.7,
+            "max_tokens": 1000
+        }
+        return headers, data
+
+    @staticmethod
+    def _history_messages(history) -> List[Dict[str, str]]:
+        messages = []
+        for user_message, ai_response in history:
+            messages.append({"role": "user", "content": user_message})
+            messages.append({"role": "assistant", "content": ai_response})
+        return messages
+
+    @staticmethod
+    def _history_text(history) -> str:
+        return ''.join(f"User: {user_message}\nAssistant: {ai_response}\n" for user_message, ai_response in history)
+
+    def _hf_request(self, selected_model: Dict[str, Any], system_prompt: str, message: str, history=()):
+        headers = {
+            "Authorization": f"Bearer {self.hf_api_key}",
+            "Content-Type": "application/json",
+        }
+        # Simple text-generation style payload
+        payload = {
+            "inputs": f"System: {system_prompt}\n{self._history_text(history)}User: {message}\nAssistant:",
+            "parameters": {
+                "max_new_tokens": 512,
+                "temperature": 0.7,
+                "return_full_text": False
+            }
+        }
+        url = f"{self.hf_api_url}{selected_model['hf_repo']}"
+        return url, headers, payload
+
+    def _parse_openrouter(self, status_code: int, body, text: str, started: float):
+        """Return ``(result, fallback_reason)`` for an OpenRouter HTTP response.
+
+        ``result`` is None when the Hugging Face fallback should answer instead.
+        """
+        latency_ms = _elapsed_ms(started)
+        if status_code == 200:
+            result = body()
+            if 'choices' in result and len(result['choices']) > 0:
+                usage = result.get('usage') or {}
+                return AIResult(
+                    result['choices'][0]['message']['content'], Chat.OPENROUTER, latency_ms,
+                    usage.get('prompt_tokens'), usage.get('completion_tokens'),
+                ), None
+            return AIResult(f"Error: Unexpected response format - {result}", Chat.OPENROUTER, latency_ms), None
+        logger.error(f"OpenRouter error {status_code}: {text[:500]}")
+        # On rate limit or server error, try HF fallback
+        if status_code in (429, 500, 503):
+            logger.info("Falling back to Hugging Face due to OpenRouter unavailability")
+            return None, f"http_{status_code}"
+        # Non-retriable
+        return AIResult(f"Error: {status_code} - {text}", Chat.OPENROUTER, latency_ms), None
+
+    def _parse_hf(self, status_code: int, body, text: str, started: float) -> AIResult:
+        # The text-generation API does not report token usage
+        latency_ms = _elapsed_ms(started)
+        if status_code != 200:
+            logger.error(f"Hugging Face error {status_code}: {text[:500]}")
+            if status_code in (429, 503):
+                return AIResult("Error: Service is rate-limited or busy. Please try again later.",
+                                Chat.HUGGINGFACE, latency_ms)
+            return AIResult(f"Error: {status_code} - {text}", Chat.HUGGINGFACE, latency_ms)
+        data = body()
+        # HF responses can be a list of dicts with 'generated_text'
+        if isinstance(data, list) and data and 'generated_text' in data[0]:
+            return AIResult(data[0]['generated_text'], Chat.HUGGINGFACE, latency_ms)
+        # Or a dict with 'generated_text' or nested structure
+        if isinstance(data, dict):
+            if 'generated_text' in data:
+                return AIResult(data['generated_text'], Chat.HUGGINGFACE, latency_ms)
+            # Some pipelines return list under 'choices' or similar; fall back to string
+        return AIResult(str(data), Chat.HUGGINGFACE, latency_ms)
+
+    def _hf_unavailable(self, selected_model: Dict[str, Any]):
         if not self.hf_api_key:
             return "Error: Service temporarily unavailable and no Hugging Face key configured."
-        hf_repo = selected_model.get('hf_repo')
-        if not hf_repo:
+        if not selected_model.get('hf_repo'):
             return "Error: No Hugging Face fallback available for the selected model."
+        if not self.breakers.allow(self._hf_breaker_keys(selected_model)):
+            logger.warning(f"Hugging Face circuit open for {selected_model['hf_repo']}; rejecting fast")
+            return "Error: Service is rate-limited or busy. Please try again later."
+        return None
+
+    def _openrouter_breaker_keys(self, selected_model: Dict[str, Any]):
+        return ('openrouter', f"openrouter:{selected_model['id']}")
+
+    def _hf_breaker_keys(self, selected_model: Dict[str, Any]):
+        return ('huggingface', f"huggingface:{selected_model['hf_repo']}")
+
+    def _openrouter_unavailable(self, selected_model: Dict[str, Any]) -> Optional[str]:
+        """Fallback reason when OpenRouter must be skipped, else None."""
+        if not self.api_key:
+            return "no_api_key"
+        if self.breakers.allow(self._openrouter_breaker_keys(selected_model)):
+            return None
+        logger.warning(f"OpenRouter circuit open for {selected_model['id']}; going straight to Hugging Face")
+        return "circuit_open"
+
+    def _has_fallback(self, selected_model: Dict[str, Any]) -> bool:
+        return bool(self.hf_api_key) and bool(selected_model.get('hf_repo'))
+
+    def _admit_openrouter(self, selected_model: Dict[str, Any], user=None):
+        """Return ``(permit, fallback_reason)`` for an OpenRouter call.
+
+        The permit is None when OpenRouter must be skipped. A call shed by
+        admission control goes to Hugging Face when the model has a fallback
+        and raises :class:`~api.admission.AdmissionRejected` otherwise.
+        """
+        reason = self._openrouter_unavailable(selected_model)
+        if reason is not None:
+            return None, reason
+        keys = self._openrouter_breaker_keys(selected_model)
         try:
-            headers = {
-                "Authorization": f"Bearer {self.hf_api_key}",
-                "Content-Type": "application/json",
-            }
-            # Simple text-generation style payload
-            payload = {
-                "inputs": f"System: {system_prompt}\nUser: {message}\nAssistant:",
-                "parameters": {
-                    "max_new_tokens": 512,
-                    "temperature": 0.7,
-                    "return_full_text": False
-                }
-            }
-            url = f"{self.hf_api_url}{hf_repo}"
-            logger.info(f"Calling Hugging Face model: {hf_repo}")
-            resp = requests.post(url, headers=headers, json=payload, timeout=60)
-            if resp.status_code != 200:
-                logger.error(f"Hugging Face error {resp.status_code}: {resp.text[:500]}")
-                if resp.status_code in (429, 503):
-                    return "Error: Service is rate-limited or busy. Please try again later."
-                return f"Error: {resp.status_code} - {resp.text}"
-            data = resp.json()
-            # HF responses can be a list of dicts with 'generated_text'
-            if isinstance(data, list) and data and 'generated_text' in data[0]:
-                return data[0]['generated_text']
-            # Or a dict with 'generated_text' or nested structure
-            if isinstance(data, dict):
-                if 'generated_text' in data:
-                    return data['generated_text']
-                # Some pipelines return list under 'choices' or similar; fall back to string
-            return str(data)
+            return self.admission.admit(keys, user), None
+        except AdmissionRejected:
+            # OpenRouter is never tried, so a half-open probe must not wait for an outcome
+            self.breakers.release(keys)
+            if not self._has_fallback(selected_model):
+                raise
+            return None, "shed"
+
+    async def _aadmit_openrouter(self, selected_model: Dict[str, Any], user=None):
+        """Async counterpart of ``_admit_openrouter``."""
+        reason = self._openrouter_unavailable(selected_model)
+        if reason is not None:
+            return None, reason
+        keys = self._openrouter_breaker_keys(selected_model)
+        try:
+            return await self.admission.aadmit(keys, user), None
+        except AdmissionRejected:
+            self.breakers.release(keys)
+            if not self._has_fallback(selected_model):
+                raise
+            return None, "shed"
+
+    def _note_retry_after(self, selected_model: Dict[str, Any], status_code: int, headers):
+        """Hold further OpenRouter calls for the model as long as a 429/503 asks."""
+        if status_code in (429, 503):
+            seconds = parse_retry_after(headers.get('Retry-After'))
+            if seconds:
+                self.admission.pause(self._openrouter_breaker_keys(selected_model), seconds)
+
+    @staticmethod
+    def _provider_healthy(status_code: int) -> bool:
+        """Only rate limiting and server errors count against a provider's breaker."""
+        return status_code != 429 and status_code < 500
+
+    def _cache_lookup(self, selected_model: Dict[str, Any], language: str, system_prompt: str,
+                      message: str, use_cache: bool):
+        """Return ``(cache_key, cached_response)``; the key is None when caching does not apply.
+
+        The exact-match cache is consulted first, then the near-duplicate index.
+        """
+        if not use_cache:
+            return None, None
+        model_id = selected_model['id']
+        exact_key = near_scope = None
+        if self.response_cache.is_enabled_for(model_id):
+            exact_key = self.response_cache.make_key(model_id, language, system_prompt, message)
+            cached = self.response_cache.get(exact_key)
+            if cached is not None:
+                metrics.CACHE_LOOKUPS.labels('hit').inc()
+                return (exact_key, None), cached
+        if self.near_duplicates is not None and self.response_cache.allows_model(model_id):
+            near_scope = self.response_cache.make_key(model_id, language, system_prompt, '')
+            match = self.near_duplicates.query(near_scope, message)
+            if match is not None:
+                metrics.CACHE_LOOKUPS.labels('near_hit').inc()
+                return (exact_key, None), match[0]
+        if exact_key is None and near_scope is None:
+            return None, None
+        metrics.CACHE_LOOKUPS.labels('miss').inc()
+        return (exact_key, near_scope), None
+
+    def _cache_store(self, cache_key, message: str, content: str):
+        exact_key, near_scope = cache_key
+        if exact_key:
+            self.response_cache.set(exact_key, content)
+        if near_scope and content and not content.startswith('Error'):
+            self.near_duplicates.add(near_scope, message, content)
+
+    def get_response(self, model: str, message: str, language: str = 'en', use_cache: bool = True,
+                     context: ChatContext = None, user=None, interactive: bool = True) -> str:
+        """Reply text of :meth:`get_result`."""
+        return self.get_result(model, message, language, use_cache, context, user, interactive).content
+
+    def get_result(self, model: str, message: str, language: str = 'en', use_cache: bool = True,
+                   context: ChatContext = None, user=None, interactive: bool = True) -> AIResult:
+        """Try OpenRouter first; if unavailable or rate-limited, fallback to Hugging Face if configured.
+
+        Pass ``use_cache=False`` to skip the response cache entirely, and a
+        :class:`~api.context.ChatContext` to answer within a conversation.
+        ``user`` (an id) is the caller's identity for fair queueing; raises
+        :class:`~api.admission.AdmissionRejected` when OpenRouter is over
+        its admission budget and there is no fallback. Background callers
+        pass ``interactive=False`` so their calls stay out of the auto-routing
+        stats.
+        """
+        selected_model = self._resolve_model(model, language)
+        if not selected_model:
+            return AIResult(f"Error: Model '{model}' not found in available models")
+
+        system_prompt = self._get_system_prompt(language, context)
+        history = context.turns if context else ()
+        # Answers that depend on earlier turns are never cached
+        cache_key, cached = self._cache_lookup(
+            selected_model, language, system_prompt, message, use_cache and not context
+        )
+        if cached is not None:
+            return AIResult(cached, Chat.CACHE)
+
+        led = False
+
+        def fetch():
+            nonlocal led
+            led = True
+            started = time.monotonic()
+            result = self._fetch_response(selected_model, system_prompt, message, history, user)
+            self._record_outcome(selected_model, started, result, interactive)
+            if cache_key:
+                self._cache_store(cache_key, message, result.content)
+            return result
+
+        key = flight_key(selected_model['id'], language, system_prompt, *_flatten(history), message)
+        result = self.single_flight.do(key, fetch)
+        # Callers that shared another request's answer cost nothing upstream;
+        # a shared failure keeps its provider and error
+        return result if led or not result.ok else AIResult(result.content, Chat.CACHE)
+
+    def _should_hedge(self, selected_model: Dict[str, Any]) -> bool:
+        return self.hedging.enabled and bool(self.hf_api_key) and bool(selected_model.get('hf_repo'))
+
+    def _hedge_delay(self, selected_model: Dict[str, Any]) -> float:
+        return self.hedging.delay_for(self.registry.stats[selected_model['id']].snapshot())
+
+    def _fetch_response(self, selected_model: Dict[str, Any], system_prompt: str, message: str, history=(),
+                        user=None) -> AIResult:
+        permit, reason = self._admit_openrouter(selected_model, user)
+        if permit is not None:
+            if self._should_hedge(selected_model):
+                return self._fetch_hedged(selected_model, system_prompt, message, history, permit)
+            with permit:
+                result, reason = self._call_openrouter(selected_model, system_prompt, message, history)
+            if result is not None:
+                return result
+
+        return replace(self._call_hf(selected_model, system_prompt, message, history), fallback_reason=reason)
+
+    def _fetch_hedged(self, selected_model: Dict[str, Any], system_prompt: str, message: str, history=(),
+                      permit=None) -> AIResult:
+        """OpenRouter first; after the hedge delay race it against Hugging Face.
+
+        A running thread cannot be interrupted, so the losing call is left to
+        finish in the background (its outcome still feeds the breakers). It
+        holds its executor thread until it returns, which its own request
+        timeout bounds: 30s per socket read for OpenRouter, 60s for Hugging
+        Face. A hedged chat therefore takes up to two of the
+        ``AI_HEDGE_MAX_WORKERS`` threads for that long; once they are all
+        busy, further calls queue for a thread. The admission ``permit`` is
+        held until the OpenRouter call itself ends, not just until a winner
+        is returned.
+        """
+        model_id = selected_model['id']
+        delay = self._hedge_delay(selected_model)
+        self.hedging.count(model_id, 'requests')
+        executor = self.hedging.executor
+        try:
+            # Each call runs in a copy of this context, so profiling phases and
+            # queries still land on the request
+            primary = executor.submit(contextvars.copy_context().run, self._call_openrouter,
+                                      selected_model, system_prompt, message, history)
+        except BaseException:
+            if permit is not None:
+                permit.release()
+            raise
+        if permit is not None:
+            primary.add_done_callback(lambda _: permit.release())
+        try:
+            result, reason = primary.result(timeout=delay)
+        except FuturesTimeout:
+            pass
+        else:
+            if result is not None:
+                return result
+            return replace(self._call_hf(selected_model, system_prompt, message, history), fallback_reason=reason)
+
+        logger.info(f"OpenRouter slower than {delay:.1f}s for {model_id}; hedging to Hugging Face")
+        self.hedging.count(model_id, 'hedged')
+        hedge = executor.submit(contextvars.copy_context().run, self._call_hf,
+                                selected_model, system_prompt, message, history)
+        done, _ = wait([primary, hedge], return_when=FIRST_COMPLETED)
+        if primary not in done:
+            hf_result = hedge.result()
+            if hf_result.ok:
+                self.hedging.count(model_id, 'hedge_wins')
+                return replace(hf_result, fallback_reason="hedged")
+        result, reason = primary.result()
+        if result is not None:
+            self.hedging.count(model_id, 'primary_wins')
+            return result
+        hf_result = hedge.result()
+        self.hedging.count(model_id, 'hedge_wins' if hf_result.ok else 'both_failed')
+        return replace(hf_result, fallback_reason=reason)
+
+    def _call_openrouter(self, selected_model: Dict[str, Any], system_prompt: str, message: str, history=()):
+        breaker_keys = self._openrouter_breaker_keys(selected_model)
+        try:
+            headers, data = self._openrouter_request(selected_model, system_prompt, message, history)
+            logger.info(f"Sending request with model: {selected_model['id']}")
+            started = time.monotonic()
+            response = self.transport.post('openrouter', self.api_url, json=data, headers=headers, timeout=30)
+            self.breakers.record(breaker_keys, ok=self._provider_healthy(response.status_code))
+            self._note_retry_after(selected_model, response.status_code, response.headers)
+            return self._parse_openrouter(response.status_code, response.json, response.text, started)
+        except requests.exceptions.Timeout:
+            self.breakers.record(breaker_keys, ok=False, timeout=True)
+            logger.exception("OpenRouter request timed out; falling back to Hugging Face")
+            return None, "timeout"
+        except requests.exceptions.RequestException:
+            self.breakers.record(breaker_keys, ok=False)
+            logger.exception("OpenRouter network error; falling back to Hugging Face")
+            return None, "network_error"
+        except Exception:
+            self.breakers.record(breaker_keys, ok=False)
+            logger.exception("Unexpected error in OpenRouter call; falling back to Hugging Face")
+            return None, "error"
+
+    def _call_hf(self, selected_model: Dict[str, Any], system_prompt: str, message: str, history=()) -> AIResult:
+        unavailable = self._hf_unavailable(selected_model)
+        if unavailable:
+            return AIResult(unavailable)
+        breaker_keys = self._hf_breaker_keys(selected_model)
+        started = time.monotonic()
+        try:
+            url, headers, payload = self._hf_request(selected_model, system_prompt, message, history)
+            logger.info(f"Calling Hugging Face model: {selected_model['hf_repo']}")
+            resp = self.transport.post('huggingface', url, headers=headers, json=payload, timeout=60)
+            self.breakers.record(breaker_keys, ok=self._provider_healthy(resp.status_code))
+            return self._parse_hf(resp.status_code, resp.json, resp.text, started)
         except requests.exceptions.Timeout:
+            self.breakers.record(breaker_keys, ok=False, timeout=True)
             logger.exception("Hugging Face request timed out")
-            return "Error: Request timed out. Please try again."
+            return AIResult("Error: Request timed out. Please try again.", Chat.HUGGINGFACE, _elapsed_ms(started))
         except requests.exceptions.RequestException as e:
+            self.breakers.record(breaker_keys, ok=False)
             logger.exception("Hugging Face network error")
-            return f"Error: Network error - {str(e)}"
+            return AIResult(f"Error: Network error - {str(e)}", Chat.HUGGINGFACE, _elapsed_ms(started))
         except Exception as e:
+            self.breakers.record(breaker_keys, ok=False)
             logger.exception("Unexpected error in Hugging Face call")
-            return f"Error: {str(e)}"
-    
-    def generate_user_summary(self, chat_history: list, language: str = 'en') -> str:
-        """Generate AI-powered user summary from chat history"""
+            return AIResult(f"Error: {str(e)}", Chat.HUGGINGFACE, _elapsed_ms(started))
+
+    async def aget_response(self, model: str, message: str, language: str = 'en', use_cache: bool = True,
+                            context: ChatContext = None, user=None, interactive: bool = True) -> str:
+        """Reply text of :meth:`aget_result`."""
+        return (await self.aget_result(model, message, language, use_cache, context, user, interactive)).content
+
+    async def aget_result(self, model: str, message: str, language: str = 'en', use_cache: bool = True,
+                          context: ChatContext = None, user=None, interactive: bool = True) -> AIResult:
+        """Async counterpart of ``get_result`` for ASGI views; never blocks the event loop."""
+        selected_model = self._resolve_model(model, language)
+        if not selected_model:
+            return AIResult(f"Error: Model '{model}' not found in available models")
+
+        system_prompt = self._get_system_prompt(language, context)
+        history = context.turns if context else ()
+        # Answers that depend on earlier turns are never cached
+        cache_key, cached = self._cache_lookup(
+            selected_model, language, system_prompt, message, use_cache and not context
+        )
+        if cached is not None:
+            return AIResult(cached, Chat.CACHE)
+
+        led = False
+
+        async def fetch():
+            nonlocal led
+            led = True
+            started = time.monotonic()
+            result = await self._afetch_response(selected_model, system_prompt, message, history, user)
+            self._record_outcome(selected_model, started, result, interactive)
+            if cache_key:
+                self._cache_store(cache_key, message, result.content)
+            return result
+
+        key = flight_key(selected_model['id'], language, system_prompt, *_flatten(history), message)
+        result = await self.single_flight.ado(key, fetch)
+        # Callers that shared another request's answer cost nothing upstream;
+        # a shared failure keeps its provider and error
+        return result if led or not result.ok else AIResult(result.content, Chat.CACHE)
+
+    async def _afetch_response(self, selected_model: Dict[str, Any], system_prompt: str, message: str, history=(),
+                               user=None) -> AIResult:
+        permit, reason = await self._aadmit_openrouter(selected_model, user)
+        if permit is not None:
+            if self._should_hedge(selected_model):
+                return await self._afetch_hedged(selected_model, system_prompt, message, history, permit)
+            with permit:
+                result, reason = await self._acall_openrouter(selected_model, system_prompt, message, history)
+            if result is not None:
+                return result
+
+        return replace(await self._acall_hf(selected_model, system_prompt, message, history), fallback_reason=reason)
+
+    async def _afetch_hedged(self, selected_model: Dict[str, Any], system_prompt: str, message: str, history=(),
+                             permit=None) -> AIResult:
+        """Async counterpart of ``_fetch_hedged``; the losing request is cancelled.
+
+        A cancelled OpenRouter call records no outcome but hands back its
+        breaker attempt (see ``_acall_openrouter``), so a losing half-open
+        probe does not block the provider until the probe times out.
+        """
+        model_id = selected_model['id']
+        delay = self._hedge_delay(selected_model)
+        self.hedging.count(model_id, 'requests')
+        primary = asyncio.ensure_future(self._acall_openrouter(selected_model, system_prompt, message, history))
+        if permit is not None:
+            # Cancellation takes effect at the task's next await, not at cancel()
+            primary.add_done_callback(lambda _: permit.release())
+        hedge = None
         try:
-            # Compile chat history (last 10 to avoid token limits)
-            history_text = "\n".join([
-                f"User: {chat['user_message']}\nAI: {chat['ai_response']}"
-                for chat in chat_history[-10:]
-            ])
-            
+            try:
+                result, reason = await asyncio.wait_for(asyncio.shield(primary), timeout=delay)
+            except asyncio.TimeoutError:
+                pass
+            else:
+                if result is not None:
+                    return result
+                return replace(await self._acall_hf(selected_model, system_prompt, message, history),
+                               fallback_reason=reason)
+
+            logger.info(f"OpenRouter slower than {delay:.1f}s for {model_id}; hedging to Hugging Face")
+            self.hedging.count(model_id, 'hedged')
+            hedge = asyncio.ensure_future(self._acall_hf(selected_model, system_prompt, message, history))
+            done, _ = await asyncio.wait({primary, hedge}, return_when=asyncio.FIRST_COMPLETED)
+            if primary not in done:
+                hf_result = hedge.result()
+                if hf_result.ok:
+                    self.hedging.count(model_id, 'hedge_wins')
+                    return replace(hf_result, fallback_reason="hedged")
+            result, reason = await primary
+            if result is not None:
+                self.hedging.count(model_id, 'primary_wins')
+                return result
+            hf_result = await hedge
+            self.hedging.count(model_id, 'hedge_wins' if hf_result.ok else 'both_failed')
+            return replace(hf_result, fallback_reason=reason)
+        finally:
+            for task in (primary, hedge):
+                if task is not None and not task.done():
+                    task.cancel()
+
+    async def _acall_openrouter(self, selected_model: Dict[str, Any], system_prompt: str, message: str, history=()):
+        breaker_keys = self._openrouter_breaker_keys(selected_model)
+        try:
+            headers, data = self._openrouter_request(selected_model, system_prompt, message, history)
+            logger.info(f"Sending async request with model: {selected_model['id']}")
+            started = time.monotonic()
+            response = await self.async_transport.post('openrouter', self.api_url, json=data, headers=headers, timeout=30)
+            self.breakers.record(breaker_keys, ok=self._provider_healthy(response.status_code))
+            self._note_retry_after(selected_model, response.status_code, response.headers)
+            return self._parse_openrouter(response.status_code, response.json, response.text, started)
+        except asyncio.CancelledError:
+            # Lost a hedge race or the client left: no verdict on the provider
+            self.breakers.release(breaker_keys)
+            raise
+        except httpx.TimeoutException:
+            self.breakers.record(breaker_keys, ok=False, timeout=True)
+            logger.exception("OpenRouter request timed out; falling back to Hugging Face")
+            return None, "timeout"
+        except httpx.HTTPError:
+            self.breakers.record(breaker_keys, ok=False)
+            logger.exception("OpenRouter network error; falling back to Hugging Face")
+            return None, "network_error"
+        except Exception:
+            self.breakers.record(breaker_keys, ok=False)
+            logger.exception("Unexpected error in OpenRouter call; falling back to Hugging Face")
+            return None, "error"
+
+    async def _acall_hf(self, selected_model: Dict[str, Any], system_prompt: str, message: str, history=()) -> AIResult:
+        unavailable = self._hf_unavailable(selected_model)
+        if unavailable:
+            return AIResult(unavailable)
+        breaker_keys = self._hf_breaker_keys(selected_model)
+        started = time.monotonic()
+        try:
+            url, headers, payload = self._hf_request(selected_model, system_prompt, message, history)
+            logger.info(f"Calling Hugging Face model (async): {selected_model['hf_repo']}")
+            resp = await self.async_transport.post('huggingface', url, headers=headers, json=payload, timeout=60)
+            self.breakers.record(breaker_keys, ok=self._provider_healthy(resp.status_code))
+            return self._parse_hf(resp.status_code, resp.json, resp.text, started)
+        except httpx.TimeoutException:
+            self.breakers.record(breaker_keys, ok=False, timeout=True)
+            logger.exception("Hugging Face request timed out")
+            return AIResult("Error: Request timed out. Please try again.", Chat.HUGGINGFACE, _elapsed_ms(started))
+        except httpx.HTTPError as e:
+            self.breakers.record(breaker_keys, ok=False)
+            logger.exception("Hugging Face network error")
+            return AIResult(f"Error: Network error - {str(e)}", Chat.HUGGINGFACE, _elapsed_ms(started))
+        except Exception as e:
+            self.breakers.record(breaker_keys, ok=False)
+            logger.exception("Unexpected error in Hugging Face call")
+            return AIResult(f"Error: {str(e)}", Chat.HUGGINGFACE, _elapsed_ms(started))
+
+    def _parse_stream_line(self, line: str):
+        """Return ``(delta, usage, done)`` for one line of an OpenRouter SSE stream."""
+        # Blank lines separate events; ':' lines are keep-alive comments
+        if not line or not line.startswith('data:'):
+            return None, None, False
+        payload = line[5:].strip()
+        if payload == '[DONE]':
+            return None, None, True
+        chunk = json.loads(payload)
+        if 'error' in chunk:
+            error = chunk['error']
+            raise UpstreamStreamError(error.get('message', str(error)) if isinstance(error, dict) else str(error))
+        # Token usage arrives in the last chunk, usually without choices
+        usage = chunk.get('usage')
+        choices = chunk.get('choices') or []
+        if not choices:
+            return None, usage, False
+        return (choices[0].get('delta') or {}).get('content'), usage, False
+
+    @staticmethod
+    def _stream_result(started: float, usage, reason: str = '') -> Dict[str, Any]:
+        usage = usage or {}
+        return {'type': 'result', 'result': AIResult(
+            '', Chat.OPENROUTER, _elapsed_ms(started),
+            usage.get('prompt_tokens'), usage.get('completion_tokens'), reason,
+        )}
+
+    def _pending_result(self, selected_model: Dict[str, Any], permit, fallback_reason: str = None) -> AIResult:
+        if permit is not None:
+            return AIResult('', Chat.OPENROUTER)
+        provider = Chat.HUGGINGFACE if self._has_fallback(selected_model) else ''
+        return AIResult('', provider, fallback_reason=fallback_reason or '')
+
+    def stream_response(self, model: str, message: str, language: str = 'en',
+                        use_cache: bool = True, context: ChatContext = None, user=None) -> Iterator[Dict[str, Any]]:
+        """Stream a reply as events: ``{'type': 'delta', 'content': ...}``.
+
+        The first event, ``{'type': 'start', 'result': AIResult}``, comes once
+        the call is admitted upstream (see :meth:`get_result` for ``user`` and
+        :class:`~api.admission.AdmissionRejected`), so consumers can pull it
+        before committing to a streamed response. Its result is empty and
+        names the provider being asked, for saving a reply the client
+        abandons.
+
+        OpenRouter token deltas are forwarded as they arrive. If OpenRouter is
+        unavailable the Hugging Face reply is emitted as a single delta. If the
+        stream breaks after some deltas were sent, a ``{'type': 'fallback'}``
+        event (with the ``fallback_reason``) tells the consumer to discard the partial text first. Cached
+        answers are replayed as a single delta. The last event is
+        ``{'type': 'result', 'result': AIResult}`` with the whole reply.
+        """
+        selected_model = self._resolve_model(model, language)
+        if not selected_model:
+            content = f"Error: Model '{model}' not found in available models"
+            yield {'type': 'start', 'result': AIResult('')}
+            yield {'type': 'delta', 'content': content}
+            yield {'type': 'result', 'result': AIResult(content)}
+            return
+
+        system_prompt = self._get_system_prompt(language, context)
+        history = context.turns if context else ()
+        # Answers that depend on earlier turns are never cached
+        cache_key, cached = self._cache_lookup(
+            selected_model, language, system_prompt, message, use_cache and not context
+        )
+        if cached is not None:
+            yield {'type': 'start', 'result': AIResult('', Chat.CACHE)}
+            yield {'type': 'delta', 'content': cached}
+            yield {'type': 'result', 'result': AIResult(cached, Chat.CACHE)}
+            return
+
+        permit, reason = self._admit_openrouter(selected_model, user)
+        try:
+            yield {'type': 'start', 'result': self._pending_result(selected_model, permit, reason)}
+        except BaseException:
+            # Closed before the upstream call started: hand the slot back
+            if permit is not None:
+                permit.release()
+            raise
+
+        parts = []
+        result = AIResult('')
+        started = time.monotonic()
+        upstream = self._stream_upstream(selected_model, system_prompt, message, history, permit, reason)
+        try:
+            for event in upstream:
+                if event['type'] == 'result':
+                    result = event['result']
+                    continue
+                if event['type'] == 'fallback':
+                    parts.clear()
+                else:
+                    parts.append(event['content'])
+                yield event
+        finally:
+            # A consumer that stops early ends the upstream call (and its permit) now
+            upstream.close()
+        result = replace(result, content=''.join(parts))
+        self._record_outcome(selected_model, started, result)
+        if cache_key:
+            self._cache_store(cache_key, message, result.content)
+        yield {'type': 'result', 'result': result}
+
+    def _stream_upstream(self, selected_model: Dict[str, Any], system_prompt: str,
+                         message: str, history=(), permit=None,
+                         fallback_reason: str = None) -> Iterator[Dict[str, Any]]:
+        if permit is not None:
+            with permit:
+                breaker_keys = self._openrouter_breaker_keys(selected_model)
+                streamed = False
+                try:
+                    headers, data = self._openrouter_request(selected_model, system_prompt, message, history)
+                    data['stream'] = True
+                    data['stream_options'] = {'include_usage': True}
+                    logger.info(f"Streaming request with model: {selected_model['id']}")
+                    started, usage = time.monotonic(), None
+                    with self.transport.post('openrouter', self.api_url, json=data, headers=headers, timeout=30, stream=True) as response:
+                        if response.status_code != 200:
+                            self.breakers.record(breaker_keys, ok=self._provider_healthy(response.status_code))
+                            self._note_retry_after(selected_model, response.status_code, response.headers)
+                            result, fallback_reason = self._parse_openrouter(
+                                response.status_code, response.json, response.text, started
+                            )
+                            if result is not None:
+                                yield {'type': 'delta', 'content': result.content}
+                                yield {'type': 'result', 'result': result}
+                                return
+                            reason = f"OpenRouter returned {response.status_code}"
+                        else:
+                            response.encoding = 'utf-8'
+                            for line in response.iter_lines(decode_unicode=True):
+                                delta, chunk_usage, done = self._parse_stream_line(line)
+                                if done:
+                                    break
+                                usage = chunk_usage or usage
+                                if delta:
+                                    streamed = True
+                                    yield {'type': 'delta', 'content': delta}
+                            self.breakers.record(breaker_keys, ok=True)
+                            yield self._stream_result(started, usage)
+                            return
+                except GeneratorExit:
+                    # Client left mid-stream: no verdict on the provider
+                    self.breakers.release(breaker_keys)
+                    raise
+                except requests.exceptions.Timeout:
+                    self.breakers.record(breaker_keys, ok=False, timeout=True)
+                    logger.exception("OpenRouter stream timed out; falling back to Hugging Face")
+                    reason, fallback_reason = "OpenRouter timed out", "timeout"
+                except requests.exceptions.RequestException:
+                    self.breakers.record(breaker_keys, ok=False)
+                    logger.exception("OpenRouter stream network error; falling back to Hugging Face")
+                    reason, fallback_reason = "OpenRouter network error", "network_error"
+                except Exception:
+                    self.breakers.record(breaker_keys, ok=False)
+                    logger.exception("Unexpected error in OpenRouter stream; falling back to Hugging Face")
+                    reason, fallback_reason = "OpenRouter stream error", "stream_error"
+                if streamed:
+                    yield {'type': 'fallback', 'reason': reason, 'fallback_reason': fallback_reason}
+
+        result = replace(self._call_hf(selected_model, system_prompt, message, history), fallback_reason=fallback_reason)
+        yield {'type': 'delta', 'content': result.content}
+        yield {'type': 'result', 'result': result}
+
+    async def astream_response(self, model: str, message: str, language: str = 'en',
+                               use_cache: bool = True, context: ChatContext = None, user=None) -> AsyncIterator[Dict[str, Any]]:
+        """Async counterpart of ``stream_response`` for ASGI views."""
+        selected_model = self._resolve_model(model, language)
+        if not selected_model:
+            content = f"Error: Model '{model}' not found in available models"
+            yield {'type': 'start', 'result': AIResult('')}
+            yield {'type': 'delta', 'content': content}
+            yield {'type': 'result', 'result': AIResult(content)}
+            return
+
+        system_prompt = self._get_system_prompt(language, context)
+        history = context.turns if context else ()
+        # Answers that depend on earlier turns are never cached
+        cache_key, cached = self._cache_lookup(
+            selected_model, language, system_prompt, message, use_cache and not context
+        )
+        if cached is not None:
+            yield {'type': 'start', 'result': AIResult('', Chat.CACHE)}
+            yield {'type': 'delta', 'content': cached}
+            yield {'type': 'result', 'result': AIResult(cached, Chat.CACHE)}
+            return
+
+        permit, reason = await self._aadmit_openrouter(selected_model, user)
+        try:
+            yield {'type': 'start', 'result': self._pending_result(selected_model, permit, reason)}
+        except BaseException:
+            # Closed before the upstream call started: hand the slot back
+            if permit is not None:
+                permit.release()
+            raise
+
+        parts = []
+        result = AIResult('')
+        started = time.monotonic()
+        upstream = self._astream_upstream(selected_model, system_prompt, message, history, permit, reason)
+        try:
+            async for event in upstream:
+                if event['type'] == 'result':
+                    result = event['result']
+                    continue
+                if event['type'] == 'fallback':
+                    parts.clear()
+                else:
+                    parts.append(event['content'])
+                yield event
+        finally:
+            # A consumer that stops early ends the upstream call (and its permit) now
+            await upstream.aclose()
+        result = replace(result, content=''.join(parts))
+        self._record_outcome(selected_model, started, result)
+        if cache_key:
+            self._cache_store(cache_key, message, result.content)
+        yield {'type': 'result', 'result': result}
+
+    async def _astream_upstream(self, selected_model: Dict[str, Any], system_prompt: str,
+                                message: str, history=(), permit=None,
+                                fallback_reason: str = None) -> AsyncIterator[Dict[str, Any]]:
+        if permit is not None:
+            with permit:
+                breaker_keys = self._openrouter_breaker_keys(selected_model)
+                streamed = False
+                try:
+                    headers, data = self._openrouter_request(selected_model, system_prompt, message, history)
+                    data['stream'] = True
+                    data['stream_options'] = {'include_usage': True}
+                    logger.info(f"Streaming async request with model: {selected_model['id']}")
+                    client = self.async_transport.client('openrouter')
+                    started, usage = time.monotonic(), None
+                    async with client.stream('POST', self.api_url, json=data, headers=headers, timeout=30) as response:
+                        if response.status_code != 200:
+                            await response.aread()
+                            self.breakers.record(breaker_keys, ok=self._provider_healthy(response.status_code))
+                            self._note_retry_after(selected_model, response.status_code, response.headers)
+                            result, fallback_reason = self._parse_openrouter(
+                                response.status_code, response.json, response.text, started
+                            )
+                            if result is not None:
+                                yield {'type': 'delta', 'content': result.content}
+                                yield {'type': 'result', 'result': result}
+                                return
+                            reason = f"OpenRouter returned {response.status_code}"
+                        else:
+                            async for line in response.aiter_lines():
+                                delta, chunk_usage, done = self._parse_stream_line(line)
+                                if done:
+                                    break
+                                usage = chunk_usage or usage
+                                if delta:
+                                    streamed = True
+                                    yield {'type': 'delta', 'content': delta}
+                            self.breakers.record(breaker_keys, ok=True)
+                            yield self._stream_result(started, usage)
+                            return
+                except (GeneratorExit, asyncio.CancelledError):
+                    # Client left mid-stream: no verdict on the provider
+                    self.breakers.release(breaker_keys)
+                    raise
+                except httpx.TimeoutException:
+                    self.breakers.record(breaker_keys, ok=False, timeout=True)
+                    logger.exception("OpenRouter stream timed out; falling back to Hugging Face")
+                    reason, fallback_reason = "OpenRouter timed out", "timeout"
+                except httpx.HTTPError:
+                    self.breakers.record(breaker_keys, ok=False)
+                    logger.exception("OpenRouter stream network error; falling back to Hugging Face")
+                    reason, fallback_reason = "OpenRouter network error", "network_error"
+                except Exception:
+                    self.breakers.record(breaker_keys, ok=False)
+                    logger.exception("Unexpected error in OpenRouter stream; falling back to Hugging Face")
+                    reason, fallback_reason = "OpenRouter stream error", "stream_error"
+                if streamed:
+                    yield {'type': 'fallback', 'reason': reason, 'fallback_reason': fallback_reason}
+
+        result = replace(await self._acall_hf(selected_model, system_prompt, message, history),
+                         fallback_reason=fallback_reason)
+        yield {'type': 'delta', 'content': result.content}
+        yield {'type': 'result', 'result': result}
+
+    def _summary_entry(self, chat: dict) -> str:
+        return (
+            f"User: {_clip(chat['user_message'], self.summary_chat_tokens // 2)}\n"
+            f"AI: {_clip(chat['ai_response'], self.summary_chat_tokens // 2)}"
+        )
+
+    def summary_batch_size(self, chat_history: list, previous_summary: str = None) -> int:
+        """How many of ``chat_history`` (oldest first) fit one summary prompt, at least one."""
+        budget = self.summary_token_budget - estimate_tokens(previous_summary or '')
+        for n, chat in enumerate(chat_history):
+            cost = estimate_tokens(self._summary_entry(chat))
+            if n and cost > budget:
+                return n
+            budget -= cost
+        return len(chat_history)
+
+    def _summary_history(self, chat_history: list, previous_summary: str = None) -> str:
+        # chat_history is newest first: keep the newest chats that fit the
+        # token budget, then present them oldest first
+        budget = self.summary_token_budget - estimate_tokens(previous_summary or '')
+        entries = []
+        for chat in chat_history:
+            entry = self._summary_entry(chat)
+            cost = estimate_tokens(entry)
+            if entries and cost > budget:
+                break
+            entries.append(entry)
+            budget -= cost
+        return "\n".join(reversed(entries))
+
+    def _summary_model_id(self):
+        # Use the first available model for summary
+        return self.available_models[0]['id'] if self.available_models else None
+
+    def _summary_request(self, chat_history: list, language: str, previous_summary: str = None):
+        history_text = self._summary_history(chat_history, previous_summary)
+        if previous_summary:
+            prompt = self._get_summary_update_prompt(previous_summary, history_text, language)
+        else:
             prompt = self._get_summary_prompt(history_text, language)
-            
-            # Use the first available model for summary
-            if self.available_models:
-                model_id = self.available_models[0]['id']
-                return self.get_response(model_id, prompt, language)
+        return self._summary_model_id(), prompt
+
+    def generate_user_summary(self, chat_history: list, language: str = 'en', previous_summary: str = None) -> str:
+        """Generate AI-powered user summary from chat history (newest first).
+
+        With ``previous_summary`` only the given (new) chats are folded into it.
+        """
+        try:
+            model_id, prompt = self._summary_request(chat_history, language, previous_summary)
+            if model_id:
+                return self.get_response(model_id, prompt, language, use_cache=False, interactive=False)
+            else:
+                return "No models available for summary generation"
+        except Exception as e:
+            return f"Error generating summary: {str(e)}"
+
+    async def agenerate_user_summary(self, chat_history: list, language: str = 'en', previous_summary: str = None) -> str:
+        """Async counterpart of ``generate_user_summary``."""
+        try:
+            model_id, prompt = self._summary_request(chat_history, language, previous_summary)
+            if model_id:
+                return await self.aget_response(model_id, prompt, language, use_cache=False, interactive=False)
             else:
                 return "No models available for summary generation"
         except Exception as e:
             return f"Error generating summary: {str(e)}"
     
-    def _get_system_prompt(self, language: str) -> str:
-        """Get system prompt based on language"""
+    def generate_session_summary(self, turns: list, language: str = 'en', previous_summary: str = None) -> str:
+        """Fold conversation turns (newest first) into a session's running summary."""
+        try:
+            history_text = self._summary_history(turns, previous_summary)
+            prompt = self._get_session_summary_prompt(previous_summary or '', history_text, language)
+            model_id = self._summary_model_id()
+            if model_id:
+                return self.get_response(model_id, prompt, language, use_cache=False, interactive=False)
+            else:
+                return "No models available for summary generation"
+        except Exception as e:
+            return f"Error generating summary: {str(e)}"
+
+    def _get_system_prompt(self, language: str, context: ChatContext = None) -> str:
+        """Get system prompt based on language, with the conversation summary if any"""
+        prompt = self._base_system_prompt(language)
+        if context and context.summary:
+            if language == 'ar':
+                prompt += f"\n\nملخص المحادثة السابقة مع المستخدم:\n{context.summary}"
+            else:
+                prompt += f"\n\nSummary of the earlier conversation with the user:\n{context.summary}"
+        return prompt
+
+    def _base_system_prompt(self, language: str) -> str:
         if language == 'ar':
             return """أنت مساعد ذكاء اصطناعي مفيد وودود. 
             أجب على الأسئلة باللغة العربية بطريقة واضحة ومهذبة.
@@ -212,6 +1134,53 @@ class AIService:
             
             Summary:"""
 
+    def _get_summary_update_prompt(self, summary: str, history: str, language: str) -> str:
+        """Prompt folding new conversations into an existing summary"""
+        if language == 'ar':
+            return f"""هذا ملخص حالي عن اهتمامات المستخدم:
+            
+            {summary}
+            
+            حدّث الملخص بناءً على المحادثات الجديدة التالية، واجعله قصيراً (2-3 جمل):
+            
+            {history}
+            
+            الملخص المحدّث:"""
+        else:
+            return f"""Here is the current summary of the user's interests:
+            
+            {summary}
+            
+            Update it with the following new conversations, keeping it brief (2-3 sentences):
+            
+            {history}
+            
+            Updated summary:"""
+
+
+    def _get_session_summary_prompt(self, summary: str, history: str, language: str) -> str:
+        """Prompt folding earlier turns of a conversation into its running summary"""
+        if language == 'ar':
+            return f"""لخّص المحادثة التالية بين المستخدم والمساعد في فقرة قصيرة تحفظ الحقائق والطلبات والقرارات المهمة لمتابعة الحديث.
+            
+            الملخص الحالي (قد يكون فارغاً):
+            {summary}
+            
+            المحادثة:
+            {history}
+            
+            الملخص المحدّث:"""
+        else:
+            return f"""Summarize the following conversation between the user and the assistant in one short paragraph, keeping the facts, requests and decisions needed to continue it.
+            
+            Current summary (may be empty):
+            {summary}
+            
+            Conversation:
+            {history}
+            
+            Updated summary:"""
+
 
 # Initialize service
 ai_service = AIService()
\ No newline at end of file
@@ -0,0 +1,229 @@
+# api/async_views.py
+"""Async variants of the slow, upstream-bound endpoints.
+
+These are served when ``ASYNC_CHAT_VIEWS`` is enabled and the project runs
+under ``config/asgi.py`` (for example ``gunicorn config.asgi:application -k
+uvicorn.workers.UvicornWorker``). While a view awaits OpenRouter or Hugging
+Face, the worker's event loop keeps serving other requests instead of pinning
+a whole sync worker for up to 90s.
+
+DRF 3.14 has no native async views, so ``async_api_view`` reproduces the parts
+of ``@api_view`` these endpoints rely on: the configured authentication
+classes, the authenticated-user permission check and DRF's JSON encoding.
+"""
+import asyncio
+import functools
+import logging
+import time
+from dataclasses import replace
+
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse
+from rest_framework import exceptions, status
+from rest_framework.parsers import FormParser, JSONParser, MultiPartParser
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+from rest_framework.utils.encoders import JSONEncoder
+
+from .admission import AdmissionRejected
+from .ai_service import ai_service
+from .authentication import hot_path_authentication_classes
+from .context import build_context, load_session
+from .models import Chat
+from .profiling import phase, record_phase
+from .services import aget_or_create_profile
+from .summaries import schedule_session_summary
+from .views import abandoned_result, cache_bypassed, sse_event, sse_response
+
+logger = logging.getLogger('api.async_views')
+
+
+def _json(data, status_code=status.HTTP_200_OK, headers=None):
+    with phase('serialize'):
+        return JsonResponse(data, status=status_code, encoder=JSONEncoder, headers=headers)
+
+
+def _admission_rejected(rejection):
+    return _json(
+        {'error': 'The AI service is busy, please retry shortly', 'retry_after': rejection.retry_after},
+        status.HTTP_503_SERVICE_UNAVAILABLE,
+        headers={'Retry-After': str(rejection.retry_after)},
+    )
+
+
+def async_api_view(http_method_names, require_auth=True, authentication_classes=None):
+    """Minimal ``@api_view`` + ``IsAuthenticated`` equivalent for ``async def`` views."""
+    allowed = [method.upper() for method in http_method_names]
+    if authentication_classes is None:
+        authentication_classes = api_settings.DEFAULT_AUTHENTICATION_CLASSES
+
+    def decorator(func):
+        @functools.wraps(func)
+        async def view(request, *args, **kwargs):
+            if request.method not in allowed:
+                return _json(
+                    {'detail': f'Method "{request.method}" not allowed.'},
+                    status.HTTP_405_METHOD_NOT_ALLOWED,
+                    headers={'Allow': ', '.join(allowed)},
+                )
+            authenticators = [auth() for auth in authentication_classes]
+            drf_request = Request(
+                request,
+                parsers=[JSONParser(), FormParser(), MultiPartParser()],
+                authenticators=authenticators,
+            )
+            auth_headers = {}
+            www_authenticate = authenticators[0].authenticate_header(request) if authenticators else None
+            if www_authenticate:
+                auth_headers['WWW-Authenticate'] = www_authenticate
+            try:
+                # Token authentication may load the user row, so keep it off the event loop
+                user = await sync_to_async(lambda: drf_request.user)()
+            except exceptions.APIException as exc:
+                data = exc.detail if isinstance(exc.detail, (list, dict)) else {'detail': exc.detail}
+                return _json(data, exc.status_code, headers=auth_headers)
+            if require_auth and not (user and user.is_authenticated):
+                exc = exceptions.NotAuthenticated()
+                return _json({'detail': exc.detail}, exc.status_code, headers=auth_headers)
+            return await func(drf_request, *args, **kwargs)
+
+        # JWT-authenticated API, same as DRF's APIView.as_view()
+        view.csrf_exempt = True
+        return view
+
+    return decorator
+
+
+@sync_to_async
+def _load_context(user_id, session_id, model: str, language: str, message: str):
+    """``(session, context)`` for a chat request, or ``(None, None)`` for an unknown session."""
+    session = load_session(user_id, session_id)
+    if session is None:
+        return None, None
+    return session, build_context(session, ai_service.context_budget(model, language), message)
+
+
+@async_api_view(['POST'], authentication_classes=hot_path_authentication_classes())
+async def chat(request):
+    """Handle chat requests with AI models (async)"""
+    try:
+        message = request.data.get('message')
+        model = request.data.get('model', 'auto')
+
+        profile = await aget_or_create_profile(request.user)
+        language = profile.language_preference
+        model = ai_service.resolve_model_id(model, language)
+
+        session = context = None
+        if request.data.get('session_id') is not None:
+            session, context = await _load_context(request.user.id, request.data['session_id'], model, language, message)
+            if session is None:
+                return _json({'error': 'Session not found'}, status.HTTP_404_NOT_FOUND)
+
+        with phase('upstream'):
+            result = await ai_service.aget_result(model, message, language, use_cache=not cache_bypassed(request),
+                                                  context=context, user=request.user.id)
+        ai_response = result.content
+
+        with phase('db_write'):
+            chat = await Chat.objects.acreate(
+                user_id=request.user.id,
+                model=model,
+                user_message=message,
+                ai_response=ai_response,
+                language=language,
+                session_id=session['id'] if session else None,
+                **result.chat_fields()
+            )
+            if context and context.overflow:
+                await sync_to_async(schedule_session_summary)(request.user.id, session['id'])
+
+        return _json({
+            'id': chat.id,
+            'message': message,
+            'response': ai_response,
+            'model': model,
+            'session_id': chat.session_id,
+            'timestamp': chat.created_at
+        })
+
+    except AdmissionRejected as e:
+        return _admission_rejected(e)
+    except Exception:
+        logger.exception("Chat error")
+        return _json(
+            {'error': 'Internal server error'},
+            status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+
+@async_api_view(['POST'], authentication_classes=hot_path_authentication_classes())
+async def chat_stream(request):
+    """Stream the AI reply as Server-Sent Events (async)"""
+    message = request.data.get('message')
+    model = request.data.get('model', 'auto')
+    user = request.user
+    profile = await aget_or_create_profile(user)
+    language = profile.language_preference
+    model = ai_service.resolve_model_id(model, language)
+    use_cache = not cache_bypassed(request)
+
+    session = context = None
+    if request.data.get('session_id') is not None:
+        session, context = await _load_context(user.id, request.data['session_id'], model, language, message)
+        if session is None:
+            return _json({'error': 'Session not found'}, status.HTTP_404_NOT_FOUND)
+    session_id = session['id'] if session else None
+
+    events = ai_service.astream_response(model, message, language, use_cache=use_cache, context=context,
+                                         user=user.id)
+    try:
+        # Waits for admission, so a shed call still gets a plain 503
+        pending = (await events.__anext__())['result']
+    except AdmissionRejected as e:
+        return _admission_rejected(e)
+    started = time.monotonic()
+
+    async def event_stream():
+        nonlocal pending
+        parts = []
+        result = None
+        try:
+            yield sse_event('start', {'model': model, 'session_id': session_id})
+            async for event in events:
+                if event['type'] == 'result':
+                    result = event['result']
+                elif event['type'] == 'fallback':
+                    parts.clear()
+                    pending = replace(pending, provider=Chat.HUGGINGFACE, fallback_reason=event['fallback_reason'])
+                    yield sse_event('fallback', {'reason': event['reason']})
+                else:
+                    parts.append(event['content'])
+                    yield sse_event('delta', {'content': event['content']})
+        except (GeneratorExit, asyncio.CancelledError):
+            # Client went away: keep what was generated so far
+            partial = abandoned_result(pending, parts, started)
+            await Chat.objects.acreate(user_id=user.id, model=model, user_message=message,
+                                       ai_response=partial.content, language=language, session_id=session_id,
+                                       **partial.chat_fields())
+            if context and context.overflow:
+                await sync_to_async(schedule_session_summary)(user.id, session_id)
+            raise
+        except Exception:
+            logger.exception("Chat stream error")
+            yield sse_event('error', {'error': 'Internal server error'})
+            return
+        finally:
+            # Ends the upstream call and frees its admission slot right away
+            await events.aclose()
+        if result.latency_ms is not None:
+            record_phase('upstream', result.latency_ms / 1000)
+        with phase('db_write'):
+            chat = await Chat.objects.acreate(user_id=user.id, model=model, user_message=message,
+                                              ai_response=result.content, language=language, session_id=session_id,
+                                              **result.chat_fields())
+            if context and context.overflow:
+                await sync_to_async(schedule_session_summary)(user.id, session_id)
+        yield sse_event('done', {'id': chat.id, 'model': model, 'timestamp': chat.created_at.isoformat()})
+
+    return sse_response(event_stream())
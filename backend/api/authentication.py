@@ -0,0 +1,111 @@
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.utils.translation import gettext_lazy as _
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.settings import api_settings as drf_settings
+from rest_framework_simplejwt.authentication import (
+    JWTAuthentication as BaseJWTAuthentication,
+    JWTStatelessUserAuthentication,
+)
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .profiling import phase
+
+
+def issue_tokens(user: User) -> RefreshToken:
+    """Refresh token (and, through it, access tokens) carrying the claims that
+    :class:`ClaimsUser` reads, so stateless requests need no user lookup.
+
+    Mutable settings such as the language stay out of the token: views read
+    them from the cached profile, which a change invalidates.
+    """
+    refresh = RefreshToken.for_user(user)
+    refresh['username'] = user.username
+    return refresh
+
+
+def user_state_cache_key(user_id) -> str:
+    return f"api:user-state:{user_id}"
+
+
+def invalidate_user_state(user_id):
+    cache.delete(user_state_cache_key(user_id))
+
+
+def _load_user_state(user_id):
+    """Active/staff flags and username, cached for ``AUTH_USER_STATE_TTL`` seconds.
+
+    Returns None for users that no longer exist. The cache bounds how long a
+    deactivated or deleted user can keep using an unexpired token; with a
+    shared cache the post_save invalidation makes it immediate.
+    """
+    key = user_state_cache_key(user_id)
+    state = cache.get(key)
+    if state is None:
+        row = (
+            User.objects.filter(pk=user_id)
+            .values('username', 'is_active', 'is_staff', 'is_superuser')
+            .first()
+        )
+        state = row or {'missing': True}
+        cache.set(key, state, settings.AUTH_USER_STATE_TTL)
+    return None if state.get('missing') else state
+
+
+class ClaimsUser(TokenUser):
+    """Token-backed user whose id and username come from JWT claims, with
+    flags taken from the cached user state."""
+
+    def __init__(self, token, state=None):
+        super().__init__(token)
+        if state is not None:
+            self.username = state['username']
+            self.is_active = state['is_active']
+            self.is_staff = state['is_staff']
+            self.is_superuser = state['is_superuser']
+
+
+class TimedAuthentication:
+    """Mixin timing ``authenticate`` as the request's ``auth`` phase."""
+
+    def authenticate(self, request):
+        with phase('auth'):
+            return super().authenticate(request)
+
+
+class JWTAuthentication(TimedAuthentication, BaseJWTAuthentication):
+    """simplejwt's authentication (loads the ``User`` row), timed."""
+
+
+class StatelessJWTAuthentication(TimedAuthentication, JWTStatelessUserAuthentication):
+    """JWT authentication that never loads the ``User`` row per request.
+
+    ``request.user`` is a :class:`ClaimsUser`, so views must filter and
+    create rows with ``user_id=request.user.id`` rather than passing the user.
+    Only a cache miss on the user state costs a (single, narrow) query.
+    """
+
+    def get_user(self, validated_token):
+        if api_settings.USER_ID_CLAIM not in validated_token:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+        state = _load_user_state(validated_token[api_settings.USER_ID_CLAIM])
+        if state is None:
+            raise AuthenticationFailed(_("User not found"), code="user_not_found")
+        if not state['is_active']:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+        return ClaimsUser(validated_token, state)
+
+
+def hot_path_authentication_classes():
+    """Authenticators for the busiest endpoints (chat, history, export).
+
+    ``JWT_STATELESS_AUTH`` swaps in :class:`StatelessJWTAuthentication`;
+    otherwise they use the project defaults like every other view.
+    """
+    if settings.JWT_STATELESS_AUTH:
+        return [StatelessJWTAuthentication]
+    return list(drf_settings.DEFAULT_AUTHENTICATION_CLASSES)
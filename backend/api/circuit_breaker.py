@@ -0,0 +1,194 @@
+import os
+import time
+import logging
+import threading
+from collections import deque
+from typing import Any, Callable, Dict, Iterable, List
+
+logger = logging.getLogger('api.circuit_breaker')
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitBreaker:
+    """Closed / open / half-open breaker driven by recent failure and timeout rates.
+
+    While closed, outcomes from the last ``window`` seconds are kept; once at
+    least ``min_calls`` were seen and the share of failures plus timeouts
+    reaches ``failure_rate_threshold`` the breaker opens. After
+    ``open_seconds`` it lets up to ``half_open_max_calls`` probe requests
+    through: a successful probe closes it, a failed one re-opens it.
+    """
+
+    def __init__(self, name: str, failure_rate_threshold: float = 0.5, min_calls: int = 5,
+                 window: float = 60, open_seconds: float = 30, half_open_max_calls: int = 1,
+                 probe_timeout: float = 90):
+        self.name = name
+        self.failure_rate_threshold = failure_rate_threshold
+        self.min_calls = min_calls
+        self.window = window
+        self.open_seconds = open_seconds
+        self.half_open_max_calls = half_open_max_calls
+        self.probe_timeout = probe_timeout
+        self.state = CLOSED
+        self.opened_at = None
+        self.listeners: List[Callable[['CircuitBreaker', str, str], None]] = []
+        self._outcomes = deque()  # (timestamp, outcome) with outcome in success/failure/timeout
+        self._probes = deque()  # start times of in-flight half-open probes
+        self._lock = threading.Lock()
+        self.rejected = 0
+
+    def _transition(self, new_state: str):
+        old_state, self.state = self.state, new_state
+        if new_state == OPEN:
+            self.opened_at = time.monotonic()
+            self._probes.clear()
+        elif new_state == CLOSED:
+            self.opened_at = None
+            self._outcomes.clear()
+            self._probes.clear()
+        log = logger.warning if new_state == OPEN else logger.info
+        log(f"Circuit breaker '{self.name}' {old_state} -> {new_state}")
+        for listener in self.listeners:
+            try:
+                listener(self, old_state, new_state)
+            except Exception:
+                logger.exception("Circuit breaker listener failed")
+
+    def _expire(self, now: float):
+        while self._outcomes and self._outcomes[0][0] < now - self.window:
+            self._outcomes.popleft()
+        while self._probes and self._probes[0] < now - self.probe_timeout:
+            self._probes.popleft()
+
+    def can_attempt(self) -> bool:
+        """Whether a call would be let through right now (no side effects)."""
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN:
+                return now - self.opened_at >= self.open_seconds
+            return len(self._probes) < self.half_open_max_calls
+
+    def on_attempt(self):
+        """Register a call that ``can_attempt`` allowed; it may become a half-open probe."""
+        now = time.monotonic()
+        with self._lock:
+            if self.state == OPEN and now - self.opened_at >= self.open_seconds:
+                self._transition(HALF_OPEN)
+            if self.state == HALF_OPEN:
+                self._probes.append(now)
+
+    def cancel_attempt(self):
+        """Undo ``on_attempt`` for a call that was never made, freeing its probe slot."""
+        with self._lock:
+            if self.state == HALF_OPEN and self._probes:
+                self._probes.pop()
+
+    def record_success(self):
+        self._record('success')
+
+    def record_failure(self, timeout: bool = False):
+        self._record('timeout' if timeout else 'failure')
+
+    def _record(self, outcome: str):
+        now = time.monotonic()
+        with self._lock:
+            if self.state == HALF_OPEN:
+                if self._probes:
+                    self._probes.popleft()
+                self._transition(CLOSED if outcome == 'success' else OPEN)
+                return
+            if self.state == OPEN:
+                return
+            self._outcomes.append((now, outcome))
+            self._expire(now)
+            calls = len(self._outcomes)
+            failures = sum(1 for _, o in self._outcomes if o != 'success')
+            if calls >= self.min_calls and failures / calls >= self.failure_rate_threshold:
+                self._transition(OPEN)
+
+    def snapshot(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            calls = len(self._outcomes)
+            failures = sum(1 for _, o in self._outcomes if o == 'failure')
+            timeouts = sum(1 for _, o in self._outcomes if o == 'timeout')
+            return {
+                'state': self.state,
+                'calls': calls,
+                'failure_rate': round(failures / calls, 4) if calls else 0.0,
+                'timeout_rate': round(timeouts / calls, 4) if calls else 0.0,
+                'rejected': self.rejected,
+                'retry_in_seconds': (
+                    round(max(0.0, self.open_seconds - (now - self.opened_at)), 1)
+                    if self.state == OPEN else 0.0
+                ),
+            }
+
+
+class BreakerBoard:
+    """Lazily created breakers keyed by provider (``openrouter``) or provider+model
+    (``openrouter:<model id>``), configured from ``AI_BREAKER_*`` settings."""
+
+    def __init__(self):
+        self.enabled = os.getenv('AI_BREAKER_ENABLED', 'True').lower() in ('1', 'true', 'yes')
+        self.config = {
+            'failure_rate_threshold': float(os.getenv('AI_BREAKER_FAILURE_RATE', '0.5')),
+            'min_calls': int(os.getenv('AI_BREAKER_MIN_CALLS', '5')),
+            'window': float(os.getenv('AI_BREAKER_WINDOW', '60')),
+            'open_seconds': float(os.getenv('AI_BREAKER_OPEN_SECONDS', '30')),
+            'half_open_max_calls': int(os.getenv('AI_BREAKER_HALF_OPEN_CALLS', '1')),
+        }
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._lock = threading.Lock()
+        self.listeners: List[Callable[[CircuitBreaker, str, str], None]] = []
+
+    def get(self, key: str) -> CircuitBreaker:
+        breaker = self._breakers.get(key)
+        if breaker is None:
+            with self._lock:
+                breaker = self._breakers.get(key)
+                if breaker is None:
+                    breaker = CircuitBreaker(key, **self.config)
+                    breaker.listeners = self.listeners
+                    self._breakers[key] = breaker
+        return breaker
+
+    def allow(self, keys: Iterable[str]) -> bool:
+        """True if every breaker in ``keys`` lets the call through; registers the attempt."""
+        if not self.enabled:
+            return True
+        breakers = [self.get(key) for key in keys]
+        blocked = [b for b in breakers if not b.can_attempt()]
+        if blocked:
+            for breaker in blocked:
+                breaker.rejected += 1
+            return False
+        for breaker in breakers:
+            breaker.on_attempt()
+        return True
+
+    def release(self, keys: Iterable[str]):
+        """Give back an attempt ``allow`` registered when the call is dropped before it is made."""
+        if not self.enabled:
+            return
+        for key in keys:
+            self.get(key).cancel_attempt()
+
+    def record(self, keys: Iterable[str], ok: bool, timeout: bool = False):
+        if not self.enabled:
+            return
+        for key in keys:
+            if ok:
+                self.get(key).record_success()
+            else:
+                self.get(key).record_failure(timeout=timeout)
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        return {key: breaker.snapshot() for key, breaker in sorted(self._breakers.items())}
@@ -0,0 +1,104 @@
+from dataclasses import dataclass
+from typing import Tuple
+
+from .models import Chat, ChatSession
+
+# Newest turns of a session considered for one request's context window
+MAX_CONTEXT_TURNS = 40
+# Role markers and separators around each turn in the prompt
+TURN_OVERHEAD_TOKENS = 8
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (about four characters per token) for prompt budgets."""
+    return (len(text or '') + 3) // 4
+
+
+def chat_tokens(user_message: str, ai_response: str) -> int:
+    """Value stored in ``Chat.token_count`` for a turn."""
+    return estimate_tokens(user_message) + estimate_tokens(ai_response)
+
+
+@dataclass(frozen=True)
+class ChatContext:
+    """Conversation context sent ahead of a new message.
+
+    ``turns`` are ``(user_message, ai_response)`` pairs, oldest first;
+    ``summary`` covers the session's turns before them. ``overflow`` is set
+    when unsummarized turns had to be left out, which is the cue to fold
+    them into the summary.
+    """
+
+    summary: str = ''
+    turns: Tuple[Tuple[str, str], ...] = ()
+    overflow: bool = False
+
+    def __bool__(self):
+        return bool(self.summary or self.turns)
+
+
+def load_session(user_id: int, session_id):
+    """The user's session as a dict with its summary, or None if there is no such session."""
+    try:
+        session_id = int(session_id)
+    except (TypeError, ValueError):
+        return None
+    return (
+        ChatSession.objects.filter(pk=session_id, user_id=user_id)
+        .values('id', 'summary', 'summarized_through')
+        .first()
+    )
+
+
+def _window(session_id: int, summarized_through, budget: int):
+    """Ids of the newest unsummarized turns fitting ``budget``, newest first,
+    and whether older unsummarized turns were left out. Sized from the stored
+    token counts, so no message text is read.
+    """
+    rows = Chat.objects.filter(session_id=session_id)
+    if summarized_through is not None:
+        rows = rows.filter(created_at__gt=summarized_through)
+    rows = list(rows.order_by('-created_at', '-pk').values_list('pk', 'token_count')[:MAX_CONTEXT_TURNS + 1])
+    packed = []
+    for pk, tokens in rows[:MAX_CONTEXT_TURNS]:
+        cost = tokens + TURN_OVERHEAD_TOKENS
+        if cost > budget:
+            return packed, True
+        packed.append(pk)
+        budget -= cost
+    return packed, len(rows) > MAX_CONTEXT_TURNS
+
+
+def build_context(session: dict, budget: int, message: str) -> ChatContext:
+    """Pack the newest turns of ``session`` (from :func:`load_session`) into ``budget`` tokens.
+
+    The budget covers the session summary, the packed turns and the new
+    ``message``; the system prompt and the reply are outside it.
+    """
+    summary = session['summary']
+    budget -= estimate_tokens(summary) + estimate_tokens(message)
+    packed, overflow = _window(session['id'], session['summarized_through'], max(budget, 0))
+    turns = ()
+    if packed:
+        texts = Chat.objects.filter(pk__in=packed).values_list('pk', 'user_message', 'ai_response')
+        by_id = {pk: (user_message, ai_response) for pk, user_message, ai_response in texts}
+        turns = tuple(by_id[pk] for pk in reversed(packed) if pk in by_id)
+    return ChatContext(summary=summary, turns=turns, overflow=overflow)
+
+
+def turns_to_fold(session_id: int, summarized_through, keep_budget: int):
+    """Unsummarized turns older than the newest ``keep_budget`` tokens, newest first.
+
+    Keeping half of the context budget unsummarized means a session is
+    folded every few turns rather than on every turn once it is full.
+    """
+    kept, _ = _window(session_id, summarized_through, keep_budget)
+    rows = Chat.objects.filter(session_id=session_id)
+    if summarized_through is not None:
+        rows = rows.filter(created_at__gt=summarized_through)
+    if kept:
+        oldest_kept = Chat.objects.filter(pk=kept[-1]).values_list('created_at', 'pk').first()
+        if oldest_kept:
+            created_at, pk = oldest_kept
+            rows = rows.exclude(created_at__gt=created_at).exclude(created_at=created_at, pk__gte=pk)
+    return rows.order_by('-created_at', '-pk')
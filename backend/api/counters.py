@@ -0,0 +1,89 @@
+from django.db import transaction
+from django.db.models import Count, F, Max, Value
+from django.db.models.functions import Coalesce, Greatest
+
+from .models import Chat, ChatSession, UserProfile
+
+COUNTER_FIELDS = ('total_chats', 'model_counts', 'last_chat_at')
+
+
+def _bump_model_count(user_id, model, delta):
+    # Runs after an UPDATE of the same profile row in the same transaction,
+    # so the row is already write-locked and this read-modify-write is safe
+    counts = UserProfile.objects.filter(user_id=user_id).values_list('model_counts', flat=True).first()
+    if counts is None:
+        return
+    remaining = counts.get(model, 0) + delta
+    if remaining > 0:
+        counts[model] = remaining
+    else:
+        counts.pop(model, None)
+    UserProfile.objects.filter(user_id=user_id).update(model_counts=counts)
+
+
+def chat_created(chat: Chat):
+    """Count a new chat on its user's profile and session."""
+    with transaction.atomic():
+        updated = UserProfile.objects.filter(user_id=chat.user_id).update(
+            total_chats=F('total_chats') + 1,
+            last_chat_at=Greatest(Coalesce('last_chat_at', Value(chat.created_at)), Value(chat.created_at)),
+        )
+        if updated:
+            _bump_model_count(chat.user_id, chat.model, 1)
+        if chat.session_id:
+            ChatSession.objects.filter(pk=chat.session_id).update(
+                message_count=F('message_count') + 1,
+                updated_at=chat.created_at,
+            )
+
+
+def chat_deleted(chat: Chat):
+    """Undo :func:`chat_created` for a deleted chat."""
+    with transaction.atomic():
+        updated = UserProfile.objects.filter(user_id=chat.user_id, total_chats__gt=0).update(
+            total_chats=F('total_chats') - 1,
+        )
+        if updated:
+            _bump_model_count(chat.user_id, chat.model, -1)
+            UserProfile.objects.filter(user_id=chat.user_id, last_chat_at__lte=chat.created_at).update(
+                last_chat_at=Chat.objects.filter(user_id=chat.user_id).aggregate(latest=Max('created_at'))['latest'],
+            )
+        if chat.session_id:
+            ChatSession.objects.filter(pk=chat.session_id, message_count__gt=0).update(
+                message_count=F('message_count') - 1,
+            )
+
+
+def rebuild_counters(user_ids=None) -> int:
+    """Recompute profile and session counters from the chats table.
+
+    Pass ``user_ids`` to limit the rebuild; returns the number of profiles updated.
+    """
+    profiles = UserProfile.objects.all()
+    sessions = ChatSession.objects.all()
+    if user_ids is not None:
+        profiles = profiles.filter(user_id__in=user_ids)
+        sessions = sessions.filter(user_id__in=user_ids)
+
+    rebuilt = 0
+    for profile in profiles.only('id', 'user_id').iterator(chunk_size=500):
+        with transaction.atomic():
+            # Hold the profile row so concurrent chat_created calls wait for the rebuild
+            list(UserProfile.objects.select_for_update().filter(pk=profile.pk).values_list('pk'))
+            per_model = list(
+                Chat.objects.filter(user_id=profile.user_id)
+                .values('model')
+                .annotate(count=Count('id'), latest=Max('created_at'))
+            )
+            model_counts = {row['model']: row['count'] for row in per_model}
+            latest = max((row['latest'] for row in per_model), default=None)
+            UserProfile.objects.filter(pk=profile.pk).update(
+                total_chats=sum(model_counts.values()),
+                model_counts=model_counts,
+                last_chat_at=latest,
+            )
+        rebuilt += 1
+
+    for session in sessions.annotate(count=Count('chats')).only('id').iterator(chunk_size=500):
+        ChatSession.objects.filter(pk=session.pk).update(message_count=session.count)
+    return rebuilt
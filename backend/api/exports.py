@@ -0,0 +1,90 @@
+import zlib
+from typing import AsyncIterator, Iterable, Iterator
+
+from asgiref.sync import sync_to_async
+
+from .renderers import dumps
+
+# Rows fetched per round trip by the export's server-side cursor
+EXPORT_CHUNK_SIZE = 2000
+
+EXPORT_FIELDS = ('created_at', 'model', 'user_message', 'ai_response', 'language')
+
+# Rows are buffered into chunks of about this many bytes before being
+# written, which keeps per-row overhead low without holding the history in memory
+_CHUNK_BYTES = 64 * 1024
+
+
+def _export_row(row) -> dict:
+    return {
+        'date': row['created_at'].isoformat(),
+        'model': row['model'],
+        'user_message': row['user_message'],
+        'ai_response': row['ai_response'],
+        'language': row['language'],
+    }
+
+
+def _buffered(parts: Iterable[bytes]) -> Iterator[bytes]:
+    buffer, size = [], 0
+    for part in parts:
+        buffer.append(part)
+        size += len(part)
+        if size >= _CHUNK_BYTES:
+            yield b''.join(buffer)
+            buffer, size = [], 0
+    if buffer:
+        yield b''.join(buffer)
+
+
+def iter_json_export(rows: Iterable[dict], user: str, export_date: str) -> Iterator[bytes]:
+    """One JSON document; ``total_chats`` is written after the array since it
+    is only known once every row has been streamed."""
+    def parts():
+        yield b'{"user": ' + dumps(user) + b', "export_date": ' + dumps(export_date) + b', "chats": ['
+        total = 0
+        for row in rows:
+            yield (b', ' if total else b'') + dumps(_export_row(row))
+            total += 1
+        yield b'], "total_chats": %d}' % total
+    return _buffered(parts())
+
+
+def iter_ndjson_export(rows: Iterable[dict], user: str, export_date: str) -> Iterator[bytes]:
+    """A header line with the export metadata, then one chat per line."""
+    def parts():
+        yield dumps({'user': user, 'export_date': export_date}) + b'\n'
+        for row in rows:
+            yield dumps(_export_row(row)) + b'\n'
+    return _buffered(parts())
+
+
+def gzip_stream(chunks: Iterable[bytes]) -> Iterator[bytes]:
+    """Gzip chunks on the fly (wbits=31 writes the gzip header and trailer)."""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+async def aiter_chunks(chunks: Iterable[bytes]) -> AsyncIterator[bytes]:
+    """Serve a sync export stream to an ASGI server one chunk at a time.
+
+    Django would otherwise read a sync iterator to the end before sending
+    anything. Each chunk is produced in the request's sync thread, which
+    also owns the server-side cursor.
+    """
+    chunks = iter(chunks)
+    pull = sync_to_async(next, thread_sensitive=True)
+    try:
+        while True:
+            chunk = await pull(chunks, None)
+            if chunk is None:
+                return
+            yield chunk
+    finally:
+        close = getattr(chunks, 'close', None)
+        if close is not None:
+            await sync_to_async(close, thread_sensitive=True)()
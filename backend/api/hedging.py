@@ -0,0 +1,66 @@
+import os
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict
+
+logger = logging.getLogger('api.hedging')
+
+
+class HedgePolicy:
+    """Settings and counters for hedged Hugging Face fallback requests.
+
+    When enabled, a request still waiting on OpenRouter after the model's
+    recent p95 latency also fires its ``hf_repo`` fallback; the first usable
+    answer wins. Configure with:
+
+    - ``AI_HEDGE_ENABLED``: master switch (default off)
+    - ``AI_HEDGE_DEFAULT_DELAY``: seconds to wait while a model has too few samples
+    - ``AI_HEDGE_MIN_SAMPLES``: samples needed before the model's p95 is trusted
+    - ``AI_HEDGE_MIN_DELAY`` / ``AI_HEDGE_MAX_DELAY``: clamp for the p95 delay
+    - ``AI_HEDGE_MAX_WORKERS``: threads available to the sync views; a
+      hedged chat holds up to two of them until its losing call times out
+
+    ``both_failed`` counts hedged requests where neither provider answered.
+    """
+
+    def __init__(self):
+        self.enabled = os.getenv('AI_HEDGE_ENABLED', 'False').lower() in ('1', 'true', 'yes')
+        self.default_delay = float(os.getenv('AI_HEDGE_DEFAULT_DELAY', '5'))
+        self.min_samples = int(os.getenv('AI_HEDGE_MIN_SAMPLES', '20'))
+        self.min_delay = float(os.getenv('AI_HEDGE_MIN_DELAY', '1'))
+        self.max_delay = float(os.getenv('AI_HEDGE_MAX_DELAY', '20'))
+        self.max_workers = int(os.getenv('AI_HEDGE_MAX_WORKERS', '32'))
+        self._executor = None
+        self._lock = threading.Lock()
+        self._counters: Dict[str, Dict[str, int]] = {}
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='hedge')
+        return self._executor
+
+    def delay_for(self, stats: Dict[str, Any]) -> float:
+        """Seconds to wait on OpenRouter before hedging, from a ``ModelStats`` snapshot."""
+        if stats['samples'] < self.min_samples or not stats['p95_ms']:
+            return self.default_delay
+        return min(self.max_delay, max(self.min_delay, stats['p95_ms'] / 1000))
+
+    def count(self, model_id: str, event: str):
+        """Bump ``requests``, ``hedged``, ``hedge_wins``, ``primary_wins`` or ``both_failed`` for a model."""
+        with self._lock:
+            counters = self._counters.setdefault(
+                model_id, {'requests': 0, 'hedged': 0, 'hedge_wins': 0, 'primary_wins': 0, 'both_failed': 0}
+            )
+            counters[event] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            models = {model_id: dict(counters) for model_id, counters in self._counters.items()}
+        for counters in models.values():
+            counters['hedge_rate'] = round(counters['hedged'] / counters['requests'], 4) if counters['requests'] else 0.0
+            counters['win_rate'] = round(counters['hedge_wins'] / counters['hedged'], 4) if counters['hedged'] else 0.0
+        return {'enabled': self.enabled, 'models': models}
@@ -0,0 +1,175 @@
+import os
+import asyncio
+import logging
+import threading
+import weakref
+from http.cookiejar import DefaultCookiePolicy
+from typing import Dict, Optional
+from urllib.parse import urlsplit
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger('api.http_client')
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, default))
+    except (TypeError, ValueError):
+        logger.warning(f"Invalid integer for {name}; using {default}")
+        return default
+
+
+class ProviderSession:
+    """Keep-alive HTTP session for a single upstream provider.
+
+    Wraps a ``requests.Session`` with a sized connection pool so repeated chats
+    reuse TCP+TLS connections instead of paying a fresh handshake every time.
+    Cookies are never stored, which keeps the session free of shared mutable
+    state when it is used from several gunicorn threads at once.
+    """
+
+    def __init__(self, name: str, base_url: str, pool_connections: int = 4, pool_maxsize: int = 10):
+        self.name = name
+        self.base_url = base_url
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.session = requests.Session()
+        self.session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+        adapter = HTTPAdapter(
+            pool_connections=pool_connections,
+            pool_maxsize=pool_maxsize,
+            max_retries=0,
+        )
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    @property
+    def origin(self) -> str:
+        parts = urlsplit(self.base_url)
+        return f"{parts.scheme}://{parts.netloc}/"
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        return self.session.post(url, **kwargs)
+
+    def warm(self, connections: int = 1, timeout: float = 5.0) -> int:
+        """Open up to ``connections`` pooled connections to the provider origin.
+
+        Each warm-up request runs on its own thread so the pool ends up holding
+        that many idle, already-handshaked connections. Returns how many succeeded.
+        """
+        connections = max(1, min(connections, self.pool_maxsize))
+        succeeded = []
+
+        def _open():
+            try:
+                self.session.head(self.origin, timeout=timeout, allow_redirects=False)
+                succeeded.append(True)
+            except requests.exceptions.RequestException as e:
+                logger.warning(f"Pre-warming {self.name} connection failed: {e}")
+
+        threads = [threading.Thread(target=_open, daemon=True) for _ in range(connections)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join(timeout + 1)
+        logger.info(f"Pre-warmed {len(succeeded)}/{connections} connection(s) to {self.name}")
+        return len(succeeded)
+
+    def close(self):
+        self.session.close()
+
+
+class ProviderTransport:
+    """Registry of per-provider pooled sessions, created lazily and thread-safely.
+
+    Pool sizes default to ``AI_HTTP_POOL_CONNECTIONS`` / ``AI_HTTP_POOL_MAXSIZE``
+    and can be tuned per provider with ``<PROVIDER>_POOL_MAXSIZE`` (for example
+    ``OPENROUTER_POOL_MAXSIZE``). Size the pool to at least the number of
+    gunicorn threads per worker so no request waits on a connection.
+    """
+
+    def __init__(self):
+        self._sessions: Dict[str, ProviderSession] = {}
+        self._base_urls: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        self.default_pool_connections = _env_int('AI_HTTP_POOL_CONNECTIONS', 4)
+        self.default_pool_maxsize = _env_int('AI_HTTP_POOL_MAXSIZE', 10)
+
+    def register(self, provider: str, base_url: str):
+        self._base_urls[provider] = base_url
+
+    def session(self, provider: str) -> ProviderSession:
+        session = self._sessions.get(provider)
+        if session is not None:
+            return session
+        with self._lock:
+            session = self._sessions.get(provider)
+            if session is None:
+                prefix = provider.upper()
+                session = ProviderSession(
+                    provider,
+                    self._base_urls.get(provider, ''),
+                    pool_connections=_env_int(f'{prefix}_POOL_CONNECTIONS', self.default_pool_connections),
+                    pool_maxsize=_env_int(f'{prefix}_POOL_MAXSIZE', self.default_pool_maxsize),
+                )
+                self._sessions[provider] = session
+        return session
+
+    def post(self, provider: str, url: str, **kwargs) -> requests.Response:
+        return self.session(provider).post(url, **kwargs)
+
+    def warm(self, providers: Optional[list] = None, connections: Optional[int] = None) -> Dict[str, int]:
+        """Pre-warm pooled connections, typically once per worker at boot."""
+        if connections is None:
+            connections = _env_int('AI_HTTP_PREWARM_CONNECTIONS', 2)
+        results = {}
+        for provider in providers or list(self._base_urls):
+            results[provider] = self.session(provider).warm(connections)
+        return results
+
+    def close(self):
+        with self._lock:
+            for session in self._sessions.values():
+                session.close()
+            self._sessions.clear()
+
+
+class AsyncProviderTransport:
+    """Per-provider ``httpx.AsyncClient`` pools for the async chat pipeline.
+
+    An ``AsyncClient`` is bound to the event loop it was first used on, so
+    clients are kept per running loop. Under an ASGI server there is one loop
+    per worker and every in-flight chat shares its keep-alive pool; limits are
+    set with ``AI_ASYNC_MAX_CONNECTIONS`` and ``AI_ASYNC_MAX_KEEPALIVE``.
+    """
+
+    def __init__(self):
+        self._clients = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+        self.limits = httpx.Limits(
+            max_connections=_env_int('AI_ASYNC_MAX_CONNECTIONS', 200),
+            max_keepalive_connections=_env_int('AI_ASYNC_MAX_KEEPALIVE', 20),
+        )
+
+    def client(self, provider: str) -> httpx.AsyncClient:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            clients = self._clients.setdefault(loop, {})
+            client = clients.get(provider)
+            if client is None or client.is_closed:
+                client = httpx.AsyncClient(limits=self.limits)
+                clients[provider] = client
+        return client
+
+    async def post(self, provider: str, url: str, **kwargs) -> httpx.Response:
+        return await self.client(provider).post(url, **kwargs)
+
+    async def aclose(self):
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            clients = self._clients.pop(loop, {})
+        for client in clients.values():
+            await client.aclose()
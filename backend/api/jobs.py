@@ -0,0 +1,286 @@
+import os
+import socket
+import logging
+import threading
+import time
+from datetime import timedelta
+from typing import Callable, Dict, Iterable, Optional
+
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Job, JobWorker
+
+logger = logging.getLogger('api.jobs')
+
+# Database-backed job queue. Views enqueue a Job row and answer 202 at once;
+# `manage.py run_jobs` workers claim due jobs with a conditional UPDATE (so
+# several workers never run the same job), call the handler registered for
+# its kind and record the result. Failures are retried with exponential
+# backoff; jobs whose worker died are re-queued after JOB_STALE_AFTER.
+# Workers record a heartbeat; while none is fresh (no worker deployed, or it
+# is down) enqueue drains the queue on a thread of the web process instead.
+
+_handlers: Dict[str, Callable[[Job], object]] = {}
+
+
+class PermanentJobError(Exception):
+    """Raised by handlers for failures a retry cannot fix."""
+
+
+def register(kind: str):
+    """Decorator registering ``handler(job) -> result`` for a job kind.
+
+    The result must be JSON-serializable; it is stored on the job.
+    """
+    def decorator(handler):
+        _handlers[kind] = handler
+        return handler
+    return decorator
+
+
+def enqueue(kind: str, user_id: int, payload: Optional[dict] = None, unique: bool = True) -> Job:
+    """Queue a job, or with ``unique`` return the user's pending job of this
+    kind and payload.
+
+    With ``JOBS_EAGER`` the job runs before this returns (development and
+    tests without a worker). Without a live ``run_jobs`` worker it runs on a
+    thread of this process once the transaction commits.
+    """
+    if unique:
+        pending = (
+            Job.objects.filter(user_id=user_id, kind=kind, payload=payload or {},
+                               status__in=[Job.QUEUED, Job.RUNNING])
+            .order_by('id').first()
+        )
+        if pending is not None:
+            _ensure_consumer()
+            return pending
+    job = Job.objects.create(
+        kind=kind, user_id=user_id, payload=payload or {},
+        max_attempts=settings.JOB_MAX_ATTEMPTS,
+    )
+    if settings.JOBS_EAGER:
+        claimed = _claim_job(job.pk, f'eager:{os.getpid()}', timezone.now())
+        if claimed is not None:
+            run_job(claimed)
+        job.refresh_from_db()
+    else:
+        _ensure_consumer()
+    return job
+
+
+def workers_alive() -> bool:
+    """Whether a ``run_jobs`` worker sent a heartbeat within JOB_WORKER_TIMEOUT."""
+    cutoff = timezone.now() - timedelta(seconds=settings.JOB_WORKER_TIMEOUT)
+    return JobWorker.objects.filter(last_seen__gte=cutoff).exists()
+
+
+_fallback_lock = threading.Lock()
+_fallback_kicked = threading.Event()
+_fallback_thread: Optional[threading.Thread] = None
+_fallback_warned = False
+
+
+def _ensure_consumer():
+    if not workers_alive():
+        transaction.on_commit(run_in_process)
+
+
+def run_in_process():
+    """Drain due jobs on a background thread of this process.
+
+    At most one such thread runs per process; a call while it is draining
+    makes it poll once more before exiting, so the new job is not missed.
+    """
+    global _fallback_thread, _fallback_warned
+    with _fallback_lock:
+        _fallback_kicked.set()
+        if _fallback_thread is not None:
+            return _fallback_thread
+        if not _fallback_warned:
+            _fallback_warned = True
+            logger.warning("No job worker heartbeat: running jobs in the web process (start `manage.py run_jobs`)")
+        _fallback_thread = threading.Thread(target=_drain, name='job-fallback', daemon=True)
+        _fallback_thread.start()
+        return _fallback_thread
+
+
+def _drain():
+    global _fallback_thread
+    while True:
+        _fallback_kicked.clear()
+        # No heartbeat: this thread must not pass for a worker
+        Worker(heartbeat=False).run(burst=True)
+        with _fallback_lock:
+            if not _fallback_kicked.is_set():
+                _fallback_thread = None
+                return
+
+
+def set_progress(job: Job, percent: int):
+    """Report handler progress (0-100) to the status endpoint."""
+    job.progress = percent
+    Job.objects.filter(pk=job.pk, locked_by=job.locked_by).update(progress=percent)
+
+
+def _below_limit(kind: str) -> bool:
+    # Approximate across workers (checked before claiming), exact per worker
+    limit = settings.JOB_KIND_LIMITS.get(kind)
+    if not limit:
+        return True
+    return Job.objects.filter(kind=kind, status=Job.RUNNING).count() < limit
+
+
+def _claim_job(pk: int, worker_id: str, now) -> Optional[Job]:
+    claimed = Job.objects.filter(pk=pk, status=Job.QUEUED).update(
+        status=Job.RUNNING, locked_by=worker_id, locked_at=now, attempts=F('attempts') + 1,
+    )
+    return Job.objects.get(pk=pk) if claimed else None
+
+
+def claim(worker_id: str, kinds: Optional[Iterable[str]] = None) -> Optional[Job]:
+    """Claim the next due job, oldest first, respecting per-kind limits."""
+    now = timezone.now()
+    due = Job.objects.filter(status=Job.QUEUED, run_after__lte=now)
+    if kinds:
+        due = due.filter(kind__in=list(kinds))
+    for candidate in due.order_by('run_after', 'id').values('pk', 'kind')[:10]:
+        if not _below_limit(candidate['kind']):
+            continue
+        job = _claim_job(candidate['pk'], worker_id, now)
+        if job is not None:
+            return job
+    return None
+
+
+def _retry_delay(attempts: int) -> timedelta:
+    return timedelta(seconds=settings.JOB_RETRY_DELAY * 2 ** max(attempts - 1, 0))
+
+
+def run_job(job: Job):
+    """Run a claimed job and record its outcome."""
+    handler = _handlers.get(job.kind)
+    owned = Job.objects.filter(pk=job.pk, locked_by=job.locked_by, status=Job.RUNNING)
+    started = time.monotonic()
+    try:
+        if handler is None:
+            raise PermanentJobError(f"No handler registered for job kind '{job.kind}'")
+        result = handler(job)
+    except Exception as e:
+        permanent = isinstance(e, PermanentJobError)
+        if not permanent:
+            logger.exception(f"Job {job.pk} ({job.kind}) failed on attempt {job.attempts}")
+        if permanent or job.attempts >= job.max_attempts:
+            owned.update(status=Job.FAILED, error=str(e), finished_at=timezone.now())
+        else:
+            owned.update(
+                status=Job.QUEUED, error=str(e), locked_by='', locked_at=None,
+                run_after=timezone.now() + _retry_delay(job.attempts),
+            )
+        return
+    owned.update(
+        status=Job.SUCCEEDED, progress=100, result=result, error='', finished_at=timezone.now(),
+    )
+    logger.info(f"Job {job.pk} ({job.kind}) succeeded in {time.monotonic() - started:.2f}s")
+
+
+def requeue_stale() -> int:
+    """Hand jobs whose worker stopped responding back to the queue."""
+    cutoff = timezone.now() - timedelta(seconds=settings.JOB_STALE_AFTER)
+    stale = Job.objects.filter(status=Job.RUNNING, locked_at__lt=cutoff)
+    failed = stale.filter(attempts__gte=F('max_attempts')).update(
+        status=Job.FAILED, error='Worker stopped before the job finished', finished_at=timezone.now(),
+    )
+    requeued = stale.update(status=Job.QUEUED, locked_by='', locked_at=None, run_after=timezone.now())
+    if failed or requeued:
+        logger.warning(f"Recovered stale jobs: {requeued} re-queued, {failed} failed")
+    return requeued
+
+
+class Worker:
+    """Runs queued jobs on ``concurrency`` threads until stopped.
+
+    In ``burst`` mode each thread exits once no job is due. With
+    ``heartbeat`` the worker checks in every JOB_HEARTBEAT_INTERVAL seconds
+    so web processes leave the queue to it.
+    """
+
+    def __init__(self, kinds: Optional[Iterable[str]] = None, concurrency: int = 1, poll_interval: float = 1.0,
+                 heartbeat: bool = True):
+        self.kinds = list(kinds) if kinds else None
+        self.concurrency = max(1, concurrency)
+        self.poll_interval = poll_interval
+        self.heartbeat = heartbeat
+        self.name = f"{socket.gethostname()}:{os.getpid()}"
+        self.stopping = threading.Event()
+        self._reap_lock = threading.Lock()
+        self._last_reap = 0.0
+
+    def stop(self):
+        self.stopping.set()
+
+    def run(self, burst: bool = False):
+        threads = [
+            threading.Thread(target=self._loop, args=(f"{self.name}:{n}", burst), name=f"job-worker-{n}", daemon=True)
+            for n in range(self.concurrency)
+        ]
+        beating = threading.Event()
+        if self.heartbeat:
+            self._beat()
+            threading.Thread(target=self._beat_loop, args=(beating,), name='job-heartbeat', daemon=True).start()
+        for thread in threads:
+            thread.start()
+        try:
+            for thread in threads:
+                # Join in short steps so signals still reach the main thread
+                while thread.is_alive():
+                    thread.join(0.5)
+        finally:
+            beating.set()
+            if self.heartbeat:
+                # Stopped cleanly: web processes take over at once
+                JobWorker.objects.filter(name=self.name).delete()
+
+    def _beat(self):
+        JobWorker.objects.update_or_create(name=self.name, defaults={'last_seen': timezone.now()})
+
+    def _beat_loop(self, done: threading.Event):
+        # Its own thread, so long-running jobs do not delay the heartbeat
+        try:
+            while not done.wait(settings.JOB_HEARTBEAT_INTERVAL):
+                try:
+                    self._beat()
+                except Exception:
+                    logger.exception("Job worker heartbeat failed")
+        finally:
+            connection.close()
+
+    def _maybe_reap(self):
+        with self._reap_lock:
+            if time.monotonic() - self._last_reap < settings.JOB_STALE_AFTER / 2:
+                return
+            self._last_reap = time.monotonic()
+        requeue_stale()
+
+    def _loop(self, worker_id: str, burst: bool):
+        try:
+            while not self.stopping.is_set():
+                close_old_connections()
+                try:
+                    self._maybe_reap()
+                    job = claim(worker_id, self.kinds)
+                except Exception:
+                    logger.exception("Job queue poll failed")
+                    self.stopping.wait(self.poll_interval)
+                    continue
+                if job is None:
+                    if burst:
+                        return
+                    self.stopping.wait(self.poll_interval)
+                    continue
+                run_job(job)
+        finally:
+            connection.close()
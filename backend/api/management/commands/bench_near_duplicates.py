@@ -0,0 +1,102 @@
+import random
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand
+
+from api.near_duplicates import NearDuplicateIndex
+
+_SCOPE = 'bench-near-duplicates'
+_LATIN = 'abcdefghijklmnopqrstuvwxyz'
+_ARABIC = '\u0627\u0628\u062A\u062B\u062C\u062D\u062E\u062F\u0630\u0631\u0632\u0633\u0634\u0635\u0636\u0637\u0638\u0639\u063A\u0641\u0642\u0643\u0644\u0645\u0646\u0647\u0648\u064A'
+_DIACRITICS = '\u064B\u064E\u064F\u0650\u0651\u0652'
+
+
+def _percentile(sorted_values, pct):
+    return sorted_values[min(len(sorted_values) - 1, int(pct / 100 * len(sorted_values)))]
+
+
+class Command(BaseCommand):
+    help = (
+        "Fill a near-duplicate index with synthetic English and Arabic prompts and "
+        "report add/lookup latency, hit rates and memory per entry."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--entries', type=int, default=NearDuplicateIndex.MAX_ENTRIES,
+                            help='Prompts stored in the index')
+        parser.add_argument('--queries', type=int, default=10000, help='Timed lookups, split between near-duplicates and unseen prompts')
+        parser.add_argument('--memory-sample', type=int, default=50000,
+                            help='Entries added under tracemalloc to estimate memory per entry')
+        parser.add_argument('--seed', type=int, default=1)
+
+    def handle(self, *args, entries, queries, memory_sample, seed, **options):
+        rng = random.Random(seed)
+        vocabulary = [self._word(rng, _LATIN) for _ in range(20000)] + \
+                     [self._word(rng, _ARABIC) for _ in range(20000)]
+
+        def prompt():
+            return ' '.join(rng.choice(vocabulary) for _ in range(rng.randint(6, 30)))
+
+        self.stdout.write(f"Memory: {self._bytes_per_entry(prompt, min(memory_sample, entries)):.0f} bytes/entry "
+                          f"(1-character responses; add the response text)")
+
+        index = NearDuplicateIndex(max_entries=entries)
+        stored = []
+        started = time.perf_counter()
+        for _ in range(entries):
+            text = prompt()
+            index.add(_SCOPE, text, 'response')
+            if len(stored) < queries:
+                stored.append(text)
+        add_seconds = time.perf_counter() - started
+        self.stdout.write(f"Added {entries} entries: {add_seconds / entries * 1e6:.1f} us/add")
+
+        third = queries // 3
+        reworded = [self._perturb(rng, text) for text in stored[:third]]
+        edited = [self._replace_word(rng, text, vocabulary) for text in stored[third:2 * third]]
+        fresh = [prompt() for _ in range(queries - 2 * third)]
+        for label, texts in (('reworded', reworded), ('one word changed', edited), ('unseen', fresh)):
+            timings, hits = [], 0
+            for text in texts:
+                started = time.perf_counter()
+                hits += index.query(_SCOPE, text) is not None
+                timings.append(time.perf_counter() - started)
+            timings.sort()
+            self.stdout.write(
+                f"{label:>16} lookups: p50 {_percentile(timings, 50) * 1e6:6.1f} us  "
+                f"p99 {_percentile(timings, 99) * 1e6:6.1f} us  hit rate {hits / len(texts):.3f}"
+            )
+
+    @staticmethod
+    def _word(rng, alphabet):
+        return ''.join(rng.choice(alphabet) for _ in range(rng.randint(2, 8)))
+
+    @staticmethod
+    def _perturb(rng, text):
+        """Same prompt with the changes normalization removes: case, punctuation, diacritics."""
+        chars = []
+        for ch in text:
+            chars.append(ch.upper() if rng.random() < 0.3 else ch)
+            if ch in _ARABIC and rng.random() < 0.3:
+                chars.append(rng.choice(_DIACRITICS))
+        return ''.join(chars) + rng.choice(('?', '!', ' ...', '\u061F'))
+
+    @staticmethod
+    def _replace_word(rng, text, vocabulary):
+        words = text.split()
+        words[rng.randrange(len(words))] = rng.choice(vocabulary)
+        return ' '.join(words)
+
+    @staticmethod
+    def _bytes_per_entry(prompt, count):
+        texts = [prompt() for _ in range(count)]
+        tracemalloc.start()
+        try:
+            index = NearDuplicateIndex(max_entries=count)
+            baseline = tracemalloc.get_traced_memory()[0]
+            for text in texts:
+                index.add(_SCOPE, text, 'r')
+            return (tracemalloc.get_traced_memory()[0] - baseline) / count
+        finally:
+            tracemalloc.stop()
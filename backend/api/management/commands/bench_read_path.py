@@ -0,0 +1,67 @@
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+
+from api.models import Chat
+from api.renderers import FastJSONRenderer
+from api.serializers import CHAT_ROW_FIELDS, ChatSerializer, chat_rows
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare rows/sec of ChatSerializer + JSONRenderer against the .values() "
+        "fast path on one large chat page. Test data is rolled back afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=10000, help='Chats in the benchmark page')
+        parser.add_argument('--repeat', type=int, default=5, help='Timed runs per path (best is reported)')
+
+    def handle(self, *args, rows, repeat, **options):
+        try:
+            with transaction.atomic():
+                user = User.objects.create(username='bench-read-path')
+                Chat.objects.bulk_create(
+                    [
+                        Chat(user=user, model='meta-llama/llama-3.3-70b-instruct:free',
+                             user_message=f'Question {i} about something',
+                             ai_response='An answer of moderate length. ' * 20, language='en')
+                        for i in range(rows)
+                    ],
+                    batch_size=2000,
+                )
+                self._run(user, rows, repeat)
+                raise _Rollback
+        except _Rollback:
+            pass
+
+    def _time(self, fn, repeat):
+        best = float('inf')
+        for _ in range(repeat):
+            started = time.perf_counter()
+            payload = fn()
+            best = min(best, time.perf_counter() - started)
+        return best, len(payload)
+
+    def _run(self, user, rows, repeat):
+        def serializer_path():
+            # Fresh user instance so every run pays the per-row user lookup, as a request would
+            chats = Chat.objects.filter(user_id=user.pk).order_by('-created_at')[:rows]
+            return JSONRenderer().render(ChatSerializer(chats, many=True).data)
+
+        def values_path():
+            page = Chat.objects.filter(user_id=user.pk).order_by('-created_at').values(*CHAT_ROW_FIELDS)[:rows]
+            return FastJSONRenderer().render(chat_rows(page, user.username))
+
+        for label, fn in (('ChatSerializer', serializer_path), ('values fast path', values_path)):
+            seconds, size = self._time(fn, repeat)
+            self.stdout.write(
+                f"{label:>18}: {seconds * 1000:8.1f} ms  {rows / seconds:10.0f} rows/s  {size / 1024:8.0f} KB"
+            )
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from api.counters import rebuild_counters
+
+
+class Command(BaseCommand):
+    help = "Recompute the denormalized chat counters on user profiles and chat sessions."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, action='append', dest='user_ids',
+                            help='Only rebuild this user id (repeatable)')
+
+    def handle(self, *args, user_ids=None, **options):
+        rebuilt = rebuild_counters(user_ids)
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt chat counters for {rebuilt} profile(s)"))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from api.search import rebuild_index
+
+
+class Command(BaseCommand):
+    help = "Rebuild the full-text search index over chat messages."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, action='append', dest='user_ids',
+                            help='Only rebuild this user id (repeatable)')
+
+    def handle(self, *args, user_ids=None, **options):
+        indexed = rebuild_index(user_ids)
+        self.stdout.write(self.style.SUCCESS(f"Indexed {indexed} chat(s)"))
@@ -0,0 +1,29 @@
+import signal
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from api.jobs import Worker
+
+
+class Command(BaseCommand):
+    help = "Run background jobs (profile summaries) from the database queue."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=settings.JOB_WORKER_CONCURRENCY,
+                            help='Jobs run in parallel by this worker')
+        parser.add_argument('--kind', action='append', dest='kinds',
+                            help='Only run jobs of this kind (repeatable)')
+        parser.add_argument('--poll-interval', type=float, default=1.0,
+                            help='Seconds between polls when the queue is empty')
+        parser.add_argument('--burst', action='store_true',
+                            help='Exit once no job is due instead of waiting for more')
+
+    def handle(self, *args, concurrency, kinds, poll_interval, burst, **options):
+        worker = Worker(kinds=kinds, concurrency=concurrency, poll_interval=poll_interval)
+        # Finish the running jobs, then exit
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(signum, lambda *_: worker.stop())
+        self.stdout.write(f"Job worker {worker.name} started with concurrency {worker.concurrency}")
+        worker.run(burst=burst)
+        self.stdout.write(self.style.SUCCESS("Job worker stopped"))
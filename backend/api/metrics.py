@@ -0,0 +1,188 @@
+import os
+import time
+import logging
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+
+from . import profiling
+
+try:
+    import prometheus_client
+    from prometheus_client import multiprocess
+except ImportError:  # prometheus-client is optional; metrics become no-ops
+    prometheus_client = None
+
+logger = logging.getLogger('api.metrics')
+
+# Prometheus metrics for the chat pipeline, served in text format at /metrics.
+#
+# Under gunicorn every worker is its own process, so gunicorn.conf.py points
+# PROMETHEUS_MULTIPROC_DIR at a shared directory: each worker writes its
+# samples to memory-mapped files there and a scrape of any worker merges the
+# files of all of them. Without that variable (runserver, a single uvicorn
+# process) the numbers live in the serving process.
+
+ENABLED = prometheus_client is not None and os.getenv('METRICS_ENABLED', 'True').lower() in ('1', 'true', 'yes')
+
+# Chat requests and upstream calls can take up to a minute and a half
+LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 90)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+
+class _NoopMetric:
+    def labels(self, *args, **kwargs):
+        return self
+
+    def observe(self, value):
+        pass
+
+    def inc(self, amount=1):
+        pass
+
+
+def _metric(kind: str, name: str, documentation: str, labelnames=(), **kwargs):
+    if not ENABLED:
+        return _NoopMetric()
+    return getattr(prometheus_client, kind)(name, documentation, labelnames, **kwargs)
+
+
+REQUEST_LATENCY = _metric(
+    'Histogram', 'http_request_duration_seconds',
+    'Time to serve a request, through the end of streamed bodies',
+    ['view', 'method', 'status'], buckets=LATENCY_BUCKETS,
+)
+REQUEST_DB_QUERIES = _metric(
+    'Histogram', 'http_request_db_queries', 'Database queries run by one request',
+    ['view'], buckets=QUERY_COUNT_BUCKETS,
+)
+REQUEST_DB_TIME = _metric(
+    'Histogram', 'http_request_db_seconds', 'Time one request spent in database queries',
+    ['view'], buckets=LATENCY_BUCKETS,
+)
+UPSTREAM_LATENCY = _metric(
+    'Histogram', 'ai_upstream_duration_seconds',
+    'Upstream call that produced a reply, by provider, model and outcome (ok or error)',
+    ['provider', 'model', 'outcome'], buckets=LATENCY_BUCKETS,
+)
+FALLBACKS = _metric(
+    'Counter', 'ai_fallbacks', 'Replies served by the Hugging Face fallback, by reason',
+    ['model', 'reason'],
+)
+TOKENS = _metric(
+    'Counter', 'ai_tokens', 'Tokens reported by the provider, by kind (prompt or completion)',
+    ['provider', 'model', 'kind'],
+)
+CACHE_LOOKUPS = _metric(
+    'Counter', 'ai_cache_lookups', 'Response cache lookups, by result (hit, near_hit or miss)',
+    ['result'],
+)
+ADMISSIONS = _metric(
+    'Counter', 'ai_admissions', 'Upstream admission decisions per model key (admitted or rejected)',
+    ['key', 'outcome'],
+)
+ADMISSION_WAIT = _metric(
+    'Histogram', 'ai_admission_wait_seconds', 'Time admitted upstream calls waited in the fair queue',
+    ['key'], buckets=LATENCY_BUCKETS,
+)
+
+
+def observe_result(model_id: str, result):
+    """Record an upstream reply (an ``api.ai_service.AIResult``)."""
+    if result.latency_ms is not None:
+        outcome = 'ok' if result.ok else 'error'
+        UPSTREAM_LATENCY.labels(result.provider, model_id, outcome).observe(result.latency_ms / 1000)
+    if result.fallback_reason:
+        FALLBACKS.labels(model_id, result.fallback_reason).inc()
+    if result.prompt_tokens:
+        TOKENS.labels(result.provider, model_id, 'prompt').inc(result.prompt_tokens)
+    if result.completion_tokens:
+        TOKENS.labels(result.provider, model_id, 'completion').inc(result.completion_tokens)
+
+
+def render() -> bytes:
+    """Current metrics in the Prometheus text exposition format."""
+    registry = prometheus_client.REGISTRY
+    if 'PROMETHEUS_MULTIPROC_DIR' in os.environ:
+        registry = prometheus_client.CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    return prometheus_client.generate_latest(registry)
+
+
+CONTENT_TYPE = prometheus_client.CONTENT_TYPE_LATEST if prometheus_client else 'text/plain'
+
+
+class MetricsMiddleware:
+    """Request latency and per-request database query histograms, per view.
+
+    Streamed responses are measured when the body is exhausted. Place it
+    first in MIDDLEWARE so the whole stack is timed.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not ENABLED:
+            return self.get_response(request)
+        started, profile = time.perf_counter(), profiling.start(request)
+        response = None
+        try:
+            response = self.get_response(request)
+            return self._finish(request, response, started, profile)
+        finally:
+            # Streams are finished once their body has been sent
+            if response is None or not response.streaming:
+                profiling.finish(request)
+
+    async def __acall__(self, request):
+        if not ENABLED:
+            return await self.get_response(request)
+        started, profile = time.perf_counter(), profiling.start(request)
+        response = None
+        try:
+            response = await self.get_response(request)
+            return self._finish(request, response, started, profile)
+        finally:
+            if response is None or not response.streaming:
+                profiling.finish(request)
+
+    def _finish(self, request, response, started, profile):
+        view = profiling.view_name(request)
+
+        def observe():
+            REQUEST_LATENCY.labels(view, request.method, str(response.status_code)).observe(
+                time.perf_counter() - started
+            )
+            REQUEST_DB_QUERIES.labels(view).observe(profile.query_count)
+            REQUEST_DB_TIME.labels(view).observe(profile.query_seconds)
+            profiling.finish(request)
+
+        if not response.streaming:
+            observe()
+        elif response.is_async:
+            response.streaming_content = _aobserve_after(response.streaming_content, observe)
+        else:
+            response.streaming_content = _observe_after(response.streaming_content, observe)
+        return response
+
+
+def _observe_after(content, observe):
+    try:
+        yield from content
+    finally:
+        observe()
+
+
+async def _aobserve_after(content, observe):
+    try:
+        async for chunk in content:
+            yield chunk
+    finally:
+        observe()
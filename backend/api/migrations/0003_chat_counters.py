@@ -0,0 +1,55 @@
+# Generated by Django 4.2.7 on 2026-10-18 05:21
+
+from django.db import migrations, models
+from django.db.models import Count, Max
+import django.db.models.deletion
+
+
+def backfill_counters(apps, schema_editor):
+    Chat = apps.get_model('api', 'Chat')
+    UserProfile = apps.get_model('api', 'UserProfile')
+    per_user = {}
+    for row in Chat.objects.values('user_id', 'model').annotate(count=Count('id'), latest=Max('created_at')):
+        counts, latest = per_user.get(row['user_id'], ({}, None))
+        counts[row['model']] = row['count']
+        per_user[row['user_id']] = (counts, max(filter(None, (latest, row['latest']))))
+    for user_id, (counts, latest) in per_user.items():
+        UserProfile.objects.filter(user_id=user_id).update(
+            total_chats=sum(counts.values()), model_counts=counts, last_chat_at=latest,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0002_widen_chat_model'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chat',
+            name='session',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='chats', to='api.chatsession'),
+        ),
+        migrations.AddField(
+            model_name='chatsession',
+            name='message_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='userprofile',
+            name='last_chat_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='userprofile',
+            name='model_counts',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AddField(
+            model_name='userprofile',
+            name='total_chats',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
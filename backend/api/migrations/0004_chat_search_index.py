@@ -0,0 +1,97 @@
+import re
+import unicodedata
+
+from django.db import migrations
+
+# Frozen copy of the search index schema and text normalization as of this
+# migration; later changes to api.search must not alter what it creates.
+# ``python manage.py rebuild_search_index`` re-indexes with the current code.
+SQLITE_CREATE = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS api_chat_fts "
+    "USING fts5(user_message, ai_response, owner, tokenize='unicode61', prefix='2 3')",
+]
+SQLITE_DROP = ["DROP TABLE IF EXISTS api_chat_fts"]
+
+POSTGRES_CREATE = [
+    "CREATE TABLE IF NOT EXISTS api_chat_search ("
+    "chat_id bigint PRIMARY KEY REFERENCES chats (id) ON DELETE CASCADE DEFERRABLE INITIALLY DEFERRED, "
+    "user_id integer NOT NULL, "
+    "document tsvector NOT NULL)",
+    "CREATE INDEX IF NOT EXISTS api_chat_search_document ON api_chat_search USING gin (document)",
+    "CREATE INDEX IF NOT EXISTS api_chat_search_user_id ON api_chat_search (user_id)",
+]
+POSTGRES_DROP = ["DROP TABLE IF EXISTS api_chat_search"]
+
+BACKFILL_CHUNK_SIZE = 2000
+
+_ARABIC_DIACRITICS = re.compile('[\u0610-\u061A\u064B-\u065F\u0670\u06D6-\u06ED]')
+_ARABIC_LETTER_MAP = str.maketrans({
+    '\u0622': '\u0627', '\u0623': '\u0627', '\u0625': '\u0627', '\u0671': '\u0627',
+    '\u0649': '\u064A', '\u0629': '\u0647', '\u0624': '\u0648', '\u0626': '\u064A',
+})
+
+
+def _normalize(text):
+    text = unicodedata.normalize('NFKC', text or '').casefold()
+    text = _ARABIC_DIACRITICS.sub('', text).replace('\u0640', '')
+    text = text.translate(_ARABIC_LETTER_MAP)
+    text = ''.join(ch if unicodedata.category(ch)[0] in ('L', 'N') else ' ' for ch in text)
+    return ' '.join(text.split())
+
+
+def _index(cursor, vendor, rows):
+    rows = [(pk, user_id, _normalize(user_message), _normalize(ai_response))
+            for pk, user_id, user_message, ai_response in rows]
+    if not rows:
+        return
+    if vendor == 'sqlite':
+        cursor.executemany(
+            "INSERT INTO api_chat_fts (rowid, user_message, ai_response, owner) VALUES (%s, %s, %s, %s)",
+            [(pk, user_message, ai_response, f'u{user_id}') for pk, user_id, user_message, ai_response in rows],
+        )
+    else:
+        cursor.executemany(
+            "INSERT INTO api_chat_search (chat_id, user_id, document) VALUES "
+            "(%s, %s, setweight(to_tsvector('simple', %s), 'A') || setweight(to_tsvector('simple', %s), 'B')) "
+            "ON CONFLICT (chat_id) DO NOTHING",
+            rows,
+        )
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    statements = {'sqlite': SQLITE_CREATE, 'postgresql': POSTGRES_CREATE}.get(vendor)
+    if statements is None:
+        return
+    for statement in statements:
+        schema_editor.execute(statement)
+
+    Chat = apps.get_model('api', 'Chat')
+    rows = Chat.objects.using(schema_editor.connection.alias).values_list(
+        'id', 'user_id', 'user_message', 'ai_response'
+    )
+    batch = []
+    with schema_editor.connection.cursor() as cursor:
+        for row in rows.iterator(chunk_size=BACKFILL_CHUNK_SIZE):
+            batch.append(row)
+            if len(batch) >= BACKFILL_CHUNK_SIZE:
+                _index(cursor, vendor, batch)
+                batch = []
+        _index(cursor, vendor, batch)
+
+
+def drop_search_index(apps, schema_editor):
+    statements = {'sqlite': SQLITE_DROP, 'postgresql': POSTGRES_DROP}.get(schema_editor.connection.vendor, [])
+    for statement in statements:
+        schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_chat_counters'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
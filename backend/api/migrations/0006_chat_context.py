@@ -0,0 +1,43 @@
+# Generated by Django 4.2.7 on 2026-10-18 05:33
+
+from django.db import migrations, models
+from django.db.models import Value
+from django.db.models.functions import Length
+
+
+def backfill_token_counts(apps, schema_editor):
+    # Same estimate as api.context.estimate_tokens, about 4 characters per token
+    Chat = apps.get_model('api', 'Chat')
+    Chat.objects.update(
+        token_count=(Length('user_message') + Value(3)) / Value(4) + (Length('ai_response') + Value(3)) / Value(4),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_jobs'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chat',
+            name='token_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='chatsession',
+            name='summarized_through',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='chatsession',
+            name='summary',
+            field=models.TextField(blank=True),
+        ),
+        migrations.AddIndex(
+            model_name='chat',
+            index=models.Index(fields=['session', '-created_at'], name='chats_session_3b9d1f_idx'),
+        ),
+        migrations.RunPython(backfill_token_counts, migrations.RunPython.noop),
+    ]
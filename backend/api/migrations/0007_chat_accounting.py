@@ -0,0 +1,42 @@
+# Generated by Django 4.2.7 on 2026-10-18 05:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_chat_context'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chat',
+            name='completion_tokens',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='chat',
+            name='fallback_reason',
+            field=models.CharField(blank=True, max_length=50),
+        ),
+        migrations.AddField(
+            model_name='chat',
+            name='prompt_tokens',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='chat',
+            name='provider',
+            field=models.CharField(blank=True, choices=[('openrouter', 'OpenRouter'), ('huggingface', 'Hugging Face'), ('cache', 'Cache')], max_length=20),
+        ),
+        migrations.AddField(
+            model_name='chat',
+            name='upstream_latency_ms',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='chat',
+            index=models.Index(fields=['created_at'], name='chats_created_e8f0e7_idx'),
+        ),
+    ]
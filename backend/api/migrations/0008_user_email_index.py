@@ -0,0 +1,20 @@
+from django.db import migrations
+
+# Case-insensitive exact email lookups in the admin search (see
+# api.admin.IndexedSearchMixin). auth_user belongs to django.contrib.auth,
+# so the expression index is created here; the same SQL works on SQLite
+# and PostgreSQL.
+CREATE = "CREATE INDEX IF NOT EXISTS api_auth_user_email_lower ON auth_user (LOWER(email))"
+DROP = "DROP INDEX IF EXISTS api_auth_user_email_lower"
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('api', '0007_chat_accounting'),
+    ]
+
+    operations = [
+        migrations.RunSQL(CREATE, DROP),
+    ]
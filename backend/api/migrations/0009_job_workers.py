@@ -0,0 +1,25 @@
+# Generated by Django 4.2.7 on 2026-10-18 06:55
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_user_email_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='JobWorker',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True)),
+                ('last_seen', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+            ],
+            options={
+                'db_table': 'job_workers',
+            },
+        ),
+    ]
@@ -0,0 +1,119 @@
+import os
+import time
+import random
+import logging
+import threading
+from collections import deque
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger('api.model_registry')
+
+AUTO_MODEL_ID = 'auto'
+
+
+def _percentile(sorted_values: List[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+class ModelStats:
+    """Rolling latency and error statistics for one model.
+
+    Keeps at most ``max_samples`` outcomes from the last ``window`` seconds.
+    """
+
+    def __init__(self, max_samples: int = 200, window: float = 900):
+        self.window = window
+        self._samples = deque(maxlen=max_samples)  # (timestamp, latency seconds, ok)
+        self._lock = threading.Lock()
+
+    def record(self, latency: float, ok: bool):
+        with self._lock:
+            self._samples.append((time.monotonic(), latency, ok))
+
+    def _recent(self):
+        cutoff = time.monotonic() - self.window
+        with self._lock:
+            while self._samples and self._samples[0][0] < cutoff:
+                self._samples.popleft()
+            return list(self._samples)
+
+    def snapshot(self) -> Dict[str, Any]:
+        samples = self._recent()
+        latencies = sorted(latency for _, latency, ok in samples if ok)
+        errors = sum(1 for _, _, ok in samples if not ok)
+        return {
+            'samples': len(samples),
+            'error_rate': round(errors / len(samples), 4) if samples else 0.0,
+            'p50_ms': round(_percentile(latencies, 50) * 1000, 1),
+            'p95_ms': round(_percentile(latencies, 95) * 1000, 1),
+            'p99_ms': round(_percentile(latencies, 99) * 1000, 1),
+        }
+
+
+class ModelRegistry:
+    """Model catalogue with O(1) lookup and live per-model stats.
+
+    Also implements the virtual ``auto`` model, which routes each request to
+    the currently fastest healthy model that supports the user's language.
+    A model is healthy while its recent error rate is below
+    ``AI_AUTO_MAX_ERROR_RATE``; models with fewer than ``AI_AUTO_MIN_SAMPLES``
+    outcomes are tried first so every model keeps fresh numbers, and a small
+    ``AI_AUTO_EXPLORE_RATE`` share of traffic goes to a random healthy model.
+    """
+
+    def __init__(self, models: List[Dict[str, Any]]):
+        self.models = models
+        self._by_key = {}
+        for model in models:
+            self._by_key.setdefault(model['name'], model)
+        for model in models:
+            self._by_key[model['id']] = model
+        self.stats = {model['id']: ModelStats() for model in models}
+        self.max_error_rate = float(os.getenv('AI_AUTO_MAX_ERROR_RATE', '0.5'))
+        self.min_samples = int(os.getenv('AI_AUTO_MIN_SAMPLES', '5'))
+        self.explore_rate = float(os.getenv('AI_AUTO_EXPLORE_RATE', '0.05'))
+
+    def get(self, model: str) -> Optional[Dict[str, Any]]:
+        return self._by_key.get(model)
+
+    def resolve(self, model: str, language: str = 'en') -> Optional[Dict[str, Any]]:
+        if model == AUTO_MODEL_ID:
+            return self.pick_auto(language)
+        return self.get(model)
+
+    def record(self, model_id: str, latency: float, ok: bool):
+        stats = self.stats.get(model_id)
+        if stats is not None:
+            stats.record(latency, ok)
+
+    def pick_auto(self, language: str = 'en') -> Optional[Dict[str, Any]]:
+        candidates = [m for m in self.models if language in m.get('languages', ('en',))] or list(self.models)
+        if not candidates:
+            return None
+        snapshots = {m['id']: self.stats[m['id']].snapshot() for m in candidates}
+
+        cold = [m for m in candidates if snapshots[m['id']]['samples'] < self.min_samples]
+        if cold:
+            return min(cold, key=lambda m: snapshots[m['id']]['samples'])
+
+        healthy = [m for m in candidates if snapshots[m['id']]['error_rate'] < self.max_error_rate]
+        if not healthy:
+            return min(candidates, key=lambda m: snapshots[m['id']]['error_rate'])
+        if len(healthy) > 1 and random.random() < self.explore_rate:
+            return random.choice(healthy)
+        return min(healthy, key=lambda m: snapshots[m['id']]['p50_ms'])
+
+    def describe(self) -> List[Dict[str, Any]]:
+        """Model list for the API, each entry carrying its live stats, plus ``auto``."""
+        described = [dict(model, stats=self.stats[model['id']].snapshot()) for model in self.models]
+        described.append({
+            'id': AUTO_MODEL_ID,
+            'name': 'Auto',
+            'provider': 'Router',
+            'description': 'Routes each message to the fastest healthy model for your language',
+            'languages': sorted({lang for m in self.models for lang in m.get('languages', ('en',))}),
+        })
+        return described
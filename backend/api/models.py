@@ -13,6 +13,11 @@ class UserProfile(models.Model):
     )
     ai_summary = models.TextField(blank=True, null=True)
     summary_updated_at = models.DateTimeField(default=timezone.now)
+    # Denormalized chat counters, maintained by api.counters on chat
+    # create/delete; `manage.py rebuild_chat_counters` recomputes them
+    total_chats = models.PositiveIntegerField(default=0)
+    model_counts = models.JSONField(default=dict, blank=True)
+    last_chat_at = models.DateTimeField(blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
@@ -27,15 +32,20 @@ class UserProfile(models.Model):
 
 class Chat(models.Model):
     """Store chat conversations with AI models"""
+    # Who produced ai_response; CACHE means no upstream call was made for
+    # this chat (response cache, near-duplicate or a coalesced identical call)
+    OPENROUTER = 'openrouter'
+    HUGGINGFACE = 'huggingface'
+    CACHE = 'cache'
+    PROVIDER_CHOICES = [
+        (OPENROUTER, 'OpenRouter'),
+        (HUGGINGFACE, 'Hugging Face'),
+        (CACHE, 'Cache'),
+    ]
+
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='chats')
-    model = models.CharField(
-        max_length=20,
-        choices=[
-            ('grok', 'Grok AI'),
-            ('deepseek', 'DeepSeek'),
-            ('llama', 'LLaMA')
-        ]
-    )
+    # Concrete model id that served the chat (``auto`` is resolved before saving)
+    model = models.CharField(max_length=100)
     user_message = models.TextField()
     ai_response = models.TextField()
     language = models.CharField(
@@ -43,6 +53,20 @@ class Chat(models.Model):
         choices=[('en', 'English'), ('ar', 'Arabic')],
         default='en'
     )
+    session = models.ForeignKey(
+        'ChatSession', on_delete=models.SET_NULL, null=True, blank=True, related_name='chats'
+    )
+    # Estimated prompt tokens of this turn (message and reply), kept up to date
+    # on save so context packing never has to load the texts to size them
+    token_count = models.PositiveIntegerField(default=0)
+    # Upstream accounting from api.ai_service.AIResult; null when not measured
+    # or not reported (older chats, cache hits, Hugging Face token usage)
+    provider = models.CharField(max_length=20, choices=PROVIDER_CHOICES, blank=True)
+    upstream_latency_ms = models.PositiveIntegerField(blank=True, null=True)
+    prompt_tokens = models.PositiveIntegerField(blank=True, null=True)
+    completion_tokens = models.PositiveIntegerField(blank=True, null=True)
+    # Why OpenRouter did not answer, when the Hugging Face fallback did
+    fallback_reason = models.CharField(max_length=50, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     
     def __str__(self):
@@ -54,6 +78,9 @@ class Chat(models.Model):
         indexes = [
             models.Index(fields=['user', '-created_at']),
             models.Index(fields=['model']),
+            models.Index(fields=['session', '-created_at']),
+            # Usage aggregates over recent chats (api.usage)
+            models.Index(fields=['created_at']),
         ]
 
 
@@ -61,6 +88,12 @@ class ChatSession(models.Model):
     """Group chats into sessions"""
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='chat_sessions')
     title = models.CharField(max_length=255, blank=True)
+    # Maintained like the UserProfile counters
+    message_count = models.PositiveIntegerField(default=0)
+    # Running summary of the turns that no longer fit the context window,
+    # covering every chat up to summarized_through (see api.context)
+    summary = models.TextField(blank=True)
+    summarized_through = models.DateTimeField(blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
@@ -70,3 +103,64 @@ class ChatSession(models.Model):
     class Meta:
         db_table = 'chat_sessions'
         ordering = ['-updated_at']
+
+
+class Job(models.Model):
+    """Background job in the database-backed queue (see api.jobs).
+
+    Picked up by ``manage.py run_jobs`` workers; retried with backoff until
+    ``max_attempts`` is reached.
+    """
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    SUCCEEDED = 'succeeded'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Running'),
+        (SUCCEEDED, 'Succeeded'),
+        (FAILED, 'Failed'),
+    ]
+
+    kind = models.CharField(max_length=50)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='jobs')
+    payload = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=QUEUED)
+    progress = models.PositiveSmallIntegerField(default=0)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=3)
+    run_after = models.DateTimeField(default=timezone.now)
+    locked_by = models.CharField(max_length=100, blank=True)
+    locked_at = models.DateTimeField(blank=True, null=True)
+    result = models.JSONField(blank=True, null=True)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+
+    def __str__(self):
+        return f"Job {self.id} - {self.kind} - {self.status}"
+
+    class Meta:
+        db_table = 'jobs'
+        ordering = ['-created_at']
+        indexes = [
+            # Workers poll for due jobs of a kind
+            models.Index(fields=['status', 'kind', 'run_after']),
+            models.Index(fields=['user', 'kind', 'status']),
+        ]
+
+
+class JobWorker(models.Model):
+    """Heartbeat of a running ``manage.py run_jobs`` worker (see api.jobs).
+
+    While no worker has checked in recently, web processes run queued jobs
+    themselves.
+    """
+    name = models.CharField(max_length=100, unique=True)
+    last_seen = models.DateTimeField(default=timezone.now, db_index=True)
+
+    def __str__(self):
+        return f"Worker {self.name} - {self.last_seen}"
+
+    class Meta:
+        db_table = 'job_workers'
@@ -0,0 +1,281 @@
+import os
+import re
+import sys
+import time
+import logging
+import threading
+import unicodedata
+from array import array
+from collections import OrderedDict
+from itertools import islice
+from typing import Dict, Optional, Tuple, Union
+
+logger = logging.getLogger('api.near_duplicates')
+
+# Arabic harakat, Quranic annotation marks and superscript alef
+_ARABIC_DIACRITICS = re.compile('[\u0610-\u061A\u064B-\u065F\u0670\u06D6-\u06ED]')
+_ARABIC_TATWEEL = '\u0640'
+_ARABIC_LETTER_MAP = str.maketrans({
+    '\u0622': '\u0627',  # alef with madda -> alef
+    '\u0623': '\u0627',  # alef with hamza above -> alef
+    '\u0625': '\u0627',  # alef with hamza below -> alef
+    '\u0671': '\u0627',  # alef wasla -> alef
+    '\u0649': '\u064A',  # alef maksura -> yeh
+    '\u0629': '\u0647',  # teh marbuta -> heh
+    '\u0624': '\u0648',  # waw with hamza -> waw
+    '\u0626': '\u064A',  # yeh with hamza -> yeh
+})
+
+_MASK_32 = (1 << 32) - 1
+_BAND_KEY_MASK = (1 << 30) - 1
+
+
+def normalize_text(text: str) -> str:
+    """Normalize a prompt for near-duplicate matching.
+
+    Applies NFKC, case folding, strips Arabic diacritics and tatweel, unifies
+    alef/yeh/teh-marbuta variants, drops punctuation and collapses whitespace.
+    """
+    text = unicodedata.normalize('NFKC', text or '').casefold()
+    text = _ARABIC_DIACRITICS.sub('', text).replace(_ARABIC_TATWEEL, '')
+    text = text.translate(_ARABIC_LETTER_MAP)
+    text = ''.join(
+        ch if unicodedata.category(ch)[0] in ('L', 'N') else ' '
+        for ch in text
+    )
+    return ' '.join(text.split())
+
+
+
+def shingles(text: str, k: int = 4) -> set:
+    """Character k-shingles of normalized text (word-boundary aware through spaces)."""
+    if len(text) <= k:
+        return {text} if text else set()
+    return {text[i:i + k] for i in range(len(text) - k + 1)}
+
+
+class MinHasher:
+    """One-permutation MinHash signatures with rotation densification.
+
+    Each shingle is hashed once and lands in one of ``num_perm`` bins by its
+    hash; a bin keeps the smallest of the other hash bits it sees. That is a
+    single pass over the shingles instead of one per permutation. An empty
+    bin borrows the value of the next non-empty bin to its right, tagged
+    with the distance, so short prompts still compare bin by bin.
+
+    Python's string hash is randomized per process, which is fine for an
+    index that lives in one worker's memory.
+    """
+
+    # Bin minima keep 27 bits; the 5 bits above hold the densification distance
+    _VALUE_BITS = 27
+    _VALUE_MASK = (1 << _VALUE_BITS) - 1
+
+    def __init__(self, num_perm: int = 32, shingle_size: int = 4):
+        if not 1 <= num_perm <= 32:
+            raise ValueError("num_perm must be between 1 and 32")
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+
+    def signature(self, text: str) -> array:
+        """Signature of normalized ``text``."""
+        bins, k, value_mask = self.num_perm, self.shingle_size, self._VALUE_MASK
+        empty = value_mask + 1
+        mins = [empty] * bins
+        if text:
+            for i in range(max(1, len(text) - k + 1)):
+                h = hash(text[i:i + k]) & 0xFFFFFFFFFFFFFFFF
+                b = h % bins
+                value = (h >> 32) & value_mask
+                if value < mins[b]:
+                    mins[b] = value
+        if empty in mins:
+            if mins.count(empty) == bins:
+                return array('I', [_MASK_32] * bins)
+            source = mins[:]
+            for b in range(bins):
+                if source[b] == empty:
+                    distance = 1
+                    while source[(b + distance) % bins] == empty:
+                        distance += 1
+                    mins[b] = distance << self._VALUE_BITS | source[(b + distance) % bins]
+        return array('I', mins)
+
+
+def estimated_similarity(sig_a: array, sig_b: array) -> float:
+    matches = sum(1 for x, y in zip(sig_a, sig_b) if x == y)
+    return matches / len(sig_a)
+
+
+class NearDuplicateIndex:
+    """Bounded MinHash/LSH index of recent (prompt, response) pairs.
+
+    Each signature is split into ``bands`` of ``rows`` values; prompts sharing
+    any band bucket become candidates and are confirmed against
+    ``threshold`` using the full signature. Lookups touch only a handful of
+    buckets (each scanned for at most ``max_bucket_scan`` of its newest ids),
+    so their cost does not grow with the number of entries. Entries
+    are scoped (model, language, system prompt) so answers never cross models.
+
+    Entries are kept oldest first. With one TTL for all of them that is also
+    expiry order, so every add and lookup sweeps expired entries off the
+    front, and the oldest entry is evicted once ``max_entries`` is reached.
+    A bucket holding one entry stores its id directly, a larger one an
+    insertion-ordered dict, so both removal paths are O(1).
+
+    With the defaults (32 bins, 8 bands of 4 rows) a prompt with Jaccard
+    similarity 0.8 becomes a candidate ~98% of the time; each entry costs
+    about 1 KB plus its response text (``manage.py bench_near_duplicates``
+    measures it), so ``max_entries`` is capped at ``MAX_ENTRIES``.
+    """
+
+    MAX_ENTRIES = 1_000_000
+
+    def __init__(self, num_perm: int = 32, bands: int = 8, threshold: float = 0.8,
+                 max_entries: int = 100_000, ttl: float = 86400, shingle_size: int = 4,
+                 max_bucket_scan: int = 32):
+        if num_perm % bands:
+            raise ValueError("num_perm must be divisible by bands")
+        if max_entries > self.MAX_ENTRIES:
+            logger.warning(f"Near-duplicate index capped at {self.MAX_ENTRIES} entries per worker "
+                           f"(asked for {max_entries})")
+            max_entries = self.MAX_ENTRIES
+        self.hasher = MinHasher(num_perm, shingle_size)
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_bucket_scan = max_bucket_scan
+        self._entries = OrderedDict()  # entry id -> (scope, signature, response, expires_at)
+        self._buckets: Dict[int, Union[int, dict]] = {}  # band key -> entry id, or {entry id: None}
+        self._next_id = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evicted = 0
+
+    def _signature(self, message: str) -> Optional[array]:
+        # Prompts with no letters or digits would all look alike
+        text = normalize_text(message)
+        return self.hasher.signature(text) if text else None
+
+    def _band_keys(self, scope: str, signature: array):
+        rows = self.rows
+        # 30-bit keys are the smallest int objects; a rare collision only adds a candidate
+        return [hash((scope, band, tuple(signature[band * rows:(band + 1) * rows]))) & _BAND_KEY_MASK
+                for band in range(self.bands)]
+
+    def _bucket_add(self, key: int, entry_id: int):
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            self._buckets[key] = entry_id
+        elif type(bucket) is int:
+            self._buckets[key] = {bucket: None, entry_id: None}
+        else:
+            bucket[entry_id] = None
+
+    def _bucket_remove(self, key: int, entry_id: int):
+        bucket = self._buckets.get(key)
+        if bucket == entry_id:
+            del self._buckets[key]
+        elif type(bucket) is dict:
+            bucket.pop(entry_id, None)
+            if len(bucket) == 1:
+                self._buckets[key] = next(iter(bucket))
+
+    def _remove(self, entry_id: int):
+        scope, signature, _, _ = self._entries.pop(entry_id)
+        for key in self._band_keys(scope, signature):
+            self._bucket_remove(key, entry_id)
+
+    def _sweep(self, now: float):
+        entries = self._entries
+        while entries:
+            entry_id, entry = next(iter(entries.items()))
+            if entry[3] > now:
+                return
+            self._remove(entry_id)
+            self.expired += 1
+
+    def add(self, scope: str, message: str, response: str):
+        signature = self._signature(message)
+        if signature is None:
+            return
+        # Every entry of a model shares one scope string
+        scope = sys.intern(scope)
+        now = time.monotonic()
+        with self._lock:
+            self._sweep(now)
+            entry_id = self._next_id
+            self._next_id += 1
+            self._entries[entry_id] = (scope, signature, response, now + self.ttl)
+            for key in self._band_keys(scope, signature):
+                self._bucket_add(key, entry_id)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+                self.evicted += 1
+
+    def query(self, scope: str, message: str) -> Optional[Tuple[str, float]]:
+        """Return ``(response, similarity)`` of the closest stored prompt above threshold."""
+        signature = self._signature(message)
+        now = time.monotonic()
+        best = None
+        with self._lock:
+            self._sweep(now)
+            if signature is None:
+                self.misses += 1
+                return None
+            candidates = set()
+            for key in self._band_keys(scope, signature):
+                bucket = self._buckets.get(key)
+                if bucket is None:
+                    continue
+                if type(bucket) is int:
+                    candidates.add(bucket)
+                else:
+                    # Hot buckets (very common prompts) only contribute their newest entries
+                    candidates.update(islice(reversed(bucket), self.max_bucket_scan))
+            for entry_id in candidates:
+                entry_scope, stored_signature, response, _ = self._entries[entry_id]
+                if entry_scope != scope:
+                    continue
+                similarity = estimated_similarity(signature, stored_signature)
+                if similarity >= self.threshold and (best is None or similarity > best[1]):
+                    best = (response, similarity)
+            if best is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return best
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self._entries),
+            'max_entries': self.max_entries,
+            'buckets': len(self._buckets),
+            'threshold': self.threshold,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0,
+            'expired': self.expired,
+            'evicted': self.evicted,
+        }
+
+
+def index_from_env() -> Optional[NearDuplicateIndex]:
+    """Build the index configured by ``AI_NEAR_DUP_*`` settings, or None when disabled."""
+    if os.getenv('AI_NEAR_DUP_ENABLED', 'False').lower() not in ('1', 'true', 'yes'):
+        return None
+    return NearDuplicateIndex(
+        num_perm=int(os.getenv('AI_NEAR_DUP_NUM_PERM', '32')),
+        bands=int(os.getenv('AI_NEAR_DUP_BANDS', '8')),
+        threshold=float(os.getenv('AI_NEAR_DUP_THRESHOLD', '0.8')),
+        max_entries=int(os.getenv('AI_NEAR_DUP_MAX_ENTRIES', '100000')),
+        ttl=float(os.getenv('AI_NEAR_DUP_TTL', '86400')),
+    )
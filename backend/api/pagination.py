@@ -0,0 +1,160 @@
+import base64
+from datetime import datetime
+
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class _ChatPagination(BasePagination):
+    """Shared page sizing and ``{next, previous, results}`` response shape."""
+
+    page_size = 20
+    max_page_size = 100
+    page_size_query_param = 'page_size'
+
+    def get_page_size(self, request) -> int:
+        try:
+            size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except (TypeError, ValueError):
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+
+class ChatHistoryPagination(_ChatPagination):
+    """Keyset pagination over ``(created_at, id)``, newest first.
+
+    Pages are read straight off the ``(user, -created_at)`` index, so their
+    cost does not depend on how many chats a user has. Cursors are opaque
+    tokens encoding the boundary row: ``?before=<cursor>`` returns older
+    chats and ``?after=<cursor>`` newer ones; ``page_size`` is capped at
+    ``max_page_size``.
+    """
+
+    before_query_param = 'before'
+    after_query_param = 'after'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def encode_cursor(self, chat) -> str:
+        # Pages may hold model instances or ``.values()`` rows
+        if isinstance(chat, dict):
+            created_at, pk = chat['created_at'], chat['id']
+        else:
+            created_at, pk = chat.created_at, chat.pk
+        raw = f"{created_at.isoformat()}|{pk}"
+        return base64.urlsafe_b64encode(raw.encode('ascii')).decode('ascii').rstrip('=')
+
+    def decode_cursor(self, token: str):
+        try:
+            raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)).decode('ascii')
+            created_at, pk = raw.rsplit('|', 1)
+            return datetime.fromisoformat(created_at), int(pk)
+        except (ValueError, UnicodeDecodeError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        page_size = self.get_page_size(request)
+        before = request.query_params.get(self.before_query_param)
+        after = request.query_params.get(self.after_query_param)
+
+        if after and not before:
+            # Walk towards newer rows, then flip back to newest-first
+            created_at, pk = self.decode_cursor(after)
+            rows = list(
+                queryset.filter(created_at__gte=created_at)
+                .exclude(created_at=created_at, pk__lte=pk)
+                .order_by('created_at', 'pk')[:page_size + 1]
+            )
+            self.has_newer = len(rows) > page_size
+            self.has_older = True
+            page = rows[:page_size][::-1]
+        else:
+            queryset = queryset.order_by('-created_at', '-pk')
+            if before:
+                created_at, pk = self.decode_cursor(before)
+                queryset = (
+                    queryset.filter(created_at__lte=created_at)
+                    .exclude(created_at=created_at, pk__gte=pk)
+                )
+            rows = list(queryset[:page_size + 1])
+            self.has_older = len(rows) > page_size
+            self.has_newer = bool(before)
+            page = rows[:page_size]
+
+        self.page = page
+        return page
+
+    def _link(self, param: str, chat):
+        url = self.request.build_absolute_uri()
+        url = remove_query_param(url, self.before_query_param)
+        url = remove_query_param(url, self.after_query_param)
+        return replace_query_param(url, param, self.encode_cursor(chat))
+
+    def get_next_link(self):
+        if not self.page or not self.has_older:
+            return None
+        return self._link(self.before_query_param, self.page[-1])
+
+    def get_previous_link(self):
+        if not self.page or not self.has_newer:
+            return None
+        return self._link(self.after_query_param, self.page[0])
+
+
+class ChatSearchPagination(_ChatPagination):
+    """Page-number pagination over ranked search results.
+
+    Only ``page_size + 1`` matches are fetched per page to tell whether a
+    next page exists, so no total count is ever computed.
+    """
+
+    max_page_size = 50
+    page_query_param = 'page'
+
+    def get_page_number(self, request) -> int:
+        try:
+            return max(1, int(request.query_params.get(self.page_query_param, 1)))
+        except (TypeError, ValueError):
+            raise NotFound('Invalid page')
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        page_size = self.get_page_size(request)
+        self.page_number = self.get_page_number(request)
+        offset = (self.page_number - 1) * page_size
+        rows = queryset[offset:offset + page_size + 1]
+        self.has_next = len(rows) > page_size
+        return rows[:page_size]
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.page_query_param, self.page_number + 1)
+
+    def get_previous_link(self):
+        if self.page_number <= 1:
+            return None
+        url = self.request.build_absolute_uri()
+        if self.page_number == 2:
+            return remove_query_param(url, self.page_query_param)
+        return replace_query_param(url, self.page_query_param, self.page_number - 1)
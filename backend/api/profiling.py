@@ -0,0 +1,286 @@
+import os
+import random
+import cProfile
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Tuple
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.utils import timezone
+
+logger = logging.getLogger('api.profiling')
+
+# Distinct SQL statements kept per request for the slow-request log
+MAX_STATEMENTS = 100
+SQL_LOG_LENGTH = 300
+
+
+class RequestProfile:
+    """Where one request's time went: named phases and database queries."""
+
+    __slots__ = ('phases', 'query_count', 'query_seconds', 'statements')
+
+    def __init__(self):
+        self.phases: Dict[str, float] = {}
+        self.query_count = 0
+        self.query_seconds = 0.0
+        self.statements: Dict[str, List] = {}  # sql -> [count, seconds]
+
+    def add_phase(self, name: str, seconds: float):
+        self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+    def add_query(self, sql: str, seconds: float):
+        self.query_count += 1
+        self.query_seconds += seconds
+        entry = self.statements.get(sql)
+        if entry is None:
+            if len(self.statements) >= MAX_STATEMENTS:
+                return
+            entry = self.statements[sql] = [0, 0.0]
+        entry[0] += 1
+        entry[1] += seconds
+
+    def top_queries(self, limit: int) -> List[Tuple[str, int, float]]:
+        """``(sql, count, seconds)`` of the statements that took longest in total."""
+        ranked = sorted(self.statements.items(), key=lambda item: item[1][1], reverse=True)
+        return [(sql, count, seconds) for sql, (count, seconds) in ranked[:limit]]
+
+
+# Copied into sync_to_async threads, so queries of async views count too
+_current: ContextVar[Optional[RequestProfile]] = ContextVar('request_profile', default=None)
+
+
+def start(request) -> RequestProfile:
+    """The request's profile, created by the first middleware that asks for it."""
+    profile = getattr(request, '_profile', None)
+    if profile is None:
+        profile = request._profile = RequestProfile()
+        request._profile_token = _current.set(profile)
+    return profile
+
+
+def finish(request):
+    """Detach the request's profile once its response is done; safe to call twice.
+
+    Without this a worker thread would count the next request's queries
+    against a finished profile until ``start`` replaced it.
+    """
+    token = request.__dict__.pop('_profile_token', None)
+    if token is None:
+        return
+    try:
+        _current.reset(token)
+    except ValueError:
+        # A streamed body ran in another context than the one that set it
+        _current.set(None)
+
+
+@contextmanager
+def phase(name: str):
+    """Time a block as phase ``name`` of the current request (no-op outside one)."""
+    profile = _current.get()
+    if profile is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        profile.add_phase(name, time.perf_counter() - started)
+
+
+def record_phase(name: str, seconds: float):
+    """Add a phase measured elsewhere (e.g. the upstream time of a stream)."""
+    profile = _current.get()
+    if profile is not None:
+        profile.add_phase(name, seconds)
+
+
+def count_queries(execute, sql, params, many, context):
+    """Execute wrapper installed on every database connection (see api.signals)."""
+    profile = _current.get()
+    if profile is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        profile.add_query(sql, time.perf_counter() - started)
+
+
+def server_timing(profile: RequestProfile, total: float) -> str:
+    """``Server-Timing`` header value: each phase, database time and the total."""
+    entries = [f'{name};dur={seconds * 1000:.1f}' for name, seconds in profile.phases.items()]
+    entries.append(f'db;dur={profile.query_seconds * 1000:.1f};desc="{profile.query_count} queries"')
+    entries.append(f'total;dur={total * 1000:.1f}')
+    return ', '.join(entries)
+
+
+def view_name(request) -> str:
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unmatched'
+    return match.view_name or match.route
+
+
+# One sampled profile per process at a time: cProfile cannot profile two
+# threads at once on Python 3.12
+_profiler_lock = threading.Lock()
+
+
+def _start_profiler() -> Optional[cProfile.Profile]:
+    rate = settings.PROFILE_SAMPLE_RATE
+    if rate <= 0 or random.random() >= rate:
+        return None
+    if not _profiler_lock.acquire(blocking=False):
+        return None
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError:  # another profiler is already active
+        _profiler_lock.release()
+        return None
+    return profiler
+
+
+def _stop_profiler(profiler: cProfile.Profile):
+    profiler.disable()
+    _profiler_lock.release()
+
+
+def _dump(profiler: cProfile.Profile, view: str) -> Optional[str]:
+    os.makedirs(settings.PROFILE_DIR, exist_ok=True)
+    path = os.path.join(
+        settings.PROFILE_DIR,
+        f"{timezone.now():%Y%m%dT%H%M%S}-{view.replace(':', '_').replace('/', '_')}-{os.getpid()}.prof",
+    )
+    try:
+        profiler.dump_stats(path)
+    except OSError:
+        logger.exception("Could not write request profile")
+        return None
+    return path
+
+
+def _log_if_slow(request, status_code: int, total: float, profile: RequestProfile,
+                 profiler: Optional[cProfile.Profile] = None):
+    if total * 1000 < settings.SLOW_REQUEST_MS:
+        return
+    view = view_name(request)
+    phases = ', '.join(f'{name}={seconds * 1000:.0f}ms' for name, seconds in profile.phases.items()) or '-'
+    lines = [
+        f"Slow request {request.method} {request.path} ({view}) -> {status_code} in {total * 1000:.0f}ms; "
+        f"phases: {phases}; {profile.query_count} queries in {profile.query_seconds * 1000:.0f}ms"
+    ]
+    for sql, count, seconds in profile.top_queries(settings.SLOW_REQUEST_TOP_QUERIES):
+        lines.append(f"  {seconds * 1000:.1f}ms x{count}: {sql[:SQL_LOG_LENGTH]}")
+    if profiler is not None:
+        path = _dump(profiler, view)
+        if path:
+            lines.append(f"  profile: {path}")
+    logger.warning('\n'.join(lines))
+
+
+class ProfilingMiddleware:
+    """Break each request into phases and log the slow ones.
+
+    Adds a ``Server-Timing`` header (auth, profile, upstream, db_write and
+    serialize phases where they ran, database time and query count, total)
+    and logs requests slower than ``SLOW_REQUEST_MS`` with their slowest
+    queries. A ``PROFILE_SAMPLE_RATE`` share of sync requests runs under
+    cProfile; the stats of the sampled ones that turn out slow are written
+    to ``PROFILE_DIR``. Streamed responses get the header when the stream
+    starts and are logged once it ends.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+            # An async hook keeps the handler from hopping to a thread for it
+            self.process_template_response = self._aprocess_template_response
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not settings.PROFILING_ENABLED:
+            return self.get_response(request)
+        started, profile = time.perf_counter(), start(request)
+        response = None
+        try:
+            profiler = _start_profiler()
+            try:
+                response = self.get_response(request)
+            finally:
+                if profiler is not None:
+                    _stop_profiler(profiler)
+            return self._finish(request, response, started, profile, profiler)
+        finally:
+            # Streams are finished once their body has been sent
+            if response is None or not response.streaming:
+                finish(request)
+
+    async def __acall__(self, request):
+        if not settings.PROFILING_ENABLED:
+            return await self.get_response(request)
+        # Never sampled: cProfile would record every coroutine on the loop
+        started, profile = time.perf_counter(), start(request)
+        response = None
+        try:
+            response = await self.get_response(request)
+            return self._finish(request, response, started, profile)
+        finally:
+            if response is None or not response.streaming:
+                finish(request)
+
+    def process_template_response(self, request, response):
+        # Runs just before DRF renders the response body
+        profile = getattr(request, '_profile', None)
+        if profile is not None:
+            started = time.perf_counter()
+            response.add_post_render_callback(
+                lambda rendered: profile.add_phase('serialize', time.perf_counter() - started)
+            )
+        return response
+
+    async def _aprocess_template_response(self, request, response):
+        return self.process_template_response(request, response)
+
+    def _finish(self, request, response, started, profile, profiler=None):
+        if settings.SERVER_TIMING_HEADER:
+            response['Server-Timing'] = server_timing(profile, time.perf_counter() - started)
+        if not response.streaming:
+            _log_if_slow(request, response.status_code, time.perf_counter() - started, profile, profiler)
+            return response
+
+        def log():
+            _log_if_slow(request, response.status_code, time.perf_counter() - started, profile)
+            finish(request)
+
+        if response.is_async:
+            response.streaming_content = _alog_after(response.streaming_content, log)
+        else:
+            response.streaming_content = _log_after(response.streaming_content, log)
+        return response
+
+
+def _log_after(content, log):
+    try:
+        yield from content
+    finally:
+        log()
+
+
+async def _alog_after(content, log):
+    try:
+        async for chunk in content:
+            yield chunk
+    finally:
+        log()
@@ -0,0 +1,31 @@
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:  # orjson is optional; fall back to the stdlib encoder
+    orjson = None
+
+_fallback_encoder = JSONEncoder()
+
+
+def dumps(data) -> bytes:
+    """Serialize to UTF-8 JSON, with orjson when it is installed."""
+    if orjson is not None:
+        return orjson.dumps(data, default=_fallback_encoder.default)
+    return _fallback_encoder.encode(data).encode('utf-8')
+
+
+class FastJSONRenderer(JSONRenderer):
+    """JSONRenderer backed by orjson for large, plain payloads such as chat pages.
+
+    Falls back to DRF's own rendering when orjson is missing or when the
+    client asks for indented output.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or data is None:
+            return super().render(data, accepted_media_type, renderer_context)
+        if self.get_indent(accepted_media_type or '', renderer_context or {}):
+            return super().render(data, accepted_media_type, renderer_context)
+        return dumps(data)
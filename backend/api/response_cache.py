@@ -0,0 +1,138 @@
+import os
+import time
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger('api.response_cache')
+
+
+class LRUTTLCache:
+    """Thread-safe in-process cache with LRU and TTL eviction.
+
+    Memory is bounded both by entry count and by the total size reported for
+    the stored values, so a few very long answers cannot crowd out the heap.
+    """
+
+    def __init__(self, max_entries: int = 1000, ttl: float = 3600, max_size: int = 5_000_000):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_size = max_size
+        self._data = OrderedDict()  # key -> (expires_at, size, value)
+        self._size = 0
+        self._lock = threading.Lock()
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: str) -> Optional[Any]:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires_at, size, value = entry
+            if expires_at <= now:
+                del self._data[key]
+                self._size -= size
+                self.expirations += 1
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any, size: int = 1):
+        if size > self.max_size:
+            return
+        with self._lock:
+            old = self._data.pop(key, None)
+            if old is not None:
+                self._size -= old[1]
+            self._data[key] = (time.monotonic() + self.ttl, size, value)
+            self._size += size
+            while len(self._data) > self.max_entries or self._size > self.max_size:
+                _, (_, evicted_size, _) = self._data.popitem(last=False)
+                self._size -= evicted_size
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._size = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+
+def normalize_message(message: str) -> str:
+    """Collapse whitespace and case so trivially different prompts share a key."""
+    return ' '.join((message or '').split()).casefold()
+
+
+class ResponseCache:
+    """Opt-in cache of upstream answers for identical prompts.
+
+    Keys combine the resolved model id, language, system prompt and the
+    normalized user message. Configure with:
+
+    - ``AI_RESPONSE_CACHE_ENABLED``: master switch (default off)
+    - ``AI_RESPONSE_CACHE_MODELS``: comma-separated model ids, or ``*`` for all
+    - ``AI_RESPONSE_CACHE_MAX_ENTRIES`` / ``AI_RESPONSE_CACHE_MAX_CHARS``: memory bounds
+    - ``AI_RESPONSE_CACHE_TTL``: seconds an answer stays fresh
+    """
+
+    def __init__(self):
+        self.enabled = os.getenv('AI_RESPONSE_CACHE_ENABLED', 'False').lower() in ('1', 'true', 'yes')
+        raw_models = os.getenv('AI_RESPONSE_CACHE_MODELS', '*').strip()
+        self.models = None if raw_models in ('', '*') else {m.strip() for m in raw_models.split(',') if m.strip()}
+        self.store = LRUTTLCache(
+            max_entries=int(os.getenv('AI_RESPONSE_CACHE_MAX_ENTRIES', '1000')),
+            ttl=float(os.getenv('AI_RESPONSE_CACHE_TTL', '3600')),
+            max_size=int(os.getenv('AI_RESPONSE_CACHE_MAX_CHARS', '5000000')),
+        )
+        self.hits = 0
+        self.misses = 0
+        self._counter_lock = threading.Lock()
+
+    def allows_model(self, model_id: str) -> bool:
+        return self.models is None or model_id in self.models
+
+    def is_enabled_for(self, model_id: str) -> bool:
+        return self.enabled and self.allows_model(model_id)
+
+    def make_key(self, model_id: str, language: str, system_prompt: str, message: str) -> str:
+        raw = '\x1f'.join([model_id, language, system_prompt, normalize_message(message)])
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        value = self.store.get(key)
+        with self._counter_lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return value
+
+    def set(self, key: str, response: str):
+        # Never cache failures; they are reported to users as "Error: ..." strings
+        if not response or response.startswith('Error'):
+            return
+        self.store.set(key, response, size=len(response))
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            'enabled': self.enabled,
+            'models': sorted(self.models) if self.models is not None else '*',
+            'entries': len(self.store),
+            'size_chars': self.store.size,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0,
+            'evictions': self.store.evictions,
+            'expirations': self.store.expirations,
+        }
@@ -0,0 +1,262 @@
+import html
+import logging
+import re
+from typing import Dict, List, Optional, Tuple
+
+from django.db import connection, transaction
+from django.db.models import Q
+
+from .models import Chat
+from .near_duplicates import normalize_text
+
+logger = logging.getLogger('api.search')
+
+# Full-text index over chat messages, maintained next to the chats table
+# (created by migration 0004):
+#
+# * SQLite: an FTS5 table keyed by the chat id. The ``owner`` column holds a
+#   per-user token so the user filter is part of the MATCH itself.
+# * PostgreSQL: a side table with a weighted tsvector and a GIN index,
+#   removed with its chat through ON DELETE CASCADE.
+#
+# Both store text passed through ``normalize_text`` (case folding, Arabic
+# diacritics/tatweel stripped, alef/yeh/teh-marbuta variants unified) and
+# queries are normalized the same way, so Arabic and English match alike
+# without database-specific tokenizer support.
+SQLITE_TABLE = 'api_chat_fts'
+POSTGRES_TABLE = 'api_chat_search'
+
+# Column weights: the user's own words rank above the model's answer
+USER_MESSAGE_WEIGHT = 2.0
+AI_RESPONSE_WEIGHT = 1.0
+
+SNIPPET_LENGTH = 160
+_HIGHLIGHT_OPEN = '<mark>'
+_HIGHLIGHT_CLOSE = '</mark>'
+# Words of the original text, keeping Arabic marks and tatweel inside the word
+_WORD = re.compile('[\\w\u0610-\u061A\u064B-\u065F\u0670\u06D6-\u06ED\u0640]+')
+
+
+def _owner(user_id) -> str:
+    return f'u{user_id}'
+
+
+def query_terms(query: str) -> List[str]:
+    """Normalized search terms; the last one is matched as a prefix."""
+    return normalize_text(query).split()
+
+
+def _sqlite_match(terms: List[str]) -> str:
+    # Terms only contain letters and digits after normalization; quoting
+    # keeps FTS5 from reading words such as "and"/"near" as operators
+    parts = [f'"{term}"' for term in terms]
+    parts[-1] += '*'
+    # Column filter so the terms never match the owner tokens
+    return '{user_message ai_response}: (' + ' AND '.join(parts) + ')'
+
+
+def _postgres_tsquery(terms: List[str]) -> str:
+    parts = [f"'{term}'" for term in terms]
+    parts[-1] += ':*'
+    return ' & '.join(parts)
+
+
+def supported(conn=connection) -> bool:
+    return conn.vendor in ('sqlite', 'postgresql')
+
+
+def index_chats(rows, conn=connection):
+    """Add or replace index entries.
+
+    ``rows`` are ``(id, user_id, user_message, ai_response)`` tuples.
+    """
+    rows = [
+        (pk, user_id, normalize_text(user_message), normalize_text(ai_response))
+        for pk, user_id, user_message, ai_response in rows
+    ]
+    if not rows or not supported(conn):
+        return
+    with conn.cursor() as cursor:
+        if conn.vendor == 'sqlite':
+            cursor.executemany(
+                f"DELETE FROM {SQLITE_TABLE} WHERE rowid = %s", [(row[0],) for row in rows]
+            )
+            cursor.executemany(
+                f"INSERT INTO {SQLITE_TABLE} (rowid, user_message, ai_response, owner) VALUES (%s, %s, %s, %s)",
+                [(pk, user_message, ai_response, _owner(user_id)) for pk, user_id, user_message, ai_response in rows],
+            )
+        else:
+            cursor.executemany(
+                f"INSERT INTO {POSTGRES_TABLE} (chat_id, user_id, document) VALUES "
+                f"(%s, %s, setweight(to_tsvector('simple', %s), 'A') || setweight(to_tsvector('simple', %s), 'B')) "
+                f"ON CONFLICT (chat_id) DO UPDATE SET user_id = EXCLUDED.user_id, document = EXCLUDED.document",
+                rows,
+            )
+
+
+def index_chat(chat: Chat):
+    index_chats([(chat.pk, chat.user_id, chat.user_message, chat.ai_response)])
+
+
+def unindex_chat(chat_id: int, conn=connection):
+    # PostgreSQL entries go with their chat through the foreign key
+    if conn.vendor == 'sqlite':
+        with conn.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {SQLITE_TABLE} WHERE rowid = %s", [chat_id])
+
+
+def rebuild_index(user_ids=None, chunk_size: int = 2000) -> int:
+    """Re-index chats from the chats table; returns the number indexed.
+
+    Needed after writes that skip model signals (``bulk_create``, raw SQL,
+    ``loaddata``) and after restoring a database.
+    """
+    if not supported():
+        return 0
+    with transaction.atomic():
+        return _rebuild(user_ids, chunk_size)
+
+
+def _rebuild(user_ids, chunk_size: int) -> int:
+    chats = Chat.objects.all()
+    with connection.cursor() as cursor:
+        if user_ids is None:
+            table = SQLITE_TABLE if connection.vendor == 'sqlite' else POSTGRES_TABLE
+            cursor.execute(f"DELETE FROM {table}")
+        else:
+            chats = chats.filter(user_id__in=user_ids)
+            if connection.vendor == 'sqlite':
+                cursor.executemany(
+                    f"DELETE FROM {SQLITE_TABLE} WHERE owner MATCH %s",
+                    [(f'"{_owner(user_id)}"',) for user_id in user_ids],
+                )
+            else:
+                cursor.execute(f"DELETE FROM {POSTGRES_TABLE} WHERE user_id = ANY(%s)", [list(user_ids)])
+
+    indexed, batch = 0, []
+    rows = chats.values_list('id', 'user_id', 'user_message', 'ai_response').iterator(chunk_size=chunk_size)
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= chunk_size:
+            index_chats(batch)
+            indexed += len(batch)
+            batch = []
+    index_chats(batch)
+    return indexed + len(batch)
+
+
+def matching_ids_sql(terms: List[str], user_id=None) -> Tuple[str, list]:
+    """SQL selecting the ids of matching chats, for ``pk__in=RawSQL(...)``."""
+    if connection.vendor == 'sqlite':
+        match = _sqlite_match(terms)
+        if user_id is not None:
+            match = f'owner:"{_owner(user_id)}" AND {match}'
+        return f"SELECT rowid FROM {SQLITE_TABLE} WHERE {SQLITE_TABLE} MATCH %s", [match]
+    sql = f"SELECT chat_id FROM {POSTGRES_TABLE} WHERE document @@ to_tsquery('simple', %s)"
+    params = [_postgres_tsquery(terms)]
+    if user_id is not None:
+        sql += " AND user_id = %s"
+        params.append(user_id)
+    return sql, params
+
+
+def _ranked_sql(terms: List[str], user_id) -> Tuple[str, list]:
+    if connection.vendor == 'sqlite':
+        # bm25() is lower-is-better; owner carries no weight
+        match = f'owner:"{_owner(user_id)}" AND {_sqlite_match(terms)}'
+        return (
+            f"SELECT rowid, -bm25({SQLITE_TABLE}, {USER_MESSAGE_WEIGHT}, {AI_RESPONSE_WEIGHT}, 0.0) AS score "
+            f"FROM {SQLITE_TABLE} WHERE {SQLITE_TABLE} MATCH %s "
+            f"ORDER BY score DESC, rowid DESC LIMIT %s OFFSET %s",
+            [match],
+        )
+    # ts_rank weights are {D, C, B, A}
+    return (
+        f"SELECT chat_id, ts_rank('{{0, 0, {AI_RESPONSE_WEIGHT / USER_MESSAGE_WEIGHT}, 1}}', document, query) AS score "
+        f"FROM {POSTGRES_TABLE}, to_tsquery('simple', %s) AS query "
+        f"WHERE user_id = %s AND document @@ query "
+        f"ORDER BY score DESC, chat_id DESC LIMIT %s OFFSET %s",
+        [_postgres_tsquery(terms), user_id],
+    )
+
+
+class ChatSearch:
+    """Ranked full-text matches of one user's chats.
+
+    Slicing runs the ranked query for that window and returns
+    ``(chat_id, score)`` pairs, best first, so it can be handed to a paginator.
+    """
+
+    def __init__(self, user_id, query: str):
+        self.user_id = user_id
+        self.terms = query_terms(query)
+
+    def __getitem__(self, window: slice) -> List[Tuple[int, float]]:
+        if not self.terms:
+            return []
+        offset, stop = window.start or 0, window.stop
+        if supported():
+            sql, params = _ranked_sql(self.terms, self.user_id)
+            with connection.cursor() as cursor:
+                cursor.execute(sql, params + [stop - offset, offset])
+                return [(pk, float(score)) for pk, score in cursor.fetchall()]
+        # No full-text support on this database: newest substring matches
+        logger.warning("Full-text search is not available on %s; using a table scan", connection.vendor)
+        chats = Chat.objects.filter(user_id=self.user_id)
+        for term in self.terms:
+            chats = chats.filter(Q(user_message__icontains=term) | Q(ai_response__icontains=term))
+        ids = chats.order_by('-created_at', '-pk').values_list('pk', flat=True)[offset:stop]
+        return [(pk, 0.0) for pk in ids]
+
+
+def _word_matches(word: str, terms: List[str]) -> bool:
+    prefix = terms[-1]
+    for token in normalize_text(word).split():
+        if token in terms[:-1] or token.startswith(prefix):
+            return True
+    return False
+
+
+def highlight(text: str, terms: List[str], length: int = SNIPPET_LENGTH) -> Optional[str]:
+    """HTML-escaped excerpt of ``text`` around the first match, with every
+    matching word wrapped in ``<mark>``. None when nothing in ``text`` matches.
+    """
+    if not text or not terms:
+        return None
+    hits = [match.span() for match in _WORD.finditer(text) if _word_matches(match.group(), terms)]
+    if not hits:
+        return None
+
+    start = max(0, hits[0][0] - length // 4)
+    end = min(len(text), start + length)
+    # Do not cut words in half at either edge
+    if start > 0:
+        boundary = text.find(' ', start, hits[0][0])
+        start = boundary + 1 if boundary != -1 else start
+    if end < len(text):
+        boundary = text.rfind(' ', hits[0][1], end)
+        end = boundary if boundary != -1 else end
+
+    parts = ['…' if start > 0 else '']
+    cursor = start
+    for hit_start, hit_end in hits:
+        if hit_start < start:
+            continue
+        if hit_end > end:
+            break
+        parts.append(html.escape(text[cursor:hit_start]))
+        parts.append(_HIGHLIGHT_OPEN + html.escape(text[hit_start:hit_end]) + _HIGHLIGHT_CLOSE)
+        cursor = hit_end
+    parts.append(html.escape(text[cursor:end]))
+    parts.append('…' if end < len(text) else '')
+    return ''.join(parts)
+
+
+def highlights(row: Dict, terms: List[str]) -> Dict[str, str]:
+    """Snippets for the message fields of ``row`` that contain a match."""
+    snippets = {}
+    for field in ('user_message', 'ai_response'):
+        snippet = highlight(row[field], terms)
+        if snippet is not None:
+            snippets[field] = snippet
+    return snippets
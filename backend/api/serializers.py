@@ -1,6 +1,7 @@
 from rest_framework import serializers
 from django.contrib.auth.models import User
-from .models import Chat, UserProfile, ChatSession
+from .models import Chat, ChatSession, Job, UserProfile
+from .profiling import phase
 
 
 class UserSerializer(serializers.ModelSerializer):
@@ -11,17 +12,15 @@ class UserSerializer(serializers.ModelSerializer):
 
 class UserProfileSerializer(serializers.ModelSerializer):
     user = UserSerializer(read_only=True)
-    total_chats = serializers.SerializerMethodField()
     
     class Meta:
         model = UserProfile
         fields = [
             'id', 'user', 'language_preference', 'ai_summary',
-            'summary_updated_at', 'created_at', 'total_chats'
+            'summary_updated_at', 'created_at', 'total_chats',
+            'model_counts', 'last_chat_at'
         ]
-    
-    def get_total_chats(self, obj):
-        return Chat.objects.filter(user=obj.user).count()
+        read_only_fields = ['total_chats', 'model_counts', 'last_chat_at']
 
 
 class ChatSerializer(serializers.ModelSerializer):
@@ -36,12 +35,44 @@ class ChatSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'created_at']
 
 
+# Columns read by the ``.values()`` fast path; ``username`` is filled in from
+# the requesting user instead of joining auth_user for every row
+CHAT_ROW_FIELDS = ('id', 'model', 'user_message', 'ai_response', 'language', 'created_at')
+
+
+def _datetime_field(value):
+    # Same output as DRF's DateTimeField for aware UTC datetimes
+    value = value.isoformat()
+    return value[:-6] + 'Z' if value.endswith('+00:00') else value
+
+
+def chat_rows(rows, username):
+    """Fast equivalent of ``ChatSerializer(many=True).data`` for ``.values(*CHAT_ROW_FIELDS)`` rows."""
+    with phase('serialize'):
+        return [
+            {
+                'id': row['id'],
+                'username': username,
+                'model': row['model'],
+                'user_message': row['user_message'],
+                'ai_response': row['ai_response'],
+                'language': row['language'],
+                'created_at': _datetime_field(row['created_at']),
+            }
+            for row in rows
+        ]
+
+
 class ChatSessionSerializer(serializers.ModelSerializer):
-    message_count = serializers.SerializerMethodField()
-    
     class Meta:
         model = ChatSession
         fields = ['id', 'title', 'created_at', 'updated_at', 'message_count']
-    
-    def get_message_count(self, obj):
-        return Chat.objects.filter(user=obj.user, created_at__gte=obj.created_at).count()
\ No newline at end of file
+        read_only_fields = ['message_count']
+
+
+class JobSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Job
+        fields = ['id', 'kind', 'status', 'progress', 'attempts', 'max_attempts',
+                  'result', 'error', 'created_at', 'finished_at']
+        read_only_fields = fields
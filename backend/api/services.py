@@ -1,15 +1,79 @@
-from typing import Tuple
+from django.conf import settings
 from django.contrib.auth.models import User
+from django.core.cache import cache
+from .counters import COUNTER_FIELDS
 from .models import UserProfile
+from .profiling import phase
+
+# Concrete column values are cached rather than the instance itself, so the
+# cached entry never carries a stale copy of the related User. Chat counters
+# change with every chat and are left out; on cached instances they are
+# deferred, so saving one never overwrites them.
+_PROFILE_FIELDS = [
+    field.attname for field in UserProfile._meta.concrete_fields
+    if field.attname not in COUNTER_FIELDS
+]
+
+
+def profile_cache_key(user_id: int) -> str:
+    return f"api:profile:{user_id}"
+
+
+def _attach_user(profile: UserProfile, user: User) -> UserProfile:
+    # Stateless token users (see api.authentication) are not User instances
+    if isinstance(user, User):
+        profile.user = user
+    return profile
+
+
+def _from_cache(user: User, values) -> UserProfile:
+    return _attach_user(UserProfile.from_db('default', _PROFILE_FIELDS, values), user)
+
+
+def _to_cache(profile: UserProfile):
+    return [getattr(profile, name) for name in _PROFILE_FIELDS]
 
 
 def get_or_create_profile(user: User, default_language: str = "en") -> UserProfile:
     """Return the user's profile, creating it if necessary.
 
-    Ensures a single place to define default values and logic.
+    Ensures a single place to define default values and logic. Profiles are
+    read through the cache; saving or deleting one invalidates its entry.
     """
-    profile, _ = UserProfile.objects.get_or_create(
-        user=user,
-        defaults={"language_preference": default_language},
-    )
+    with phase("profile"):
+        key = profile_cache_key(user.pk)
+        values = cache.get(key)
+        if values is not None:
+            return _from_cache(user, values)
+        profile, _ = UserProfile.objects.get_or_create(
+            user_id=user.pk,
+            defaults={"language_preference": default_language},
+        )
+        cache.set(key, _to_cache(profile), settings.PROFILE_CACHE_TTL)
+        return _attach_user(profile, user)
+
+
+async def aget_or_create_profile(user: User, default_language: str = "en") -> UserProfile:
+    """Async variant of :func:`get_or_create_profile` for ASGI views."""
+    with phase("profile"):
+        key = profile_cache_key(user.pk)
+        values = await cache.aget(key)
+        if values is not None:
+            return _from_cache(user, values)
+        profile, _ = await UserProfile.objects.aget_or_create(
+            user_id=user.pk,
+            defaults={"language_preference": default_language},
+        )
+        await cache.aset(key, _to_cache(profile), settings.PROFILE_CACHE_TTL)
+        return _attach_user(profile, user)
+
+
+def load_counters(profile: UserProfile) -> UserProfile:
+    """Fetch deferred chat counters of a cached profile in one query."""
+    if profile.get_deferred_fields():
+        profile.refresh_from_db(fields=COUNTER_FIELDS)
     return profile
+
+
+def invalidate_profile(user_id: int):
+    cache.delete(profile_cache_key(user_id))
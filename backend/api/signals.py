@@ -0,0 +1,76 @@
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .context import chat_tokens
+from .profiling import count_queries
+from .counters import chat_created, chat_deleted
+from .models import Chat, UserProfile
+from .search import index_chat, unindex_chat
+from .authentication import invalidate_user_state
+from .services import invalidate_profile
+
+
+@receiver(connection_created)
+def instrument_connection(sender, connection, **kwargs):
+    """Count and time each request's queries (Server-Timing, slow log, /metrics)."""
+    # The same wrapper object reconnects after close_old_connections()
+    if count_queries not in connection.execute_wrappers:
+        connection.execute_wrappers.append(count_queries)
+
+
+@receiver(post_save, sender=UserProfile)
+@receiver(post_delete, sender=UserProfile)
+def invalidate_cached_profile(sender, instance, **kwargs):
+    """Drop the cached profile on any save (views, admin, summaries) or delete.
+
+    Invalidated again on commit so a read racing an open transaction cannot
+    leave the old row cached.
+    """
+    invalidate_profile(instance.user_id)
+    transaction.on_commit(lambda: invalidate_profile(instance.user_id))
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_cached_user_state(sender, instance, **kwargs):
+    """Let stateless JWT auth see deactivation, deletion and staff changes."""
+    invalidate_user_state(instance.pk)
+    transaction.on_commit(lambda: invalidate_user_state(instance.pk))
+
+
+@receiver(pre_save, sender=Chat)
+def estimate_chat_tokens(sender, instance, raw=False, **kwargs):
+    """Keep the per-turn token estimate used for context packing current."""
+    if not raw:
+        instance.token_count = chat_tokens(instance.user_message, instance.ai_response)
+
+
+@receiver(post_save, sender=Chat)
+def count_created_chat(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        chat_created(instance)
+
+
+@receiver(post_delete, sender=Chat)
+def count_deleted_chat(sender, instance, origin=None, **kwargs):
+    # Deleting a user removes the profile along with the chats
+    if isinstance(origin, User):
+        return
+    chat_deleted(instance)
+
+
+@receiver(post_save, sender=Chat)
+def index_saved_chat(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw:
+        return
+    if update_fields is not None and not {'user', 'user_message', 'ai_response'} & set(update_fields):
+        return
+    index_chat(instance)
+
+
+@receiver(post_delete, sender=Chat)
+def unindex_deleted_chat(sender, instance, **kwargs):
+    unindex_chat(instance.pk)
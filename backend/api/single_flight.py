@@ -0,0 +1,160 @@
+import os
+import time
+import uuid
+import hashlib
+import asyncio
+import logging
+import threading
+import weakref
+from typing import Any, Awaitable, Callable, Dict
+
+from django.core.cache import caches
+
+logger = logging.getLogger('api.single_flight')
+
+# Followers read a leader's result within a poll interval, so it only needs
+# to outlive the lock briefly; later requests never look at it
+_RESULT_TTL = 10
+
+
+def flight_key(*parts: str) -> str:
+    return hashlib.sha256('\x1f'.join(parts).encode('utf-8')).hexdigest()
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Coalesce concurrent identical upstream calls into one.
+
+    Within a worker, callers with the same key share the first caller's
+    result, whether they run in threads (``do``) or on an event loop (``ado``).
+    With ``AI_SINGLE_FLIGHT_SHARED`` the leader also takes a lock in the
+    Django cache named by ``AI_SINGLE_FLIGHT_CACHE`` so workers sharing that
+    cache (e.g. Redis) wait for each other's result instead of calling the
+    provider again. Followers give up waiting after ``AI_SINGLE_FLIGHT_LOCK_TIMEOUT``
+    seconds and make the call themselves.
+    """
+
+    def __init__(self):
+        self.enabled = os.getenv('AI_SINGLE_FLIGHT_ENABLED', 'True').lower() in ('1', 'true', 'yes')
+        self.shared = os.getenv('AI_SINGLE_FLIGHT_SHARED', 'False').lower() in ('1', 'true', 'yes')
+        self.cache_alias = os.getenv('AI_SINGLE_FLIGHT_CACHE', 'default')
+        self.lock_timeout = float(os.getenv('AI_SINGLE_FLIGHT_LOCK_TIMEOUT', '60'))
+        self.poll_interval = float(os.getenv('AI_SINGLE_FLIGHT_POLL_INTERVAL', '0.1'))
+        self._calls: Dict[str, _Call] = {}
+        self._tasks = weakref.WeakKeyDictionary()  # event loop -> {key: asyncio.Task}
+        self._lock = threading.Lock()
+        self.leaders = 0
+        self.coalesced = 0
+        self.shared_hits = 0
+
+    def _count(self, counter: str):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    # Threads -------------------------------------------------------------
+
+    def do(self, key: str, fn: Callable[[], Any]) -> Any:
+        if not self.enabled:
+            return fn()
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.leaders += 1
+            else:
+                self.coalesced += 1
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+        try:
+            call.result = self._shared_do(key, fn) if self.shared else fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def _shared_do(self, key: str, fn: Callable[[], Any]) -> Any:
+        cache = caches[self.cache_alias]
+        lock_key, result_key = f'ai:sf:lock:{key}', f'ai:sf:result:{key}'
+        token = uuid.uuid4().hex
+        deadline = time.monotonic() + self.lock_timeout
+        while not cache.add(lock_key, token, timeout=self.lock_timeout):
+            time.sleep(self.poll_interval)
+            result = cache.get(result_key)
+            if result is not None:
+                self._count('shared_hits')
+                return result
+            if time.monotonic() >= deadline:
+                logger.warning("Timed out waiting for another worker's in-flight call; calling upstream")
+                return fn()
+        try:
+            result = fn()
+            cache.set(result_key, result, timeout=_RESULT_TTL)
+            return result
+        finally:
+            if cache.get(lock_key) == token:
+                cache.delete(lock_key)
+
+    # Event loop ----------------------------------------------------------
+
+    async def ado(self, key: str, factory: Callable[[], Awaitable[Any]]) -> Any:
+        """Async ``do``; the shared call runs as its own task so it survives a
+        disconnecting leader."""
+        if not self.enabled:
+            return await factory()
+        loop = asyncio.get_running_loop()
+        tasks = self._tasks.setdefault(loop, {})
+        task = tasks.get(key)
+        if task is None:
+            self._count('leaders')
+            task = loop.create_task(self._ashared_do(key, factory) if self.shared else factory())
+            tasks[key] = task
+            task.add_done_callback(lambda _: tasks.pop(key, None))
+        else:
+            self._count('coalesced')
+        return await asyncio.shield(task)
+
+    async def _ashared_do(self, key: str, factory: Callable[[], Awaitable[Any]]) -> Any:
+        cache = caches[self.cache_alias]
+        lock_key, result_key = f'ai:sf:lock:{key}', f'ai:sf:result:{key}'
+        token = uuid.uuid4().hex
+        deadline = time.monotonic() + self.lock_timeout
+        while not await cache.aadd(lock_key, token, timeout=self.lock_timeout):
+            await asyncio.sleep(self.poll_interval)
+            result = await cache.aget(result_key)
+            if result is not None:
+                self._count('shared_hits')
+                return result
+            if time.monotonic() >= deadline:
+                logger.warning("Timed out waiting for another worker's in-flight call; calling upstream")
+                return await factory()
+        try:
+            result = await factory()
+            await cache.aset(result_key, result, timeout=_RESULT_TTL)
+            return result
+        finally:
+            if await cache.aget(lock_key) == token:
+                await cache.adelete(lock_key)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'enabled': self.enabled,
+            'shared': self.shared,
+            'in_flight': len(self._calls) + sum(len(tasks) for tasks in list(self._tasks.values())),
+            'leaders': self.leaders,
+            'coalesced': self.coalesced,
+            'shared_hits': self.shared_hits,
+        }
@@ -0,0 +1,116 @@
+from .ai_service import ai_service
+from .context import turns_to_fold
+from .jobs import PermanentJobError, enqueue, register, set_progress
+from .models import Chat, ChatSession, UserProfile
+
+SUMMARY_JOB = 'profile_summary'
+SESSION_SUMMARY_JOB = 'session_summary'
+# Most chats folded into the profile summary by one upstream call (fewer
+# when they exceed AIService's summary token budget)
+SUMMARY_CHATS = 50
+# Upstream calls one summary job makes before a follow-up job takes over
+SUMMARY_BATCHES = 4
+# Most turns folded into a session summary by one job (oldest first)
+SESSION_FOLD_TURNS = 50
+
+
+def previous_summary(profile: UserProfile):
+    """The summary new chats are folded into, or None to summarize afresh."""
+    summary = profile.ai_summary
+    # Failed generations used to be stored as the summary itself
+    if not summary or summary.startswith('Error'):
+        return None
+    return summary
+
+
+def unsummarized_chats(profile: UserProfile):
+    """Chats not yet folded into the profile summary, oldest first.
+
+    ``summary_updated_at`` records the newest chat the summary covers.
+    """
+    chats = Chat.objects.filter(user_id=profile.user_id).order_by('created_at', 'id')
+    if previous_summary(profile):
+        chats = chats.filter(created_at__gt=profile.summary_updated_at)
+    return chats
+
+
+@register(SUMMARY_JOB)
+def generate_profile_summary(job):
+    """Job handler: fold the user's new chats into their profile summary.
+
+    Chats are folded oldest first, one batch per upstream call, and the
+    watermark moves after every batch, so a retry resumes where a failure
+    stopped. Chats left after SUMMARY_BATCHES calls go to a follow-up job.
+    """
+    profile, _ = UserProfile.objects.get_or_create(user_id=job.user_id)
+    summary = previous_summary(profile)
+    total = unsummarized_chats(profile).count()
+    if not total:
+        if summary:
+            # Nothing new since the last run: no upstream call
+            return {'summary': summary, 'updated_at': profile.summary_updated_at.isoformat(), 'unchanged': True}
+        raise PermanentJobError('No chat data to summarize')
+    set_progress(job, 10)
+
+    folded = 0
+    for _ in range(SUMMARY_BATCHES):
+        batch = list(
+            unsummarized_chats(profile).values('user_message', 'ai_response', 'created_at')[:SUMMARY_CHATS]
+        )
+        if not batch:
+            break
+        batch = batch[:ai_service.summary_batch_size(batch, summary)]
+        new_summary = ai_service.generate_user_summary(batch[::-1], profile.language_preference, summary)
+        if new_summary.startswith('Error'):
+            # Provider failure: keep the summary so far and let the queue retry
+            raise RuntimeError(new_summary)
+        summary = new_summary
+        profile.ai_summary = summary
+        profile.summary_updated_at = batch[-1]['created_at']
+        profile.save(update_fields=['ai_summary', 'summary_updated_at', 'updated_at'])
+        folded += len(batch)
+        set_progress(job, min(10 + 80 * folded // total, 90))
+
+    result = {'summary': summary, 'updated_at': profile.summary_updated_at.isoformat()}
+    if unsummarized_chats(profile).exists():
+        result['continued_by'] = enqueue(SUMMARY_JOB, job.user_id, unique=False).pk
+    return result
+
+
+def schedule_session_summary(user_id: int, session_id: int):
+    """Queue folding a session's overflowing turns into its summary (once at a time)."""
+    return enqueue(SESSION_SUMMARY_JOB, user_id, {'session_id': session_id})
+
+
+@register(SESSION_SUMMARY_JOB)
+def summarize_session(job):
+    """Job handler: fold turns that left a session's context window into its summary.
+
+    The newest half of the context budget stays unsummarized, so the next
+    fold is only needed a few turns later.
+    """
+    session = ChatSession.objects.filter(pk=job.payload['session_id'], user_id=job.user_id).first()
+    if session is None:
+        raise PermanentJobError('Session not found')
+    latest = Chat.objects.filter(session_id=session.pk).order_by('-created_at').values('model', 'language').first()
+    if latest is None:
+        return {'folded': 0}
+    keep_budget = ai_service.context_budget(latest['model'], latest['language']) // 2
+    pending = turns_to_fold(session.pk, session.summarized_through, keep_budget)
+    turns = list(pending.reverse().values('user_message', 'ai_response', 'created_at')[:SESSION_FOLD_TURNS])
+    if not turns:
+        return {'folded': 0}
+    turns = turns[:ai_service.summary_batch_size(turns, session.summary)]
+    set_progress(job, 20)
+
+    summary = ai_service.generate_session_summary(turns[::-1], latest['language'], session.summary or None)
+    if summary.startswith('Error'):
+        raise RuntimeError(summary)
+    # Only advance from the state this fold was based on
+    advanced = ChatSession.objects.filter(pk=session.pk, summarized_through=session.summarized_through).update(
+        summary=summary, summarized_through=turns[-1]['created_at'],
+    )
+    result = {'folded': len(turns)}
+    if advanced and turns_to_fold(session.pk, turns[-1]['created_at'], keep_budget).exists():
+        result['continued_by'] = enqueue(SESSION_SUMMARY_JOB, job.user_id, job.payload, unique=False).pk
+    return result
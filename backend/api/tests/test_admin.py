@@ -0,0 +1,41 @@
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+
+from ..models import Chat, UserProfile
+from .utils import make_chat
+
+
+# The manifest only exists after collectstatic
+@override_settings(STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage')
+class AdminSearchTests(TestCase):
+
+    def setUp(self):
+        admin = User.objects.create_superuser('admin', 'admin@example.com', 'pw')
+        self.client.force_login(admin)
+        self.alice = User.objects.create_user('alice', 'Alice@Example.com', 'pw')
+        self.bob = User.objects.create_user('bob', 'bob@example.com', 'pw')
+        for user in (self.alice, self.bob):
+            UserProfile.objects.create(user=user)
+
+    def search(self, model, term):
+        response = self.client.get(f'/admin/api/{model}/', {'q': term})
+        self.assertEqual(response.status_code, 200)
+        return list(response.context['cl'].result_list)
+
+    def test_profiles_are_found_by_exact_username_or_email(self):
+        self.assertEqual([p.user_id for p in self.search('userprofile', 'alice')], [self.alice.pk])
+        self.assertEqual([p.user_id for p in self.search('userprofile', 'alice@example.COM')], [self.alice.pk])
+        self.assertEqual(self.search('userprofile', 'alice@example'), [])
+        self.assertEqual(self.search('userprofile', 'ali'), [])
+
+    def test_chats_are_found_by_id_user_or_words(self):
+        chat = make_chat(self.alice, 'how do I deploy django', 'use gunicorn')
+        other = make_chat(self.bob, 'something else', 'answer')
+        self.assertEqual(self.search('chat', str(other.pk)), [other])
+        self.assertEqual(self.search('chat', 'bob@example.com'), [other])
+        self.assertEqual(self.search('chat', 'deploy'), [chat])
+
+    def test_changelists_render(self):
+        make_chat(self.alice)
+        for model in ('userprofile', 'chat', 'chatsession', 'job'):
+            self.assertEqual(self.client.get(f'/admin/api/{model}/').status_code, 200)
@@ -0,0 +1,121 @@
+import os
+import threading
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase
+from rest_framework.test import APIClient
+
+from ..admission import Admission, AdmissionRejected, parse_retry_after
+from ..ai_service import ai_service
+from ..models import Chat
+from .utils import wait_until
+
+ADMISSION_KEYS = ('openrouter', 'openrouter:test-model')
+
+
+class AdmissionTests(SimpleTestCase):
+
+    def admission(self, **overrides):
+        env = {
+            'AI_ADMISSION_ENABLED': 'True',
+            'AI_ADMISSION_PROVIDER_CONCURRENCY': '0',
+            'AI_ADMISSION_MODEL_CONCURRENCY': '1',
+            'AI_ADMISSION_USER_CONCURRENCY': '0',
+            'AI_ADMISSION_MAX_WAIT': '5',
+            'AI_ADMISSION_MAX_QUEUE': '100',
+        }
+        env.update(overrides)
+        with mock.patch.dict(os.environ, env):
+            return Admission()
+
+    def queue(self, admission, user, on_admit=lambda: None):
+        def run():
+            with admission.admit(ADMISSION_KEYS, user):
+                on_admit()
+
+        queued = admission.snapshot()['queued']
+        thread = threading.Thread(target=run)
+        thread.start()
+        wait_until(lambda: admission.snapshot()['queued'] == queued + 1)
+        return thread
+
+    def test_waiting_calls_take_turns_across_users(self):
+        admission = self.admission()
+        holder = admission.admit(ADMISSION_KEYS, 'holder')
+        order = []
+        threads = [
+            self.queue(admission, user, lambda label=label: order.append(label))
+            for user, label in (('a', 'a1'), ('a', 'a2'), ('a', 'a3'), ('b', 'b1'))
+        ]
+        holder.release()
+        for thread in threads:
+            thread.join(5)
+        self.assertEqual(order, ['a1', 'b1', 'a2', 'a3'])
+        self.assertEqual(admission.snapshot()['limits']['openrouter:test-model']['in_flight'], 0)
+
+    def test_per_user_cap_does_not_block_other_users(self):
+        admission = self.admission(AI_ADMISSION_MODEL_CONCURRENCY='8', AI_ADMISSION_USER_CONCURRENCY='1')
+        first = admission.admit(ADMISSION_KEYS, 'a')
+        waiting = self.queue(admission, 'a')
+        admission.admit(ADMISSION_KEYS, 'b').release()
+        first.release()
+        waiting.join(5)
+        self.assertFalse(waiting.is_alive())
+
+    def test_full_queue_is_rejected(self):
+        admission = self.admission(AI_ADMISSION_MAX_QUEUE='1')
+        holder = admission.admit(ADMISSION_KEYS, 'holder')
+        waiting = self.queue(admission, 'a')
+        with self.assertRaises(AdmissionRejected) as raised:
+            admission.admit(ADMISSION_KEYS, 'b')
+        self.assertEqual(raised.exception.reason, 'queue_full')
+        self.assertGreaterEqual(raised.exception.retry_after, 1)
+        holder.release()
+        waiting.join(5)
+        self.assertEqual(admission.snapshot()['limits']['openrouter:test-model']['rejected'], 1)
+
+    def test_wait_beyond_budget_is_rejected_with_estimate(self):
+        admission = self.admission(AI_ADMISSION_MODEL_CONCURRENCY='0', AI_ADMISSION_MODEL_RATE='0.1',
+                                   AI_ADMISSION_MODEL_BURST='1', AI_ADMISSION_MAX_WAIT='1')
+        admission.admit(ADMISSION_KEYS).release()
+        with self.assertRaises(AdmissionRejected) as raised:
+            admission.admit(ADMISSION_KEYS)
+        self.assertEqual(raised.exception.reason, 'wait_budget')
+        self.assertEqual(raised.exception.retry_after, 10)
+
+    def test_provider_pause_sets_retry_after(self):
+        admission = self.admission(AI_ADMISSION_MAX_WAIT='1')
+        admission.pause(ADMISSION_KEYS, 30)
+        with self.assertRaises(AdmissionRejected) as raised:
+            admission.admit(ADMISSION_KEYS)
+        self.assertEqual(raised.exception.retry_after, 30)
+
+    def test_disabled_admission_never_waits(self):
+        admission = self.admission(AI_ADMISSION_ENABLED='False')
+        with admission.admit(ADMISSION_KEYS), admission.admit(ADMISSION_KEYS):
+            pass
+        self.assertEqual(admission.snapshot()['limits'], {})
+
+    def test_parse_retry_after(self):
+        self.assertEqual(parse_retry_after('120'), 120.0)
+        self.assertIsNone(parse_retry_after(''))
+        self.assertIsNone(parse_retry_after('soon'))
+        self.assertEqual(parse_retry_after('Wed, 21 Oct 2015 07:28:00 GMT'), 0.0)
+
+
+class AdmissionRejectedResponseTests(TestCase):
+
+    def test_chat_returns_503_with_retry_after(self):
+        cache.clear()
+        user = User.objects.create_user('busy', password='pw')
+        client = APIClient()
+        client.force_authenticate(user)
+        model = ai_service.available_models[0]['id']
+        with mock.patch.object(ai_service, 'get_result', side_effect=AdmissionRejected(7, 'queue_full')):
+            response = client.post('/api/chat/', {'message': 'hi', 'model': model}, format='json')
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], '7')
+        self.assertEqual(response.data['retry_after'], 7)
+        self.assertFalse(Chat.objects.filter(user=user).exists())
@@ -0,0 +1,58 @@
+import asyncio
+import time
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import AsyncRequestFactory, TestCase
+
+from .. import async_views
+from ..authentication import issue_tokens
+from ..models import Chat
+from .utils import MODEL_ID, make_service, start_stub, stub_env
+
+
+class AsyncChatViewTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('async-user', password='pw')
+        self.token = str(issue_tokens(self.user).access_token)
+        self.server = start_stub(self, latency_ms=400)
+        patcher = mock.patch.object(async_views, 'ai_service', make_service(**stub_env(self.server)))
+        self.service = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def chat(self, message, token=None, method='post'):
+        request = getattr(AsyncRequestFactory(), method)(
+            '/api/chat/', {'message': message, 'model': MODEL_ID}, content_type='application/json',
+            headers={'Authorization': f'Bearer {token or self.token}'},
+        )
+        return async_views.chat(request)
+
+    async def test_chat_is_answered_and_saved(self):
+        response = await self.chat('hello async')
+        self.assertEqual(response.status_code, 200)
+        chat = await Chat.objects.aget(user_id=self.user.pk)
+        self.assertEqual(chat.user_message, 'hello async')
+        self.assertEqual(chat.provider, Chat.OPENROUTER)
+        self.assertIn(chat.ai_response, response.content.decode())
+
+    async def test_concurrent_chats_wait_on_upstream_together(self):
+        started = time.monotonic()
+        responses = await asyncio.gather(*(self.chat(f'question {n}') for n in range(3)))
+        elapsed = time.monotonic() - started
+        self.assertEqual([response.status_code for response in responses], [200, 200, 200])
+        # Three 400ms upstream calls one after another would take 1.2s
+        self.assertLess(elapsed, 1.0)
+        self.assertEqual(await Chat.objects.filter(user_id=self.user.pk).acount(), 3)
+
+    async def test_invalid_token_is_rejected(self):
+        response = await self.chat('hello', token='not-a-token')
+        self.assertEqual(response.status_code, 401)
+        self.assertIn('WWW-Authenticate', response.headers)
+
+    async def test_other_methods_are_not_allowed(self):
+        response = await self.chat('hello', method='put')
+        self.assertEqual(response.status_code, 405)
+        self.assertEqual(response.headers['Allow'], 'POST')
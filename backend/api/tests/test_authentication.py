@@ -0,0 +1,74 @@
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.settings import api_settings as drf_settings
+from rest_framework.test import APIClient, APIRequestFactory
+
+from ..authentication import (
+    ClaimsUser, StatelessJWTAuthentication, hot_path_authentication_classes, issue_tokens,
+)
+from ..services import get_or_create_profile
+
+
+class StatelessJWTAuthenticationTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('token-user', password='pw', is_staff=True)
+        self.token = issue_tokens(self.user).access_token
+
+    def authenticate(self, token=None):
+        request = APIRequestFactory().get('/', HTTP_AUTHORIZATION=f'Bearer {token or self.token}')
+        return StatelessJWTAuthentication().authenticate(request)
+
+    def test_tokens_carry_identity_but_no_mutable_settings(self):
+        self.assertEqual(self.token['username'], 'token-user')
+        self.assertEqual(self.token['user_id'], self.user.pk)
+        self.assertNotIn('language', self.token)
+
+    def test_user_comes_from_claims_and_cached_state(self):
+        with self.assertNumQueries(1):
+            user, _ = self.authenticate()
+        with self.assertNumQueries(0):
+            self.authenticate()
+        self.assertIsInstance(user, ClaimsUser)
+        self.assertEqual((user.id, user.username, user.is_staff), (self.user.pk, 'token-user', True))
+
+    def test_deactivated_users_are_rejected(self):
+        self.authenticate()
+        self.user.is_active = False
+        self.user.save()
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate()
+
+    def test_deleted_users_are_rejected(self):
+        self.authenticate()
+        self.user.delete()
+        with self.assertRaises(AuthenticationFailed) as raised:
+            self.authenticate()
+        self.assertEqual(raised.exception.get_codes(), 'user_not_found')
+
+    def test_language_changes_apply_without_a_new_token(self):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.token}')
+        self.assertEqual(client.put('/api/user/language/', {'language': 'ar'}, format='json').status_code, 200)
+        user, _ = self.authenticate()
+        self.assertEqual(get_or_create_profile(user).language_preference, 'ar')
+
+    def test_hot_path_classes_follow_the_setting(self):
+        with override_settings(JWT_STATELESS_AUTH=True):
+            self.assertEqual(hot_path_authentication_classes(), [StatelessJWTAuthentication])
+        with override_settings(JWT_STATELESS_AUTH=False):
+            self.assertEqual(hot_path_authentication_classes(), list(drf_settings.DEFAULT_AUTHENTICATION_CLASSES))
+
+
+class LoginTokenTests(TestCase):
+
+    def test_login_tokens_authenticate_requests(self):
+        User.objects.create_user('login-user', password='secret123')
+        client = APIClient()
+        tokens = client.post('/api/auth/login/', {'username': 'login-user', 'password': 'secret123'},
+                             format='json').data
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {tokens['access']}")
+        self.assertEqual(client.get('/api/chat/history/').status_code, 200)
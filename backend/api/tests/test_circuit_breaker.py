@@ -0,0 +1,84 @@
+import os
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from ..circuit_breaker import CLOSED, HALF_OPEN, OPEN, BreakerBoard, CircuitBreaker
+from ..models import Chat
+from .utils import MODEL_ID, make_service, start_stub, stub_env
+
+
+class CircuitBreakerTests(SimpleTestCase):
+
+    def breaker(self, **options):
+        breaker = CircuitBreaker('test', **{'min_calls': 3, 'open_seconds': 0, **options})
+        breaker.transitions = []
+        breaker.listeners.append(lambda b, old, new: b.transitions.append((old, new)))
+        return breaker
+
+    def open(self, breaker):
+        breaker.record_success()
+        breaker.record_failure()
+        self.assertEqual(breaker.state, CLOSED)
+        breaker.record_failure(timeout=True)
+        self.assertEqual(breaker.state, OPEN)
+
+    def test_failure_rate_opens_the_breaker(self):
+        breaker = self.breaker(open_seconds=60)
+        self.open(breaker)
+        self.assertFalse(breaker.can_attempt())
+        self.assertEqual(breaker.transitions, [(CLOSED, OPEN)])
+
+    def test_successful_probe_closes_the_breaker(self):
+        breaker = self.breaker()
+        self.open(breaker)
+        self.assertTrue(breaker.can_attempt())
+        breaker.on_attempt()
+        self.assertEqual(breaker.state, HALF_OPEN)
+        # Only one probe at a time
+        self.assertFalse(breaker.can_attempt())
+        breaker.record_success()
+        self.assertEqual(breaker.state, CLOSED)
+        self.assertEqual(breaker.transitions, [(CLOSED, OPEN), (OPEN, HALF_OPEN), (HALF_OPEN, CLOSED)])
+
+    def test_failed_probe_reopens_the_breaker(self):
+        breaker = self.breaker()
+        self.open(breaker)
+        breaker.on_attempt()
+        breaker.record_failure()
+        self.assertEqual(breaker.state, OPEN)
+        self.assertEqual(breaker.transitions[-1], (HALF_OPEN, OPEN))
+
+    def test_cancelled_probe_frees_its_slot(self):
+        breaker = self.breaker()
+        self.open(breaker)
+        breaker.on_attempt()
+        self.assertFalse(breaker.can_attempt())
+        breaker.cancel_attempt()
+        self.assertTrue(breaker.can_attempt())
+        self.assertEqual(breaker.state, HALF_OPEN)
+
+    def test_board_blocks_every_key_of_an_open_provider(self):
+        env = {'AI_BREAKER_ENABLED': 'True', 'AI_BREAKER_MIN_CALLS': '2', 'AI_BREAKER_OPEN_SECONDS': '60'}
+        with mock.patch.dict(os.environ, env):
+            board = BreakerBoard()
+        keys = ('openrouter', 'openrouter:test-model')
+        self.assertTrue(board.allow(keys))
+        board.record(keys, ok=False)
+        board.record(keys, ok=False, timeout=True)
+        self.assertFalse(board.allow(keys))
+        self.assertFalse(board.allow(('openrouter', 'openrouter:other-model')))
+        snapshot = board.snapshot()
+        self.assertEqual(snapshot['openrouter']['state'], OPEN)
+        self.assertEqual(snapshot['openrouter']['timeout_rate'], 0.5)
+
+    def test_open_breaker_sends_chats_straight_to_hugging_face(self):
+        server = start_stub(self, error_rate=1.0)
+        service = make_service(**stub_env(server, AI_BREAKER_MIN_CALLS='2', AI_BREAKER_OPEN_SECONDS='60'))
+        for _ in range(2):
+            result = service.get_result(MODEL_ID, 'hello', use_cache=False)
+            self.assertEqual(result.provider, Chat.HUGGINGFACE)
+        result = service.get_result(MODEL_ID, 'hello', use_cache=False)
+        self.assertEqual((result.provider, result.fallback_reason), (Chat.HUGGINGFACE, 'circuit_open'))
+        snapshot = service.breakers.snapshot()['openrouter']
+        self.assertEqual((snapshot['state'], snapshot['calls'], snapshot['rejected']), (OPEN, 2, 1))
@@ -0,0 +1,65 @@
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+from django.utils import timezone
+
+from ..context import TURN_OVERHEAD_TOKENS, build_context, load_session, turns_to_fold
+from ..models import ChatSession
+from .utils import make_chat
+
+
+class ContextPackingTests(TestCase):
+    # Each turn is 40 + 40 characters: 20 estimated tokens plus the overhead
+    TURN_COST = 20 + TURN_OVERHEAD_TOKENS
+
+    def setUp(self):
+        self.user = User.objects.create_user('talker', password='pw')
+        self.session = ChatSession.objects.create(user=self.user)
+        now = timezone.now()
+        self.turns = [
+            make_chat(self.user, f'{i}' * 40, 'r' * 40, session=self.session,
+                      created_at=now - timedelta(minutes=10 - i))
+            for i in range(3)
+        ]
+
+    def context(self, budget, message='hi'):
+        return build_context(load_session(self.user.id, self.session.pk), budget, message)
+
+    def test_turns_are_stored_with_their_token_estimate(self):
+        self.assertEqual(self.turns[0].token_count, 20)
+
+    def test_newest_turns_fitting_the_budget_are_packed_oldest_first(self):
+        # 'hi' takes one token of the budget
+        context = self.context(1 + 2 * self.TURN_COST)
+        self.assertEqual(context.turns, (('1' * 40, 'r' * 40), ('2' * 40, 'r' * 40)))
+        self.assertTrue(context.overflow)
+
+    def test_everything_fits(self):
+        context = self.context(1 + 3 * self.TURN_COST)
+        self.assertEqual(len(context.turns), 3)
+        self.assertFalse(context.overflow)
+
+    def test_summary_counts_against_the_budget(self):
+        ChatSession.objects.filter(pk=self.session.pk).update(summary='s' * 4 * self.TURN_COST)
+        context = self.context(1 + 3 * self.TURN_COST)
+        self.assertEqual(len(context.turns), 2)
+        self.assertTrue(context.overflow)
+
+    def test_summarized_turns_are_left_out(self):
+        ChatSession.objects.filter(pk=self.session.pk).update(
+            summary='earlier', summarized_through=self.turns[1].created_at
+        )
+        context = self.context(10_000)
+        self.assertEqual(context.summary, 'earlier')
+        self.assertEqual(context.turns, (('2' * 40, 'r' * 40),))
+        self.assertFalse(context.overflow)
+
+    def test_turns_to_fold_keeps_the_newest_budget(self):
+        folded = turns_to_fold(self.session.pk, None, self.TURN_COST)
+        self.assertEqual(list(folded.values_list('pk', flat=True)), [self.turns[1].pk, self.turns[0].pk])
+
+    def test_unknown_session(self):
+        self.assertIsNone(load_session(self.user.id, 'nope'))
+        other = User.objects.create_user('intruder', password='pw')
+        self.assertIsNone(load_session(other.id, self.session.pk))
@@ -0,0 +1,60 @@
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TestCase
+
+from ..models import Chat, ChatSession, UserProfile
+from .utils import make_chat
+
+
+class ChatCounterTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('counted', password='pw')
+        self.profile = UserProfile.objects.create(user=self.user)
+        self.session = ChatSession.objects.create(user=self.user)
+
+    def test_counters_follow_creates_and_deletes(self):
+        first = make_chat(self.user, model='model-a', session=self.session)
+        make_chat(self.user, model='model-a')
+        latest = make_chat(self.user, model='model-b', session=self.session)
+
+        self.profile.refresh_from_db()
+        self.session.refresh_from_db()
+        self.assertEqual(self.profile.total_chats, 3)
+        self.assertEqual(self.profile.model_counts, {'model-a': 2, 'model-b': 1})
+        self.assertEqual(self.profile.last_chat_at, latest.created_at)
+        self.assertEqual(self.session.message_count, 2)
+
+        latest.delete()
+        first.delete()
+        self.profile.refresh_from_db()
+        self.session.refresh_from_db()
+        self.assertEqual(self.profile.total_chats, 1)
+        self.assertEqual(self.profile.model_counts, {'model-a': 1})
+        self.assertEqual(self.profile.last_chat_at, Chat.objects.get(user=self.user).created_at)
+        self.assertEqual(self.session.message_count, 0)
+
+    def test_rebuild_chat_counters_repairs_drift(self):
+        make_chat(self.user, model='model-a', session=self.session)
+        chat = make_chat(self.user, model='model-b', session=self.session)
+        UserProfile.objects.filter(pk=self.profile.pk).update(total_chats=42, model_counts={'gone': 7}, last_chat_at=None)
+        ChatSession.objects.filter(pk=self.session.pk).update(message_count=9)
+
+        out = StringIO()
+        call_command('rebuild_chat_counters', '--user', str(self.user.pk), stdout=out)
+
+        self.assertIn('1 profile', out.getvalue())
+        self.profile.refresh_from_db()
+        self.session.refresh_from_db()
+        self.assertEqual(self.profile.total_chats, 2)
+        self.assertEqual(self.profile.model_counts, {'model-a': 1, 'model-b': 1})
+        self.assertEqual(self.profile.last_chat_at, chat.created_at)
+        self.assertEqual(self.session.message_count, 2)
+
+    def test_deleting_a_user_removes_chats_and_counters(self):
+        make_chat(self.user, session=self.session)
+        self.user.delete()
+        self.assertFalse(Chat.objects.exists())
+        self.assertFalse(UserProfile.objects.exists())
@@ -0,0 +1,96 @@
+import asyncio
+import gzip
+import json
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from ..exports import aiter_chunks
+from .utils import make_chat
+
+
+class ExportHistoryTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('exporter', password='pw')
+        now = timezone.now()
+        make_chat(self.user, 'older', 'first answer', created_at=now - timedelta(minutes=2))
+        make_chat(self.user, 'newer \u0645\u0631\u062d\u0628\u0627 "quoted"', 'line\nbreak',
+                  created_at=now - timedelta(minutes=1), language='ar')
+        make_chat(User.objects.create_user('someone-else', password='pw'), 'not mine')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def export(self, query=''):
+        response = self.client.get(f'/api/chat/export/{query}')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return response, b''.join(response.streaming_content)
+
+    def test_json_export_lists_own_chats_newest_first(self):
+        response, body = self.export()
+        self.assertEqual(response['Content-Type'], 'application/json; charset=utf-8')
+        data = json.loads(body)
+        self.assertEqual(data['user'], 'exporter')
+        self.assertEqual(data['total_chats'], 2)
+        self.assertEqual([chat['user_message'] for chat in data['chats']],
+                         ['newer \u0645\u0631\u062d\u0628\u0627 "quoted"', 'older'])
+        self.assertEqual(data['chats'][0]['ai_response'], 'line\nbreak')
+        self.assertEqual(data['chats'][0]['language'], 'ar')
+
+    def test_ndjson_export_writes_a_header_then_one_chat_per_line(self):
+        response, body = self.export('?output=ndjson')
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson; charset=utf-8')
+        lines = [json.loads(line) for line in body.decode().splitlines()]
+        self.assertEqual(lines[0]['user'], 'exporter')
+        self.assertEqual([line['user_message'] for line in lines[1:]], ['newer \u0645\u0631\u062d\u0628\u0627 "quoted"', 'older'])
+
+    def test_gzip_export_matches_the_plain_one(self):
+        response, body = self.export('?output=ndjson&compress=gzip')
+        self.assertEqual(response['Content-Type'], 'application/gzip')
+        self.assertIn('.ndjson.gz', response['Content-Disposition'])
+        chats = [json.loads(line) for line in gzip.decompress(body).decode().splitlines()[1:]]
+        plain = [json.loads(line) for line in self.export('?output=ndjson')[1].decode().splitlines()[1:]]
+        self.assertEqual(chats, plain)
+
+    def test_large_exports_are_written_in_chunks(self):
+        for n in range(3):
+            make_chat(self.user, f'long {n}', 'x' * 40_000)
+        response = self.client.get('/api/chat/export/')
+        chunks = list(response.streaming_content)
+        self.assertGreater(len(chunks), 1)
+        self.assertEqual(json.loads(b''.join(chunks))['total_chats'], 5)
+
+    def test_empty_history_is_valid_json(self):
+        self.client.force_authenticate(User.objects.create_user('new-user', password='pw'))
+        data = json.loads(self.export()[1])
+        self.assertEqual((data['chats'], data['total_chats']), ([], 0))
+
+    def test_unknown_output_is_rejected(self):
+        self.assertEqual(self.client.get('/api/chat/export/?output=csv').status_code, 400)
+
+
+class AsyncChunksTests(SimpleTestCase):
+
+    def test_chunks_are_pulled_one_at_a_time_and_closed(self):
+        pulled = []
+
+        def chunks():
+            try:
+                for n in range(3):
+                    pulled.append(n)
+                    yield b'%d' % n
+            finally:
+                pulled.append('closed')
+
+        async def read_first():
+            stream = aiter_chunks(chunks())
+            first = await stream.__anext__()
+            await stream.aclose()
+            return first
+
+        self.assertEqual(asyncio.run(read_first()), b'0')
+        self.assertEqual(pulled, [0, 'closed'])
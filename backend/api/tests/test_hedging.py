@@ -0,0 +1,104 @@
+import asyncio
+import time
+
+from django.test import SimpleTestCase
+
+from ..circuit_breaker import HALF_OPEN
+from ..models import Chat
+from .utils import MODEL_ID, closed_port_url, make_service, start_stub, stub_env
+
+HEDGE_ENV = {'AI_HEDGE_ENABLED': 'True', 'AI_HEDGE_DEFAULT_DELAY': '0.2'}
+# Stub errors arrive after a quarter of the latency, so 2000ms fails past the hedge delay
+
+
+class HedgeTestCase(SimpleTestCase):
+
+    def service(self, openrouter, huggingface=None, **env):
+        """A hedging service asking ``openrouter`` first and ``huggingface`` (a stub or URL) as the hedge."""
+        env = stub_env(openrouter, **HEDGE_ENV, **env)
+        if huggingface is not None:
+            env['HUGGINGFACE_API_URL'] = (huggingface if isinstance(huggingface, str)
+                                          else stub_env(huggingface)['HUGGINGFACE_API_URL'])
+        return make_service(**env)
+
+    def counters(self, service):
+        return service.hedging.stats()['models'][MODEL_ID]
+
+
+class HedgedRequestTests(HedgeTestCase):
+
+    def test_slow_openrouter_is_hedged_to_hugging_face(self):
+        service = self.service(start_stub(self, latency_ms=1500), start_stub(self))
+        started = time.monotonic()
+        result = service.get_result(MODEL_ID, 'hello', use_cache=False)
+        self.assertLess(time.monotonic() - started, 1.0)
+        self.assertEqual((result.provider, result.fallback_reason), (Chat.HUGGINGFACE, 'hedged'))
+        counters = self.counters(service)
+        self.assertEqual((counters['hedged'], counters['hedge_wins'], counters['primary_wins']), (1, 1, 0))
+        self.assertEqual(counters['win_rate'], 1.0)
+
+    def test_openrouter_answering_first_wins(self):
+        service = self.service(start_stub(self, latency_ms=400), start_stub(self, latency_ms=1500))
+        result = service.get_result(MODEL_ID, 'hello', use_cache=False)
+        self.assertEqual(result.provider, Chat.OPENROUTER)
+        counters = self.counters(service)
+        self.assertEqual((counters['hedged'], counters['hedge_wins'], counters['primary_wins']), (1, 0, 1))
+
+    def test_both_failing_is_not_a_hedge_win(self):
+        service = self.service(start_stub(self, latency_ms=2000, error_rate=1.0), closed_port_url())
+        result = service.get_result(MODEL_ID, 'hello', use_cache=False)
+        self.assertFalse(result.ok)
+        counters = self.counters(service)
+        self.assertEqual((counters['hedge_wins'], counters['primary_wins'], counters['both_failed']), (0, 0, 1))
+
+    def test_fast_openrouter_is_not_hedged(self):
+        service = self.service(start_stub(self))
+        self.assertEqual(service.get_result(MODEL_ID, 'hello', use_cache=False).provider, Chat.OPENROUTER)
+        self.assertEqual(self.counters(service)['hedged'], 0)
+
+
+class AsyncHedgedRequestTests(HedgeTestCase):
+
+    def test_slow_openrouter_is_hedged_to_hugging_face(self):
+        service = self.service(start_stub(self, latency_ms=1500), start_stub(self))
+
+        async def chat():
+            started = time.monotonic()
+            result = await service.aget_result(MODEL_ID, 'hello', use_cache=False)
+            self.assertLess(time.monotonic() - started, 1.0)
+            await service.async_transport.aclose()
+            return result
+
+        result = asyncio.run(chat())
+        self.assertEqual((result.provider, result.fallback_reason), (Chat.HUGGINGFACE, 'hedged'))
+        self.assertEqual(self.counters(service)['hedge_wins'], 1)
+
+    def test_both_failing_is_not_a_hedge_win(self):
+        service = self.service(start_stub(self, latency_ms=2000, error_rate=1.0), closed_port_url())
+
+        async def chat():
+            result = await service.aget_result(MODEL_ID, 'hello', use_cache=False)
+            await service.async_transport.aclose()
+            return result
+
+        self.assertFalse(asyncio.run(chat()).ok)
+        counters = self.counters(service)
+        self.assertEqual((counters['hedge_wins'], counters['both_failed']), (0, 1))
+
+    def test_cancelled_half_open_probe_frees_the_breaker(self):
+        service = self.service(start_stub(self, latency_ms=1500), start_stub(self),
+                               AI_BREAKER_MIN_CALLS='1', AI_BREAKER_OPEN_SECONDS='0')
+        keys = service._openrouter_breaker_keys(service.registry.get(MODEL_ID))
+        service.breakers.record(keys, ok=False)
+
+        async def chat():
+            # The OpenRouter call is the half-open probe and loses the race
+            result = await service.aget_result(MODEL_ID, 'hello', use_cache=False)
+            await asyncio.sleep(0)
+            await service.async_transport.aclose()
+            return result
+
+        self.assertEqual(asyncio.run(chat()).fallback_reason, 'hedged')
+        breaker = service.breakers.get('openrouter')
+        self.assertEqual(breaker.state, HALF_OPEN)
+        self.assertTrue(breaker.can_attempt())
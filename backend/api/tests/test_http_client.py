@@ -0,0 +1,55 @@
+import asyncio
+import os
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from ..http_client import ProviderTransport
+from ..models import Chat
+from .utils import MODEL_ID, make_service, start_stub, stub_env
+
+
+class ProviderTransportTests(SimpleTestCase):
+
+    def setUp(self):
+        self.server = start_stub(self)
+        self.env = stub_env(self.server)
+
+    def test_sequential_chats_reuse_one_connection(self):
+        service = make_service(**self.env)
+        for n in range(5):
+            result = service.get_result(MODEL_ID, f'question {n}', use_cache=False)
+            self.assertEqual(result.provider, Chat.OPENROUTER)
+        self.assertEqual(self.server.connections, 1)
+
+    def test_warm_opens_pooled_connections_that_chats_reuse(self):
+        transport = ProviderTransport()
+        transport.register('openrouter', self.env['OPENROUTER_API_URL'])
+        self.assertEqual(transport.warm(['openrouter'], connections=2), {'openrouter': 2})
+        self.assertEqual(self.server.connections, 2)
+        for _ in range(3):
+            response = transport.post('openrouter', self.env['OPENROUTER_API_URL'], json={'messages': []}, timeout=5)
+            self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.server.connections, 2)
+        transport.close()
+
+    def test_pool_size_per_provider(self):
+        transport = ProviderTransport()
+        with mock.patch.dict(os.environ, {'OPENROUTER_POOL_MAXSIZE': '3'}):
+            openrouter = transport.session('openrouter')
+            huggingface = transport.session('huggingface')
+        self.assertIs(transport.session('openrouter'), openrouter)
+        self.assertEqual(openrouter.pool_maxsize, 3)
+        self.assertEqual(huggingface.pool_maxsize, transport.default_pool_maxsize)
+
+    def test_async_chats_share_the_event_loop_client(self):
+        service = make_service(**self.env)
+
+        async def chat():
+            for n in range(3):
+                result = await service.aget_result(MODEL_ID, f'question {n}', use_cache=False)
+                self.assertEqual(result.provider, Chat.OPENROUTER)
+            await service.async_transport.aclose()
+
+        asyncio.run(chat())
+        self.assertEqual(self.server.connections, 1)
@@ -0,0 +1,177 @@
+import time
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from .. import jobs
+from ..models import Job, JobWorker
+
+ECHO_JOB = 'test_echo'
+FLAKY_JOB = 'test_flaky'
+BROKEN_JOB = 'test_broken'
+
+
+@jobs.register(ECHO_JOB)
+def echo(job):
+    jobs.set_progress(job, 50)
+    return {'payload': job.payload, 'worker_seen': JobWorker.objects.exists()}
+
+
+@jobs.register(FLAKY_JOB)
+def flaky(job):
+    raise RuntimeError(f'attempt {job.attempts} failed')
+
+
+@jobs.register(BROKEN_JOB)
+def broken(job):
+    raise jobs.PermanentJobError('cannot succeed')
+
+
+def claim_and_run(kind):
+    job = jobs.claim('test-worker', [kind])
+    jobs.run_job(job)
+    job.refresh_from_db()
+    return job
+
+
+class JobQueueTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('job-user', password='pw')
+        self.heartbeat = JobWorker.objects.create(name='host:1')
+
+    def test_enqueue_returns_the_pending_job(self):
+        first = jobs.enqueue(ECHO_JOB, self.user.pk, {'n': 1})
+        self.assertEqual(jobs.enqueue(ECHO_JOB, self.user.pk, {'n': 1}), first)
+        self.assertNotEqual(jobs.enqueue(ECHO_JOB, self.user.pk, {'n': 2}), first)
+        self.assertNotEqual(jobs.enqueue(ECHO_JOB, self.user.pk, {'n': 1}, unique=False), first)
+
+    def test_claim_takes_due_jobs_of_the_given_kinds_oldest_first(self):
+        later = Job.objects.create(kind=ECHO_JOB, user=self.user, run_after=timezone.now() + timedelta(minutes=1))
+        other = Job.objects.create(kind=FLAKY_JOB, user=self.user)
+        first = Job.objects.create(kind=ECHO_JOB, user=self.user)
+        second = Job.objects.create(kind=ECHO_JOB, user=self.user)
+        self.assertEqual(jobs.claim('test-worker', [ECHO_JOB]).pk, first.pk)
+        self.assertEqual(jobs.claim('test-worker', [ECHO_JOB]).pk, second.pk)
+        self.assertIsNone(jobs.claim('test-worker', [ECHO_JOB]))
+        claimed = jobs.claim('test-worker')
+        self.assertEqual(claimed.pk, other.pk)
+        self.assertEqual((claimed.status, claimed.locked_by, claimed.attempts), (Job.RUNNING, 'test-worker', 1))
+        later.refresh_from_db()
+        self.assertEqual(later.status, Job.QUEUED)
+
+    @override_settings(JOB_KIND_LIMITS={ECHO_JOB: 1})
+    def test_claim_respects_the_kind_limit(self):
+        Job.objects.create(kind=ECHO_JOB, user=self.user)
+        Job.objects.create(kind=ECHO_JOB, user=self.user)
+        self.assertIsNotNone(jobs.claim('test-worker', [ECHO_JOB]))
+        self.assertIsNone(jobs.claim('test-worker', [ECHO_JOB]))
+
+    def test_successful_job_stores_its_result(self):
+        jobs.enqueue(ECHO_JOB, self.user.pk, {'n': 1})
+        job = claim_and_run(ECHO_JOB)
+        self.assertEqual((job.status, job.progress, job.error), (Job.SUCCEEDED, 100, ''))
+        self.assertEqual(job.result, {'payload': {'n': 1}, 'worker_seen': True})
+        self.assertIsNotNone(job.finished_at)
+
+    @override_settings(JOB_RETRY_DELAY=30, JOB_MAX_ATTEMPTS=2)
+    def test_failed_job_is_retried_with_backoff_then_fails(self):
+        jobs.enqueue(FLAKY_JOB, self.user.pk)
+        job = claim_and_run(FLAKY_JOB)
+        self.assertEqual((job.status, job.error, job.locked_by), (Job.QUEUED, 'attempt 1 failed', ''))
+        self.assertGreater(job.run_after, timezone.now() + timedelta(seconds=25))
+        Job.objects.filter(pk=job.pk).update(run_after=timezone.now())
+        job = claim_and_run(FLAKY_JOB)
+        self.assertEqual((job.status, job.error), (Job.FAILED, 'attempt 2 failed'))
+
+    def test_permanent_failures_are_not_retried(self):
+        jobs.enqueue(BROKEN_JOB, self.user.pk)
+        job = claim_and_run(BROKEN_JOB)
+        self.assertEqual((job.status, job.attempts, job.error), (Job.FAILED, 1, 'cannot succeed'))
+        Job.objects.create(kind='test_unknown', user=self.user)
+        job = claim_and_run('test_unknown')
+        self.assertEqual(job.status, Job.FAILED)
+        self.assertIn('No handler', job.error)
+
+    @override_settings(JOB_STALE_AFTER=600)
+    def test_requeue_stale_recovers_jobs_of_dead_workers(self):
+        long_ago = timezone.now() - timedelta(seconds=700)
+        lost = Job.objects.create(kind=ECHO_JOB, user=self.user, status=Job.RUNNING, attempts=1,
+                                  locked_by='gone:1', locked_at=long_ago)
+        spent = Job.objects.create(kind=ECHO_JOB, user=self.user, status=Job.RUNNING, attempts=3,
+                                   locked_by='gone:1', locked_at=long_ago)
+        busy = Job.objects.create(kind=ECHO_JOB, user=self.user, status=Job.RUNNING, attempts=1,
+                                  locked_by='alive:1', locked_at=timezone.now())
+        self.assertEqual(jobs.requeue_stale(), 1)
+        statuses = dict(Job.objects.values_list('pk', 'status'))
+        self.assertEqual(statuses, {lost.pk: Job.QUEUED, spent.pk: Job.FAILED, busy.pk: Job.RUNNING})
+
+    @override_settings(JOBS_EAGER=True)
+    def test_eager_jobs_run_before_enqueue_returns(self):
+        job = jobs.enqueue(ECHO_JOB, self.user.pk, {'n': 1})
+        self.assertEqual(job.status, Job.SUCCEEDED)
+        self.assertTrue(job.locked_by.startswith('eager:'))
+
+    @override_settings(JOB_WORKER_TIMEOUT=60)
+    def test_workers_alive_follows_the_heartbeat(self):
+        self.assertTrue(jobs.workers_alive())
+        JobWorker.objects.update(last_seen=timezone.now() - timedelta(seconds=61))
+        self.assertFalse(jobs.workers_alive())
+
+    def test_enqueue_leaves_jobs_to_a_live_worker(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            jobs.enqueue(ECHO_JOB, self.user.pk)
+        self.assertEqual(callbacks, [])
+
+    def test_enqueue_runs_jobs_in_process_without_a_worker(self):
+        self.heartbeat.delete()
+        with self.captureOnCommitCallbacks() as callbacks:
+            job = jobs.enqueue(ECHO_JOB, self.user.pk)
+        self.assertEqual(callbacks, [jobs.run_in_process])
+        # Re-enqueueing the pending job kicks the in-process run as well
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.assertEqual(jobs.enqueue(ECHO_JOB, self.user.pk), job)
+        self.assertEqual(callbacks, [jobs.run_in_process])
+
+
+class WorkerTests(TransactionTestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('worker-user', password='pw')
+        self.addCleanup(self.wait_for_fallback)
+
+    def wait_for_fallback(self):
+        # Let an in-process run finish before the tables are flushed
+        thread = jobs._fallback_thread
+        if thread is not None:
+            thread.join(5)
+
+    def test_burst_worker_runs_due_jobs_and_signs_off(self):
+        for n in range(3):
+            Job.objects.create(kind=ECHO_JOB, user=self.user, payload={'n': n})
+        worker = jobs.Worker(kinds=[ECHO_JOB], concurrency=2, poll_interval=0.05)
+        worker.run(burst=True)
+        done = Job.objects.filter(kind=ECHO_JOB, status=Job.SUCCEEDED)
+        self.assertEqual(done.count(), 3)
+        self.assertTrue(all(job.result['worker_seen'] for job in done))
+        self.assertTrue(all(job.locked_by.startswith(worker.name) for job in done))
+        self.assertFalse(JobWorker.objects.exists())
+
+    def test_jobs_run_in_process_without_a_worker(self):
+        for n in range(2):
+            Job.objects.create(kind=ECHO_JOB, user=self.user, payload={'n': n})
+        jobs.run_in_process().join(5)
+        done = Job.objects.filter(kind=ECHO_JOB, status=Job.SUCCEEDED)
+        self.assertEqual(done.count(), 2)
+        # The in-process run never passes for a worker
+        self.assertFalse(any(job.result['worker_seen'] for job in done))
+
+    def test_enqueue_without_a_worker_runs_the_job_after_commit(self):
+        job = jobs.enqueue(ECHO_JOB, self.user.pk, {'n': 1})
+        deadline = time.monotonic() + 5
+        while job.status != Job.SUCCEEDED and time.monotonic() < deadline:
+            time.sleep(0.05)
+            job.refresh_from_db()
+        self.assertEqual(job.status, Job.SUCCEEDED)
@@ -0,0 +1,96 @@
+import json
+from unittest import mock
+
+import requests
+from django.core.cache import cache
+from django.test import LiveServerTestCase, SimpleTestCase, override_settings
+
+from loadtest import driver
+
+from .. import views
+from .utils import make_service, start_stub, stub_env
+
+
+class StubProviderTests(SimpleTestCase):
+
+    def setUp(self):
+        self.server = start_stub(self, completion_words=4, chunks=2)
+        self.env = stub_env(self.server)
+
+    def chat(self, **body):
+        return requests.post(self.env['OPENROUTER_API_URL'], timeout=5,
+                             json={'model': 'm', 'messages': [{'role': 'user', 'content': 'say hello'}], **body})
+
+    def test_openrouter_reply_reports_usage(self):
+        data = self.chat().json()
+        self.assertEqual(data['choices'][0]['message']['content'], 'hello-0 hello-1 hello-2 hello-3')
+        self.assertEqual(data['usage'], {'prompt_tokens': 2, 'completion_tokens': 4})
+
+    def test_openrouter_stream_ends_with_usage_and_done(self):
+        with self.chat(stream=True) as response:
+            self.assertEqual(response.headers['Content-Type'], 'text/event-stream')
+            events = [line[len('data: '):] for line in response.iter_lines(decode_unicode=True) if line]
+        self.assertEqual(events[-1], '[DONE]')
+        chunks = [json.loads(event) for event in events[:-1]]
+        deltas = [chunk['choices'][0]['delta']['content'] for chunk in chunks if chunk['choices']]
+        self.assertEqual(deltas, ['hello-0 hello-1 ', 'hello-2 hello-3 '])
+        self.assertEqual(chunks[-1]['usage']['completion_tokens'], 4)
+
+    def test_huggingface_reply(self):
+        response = requests.post(self.env['HUGGINGFACE_API_URL'] + 'org/model', json={'inputs': 'hi there'}, timeout=5)
+        self.assertEqual(response.json(), [{'generated_text': 'there-0 there-1 there-2 there-3'}])
+        self.assertEqual(requests.head(self.env['OPENROUTER_API_URL'], timeout=5).status_code, 200)
+
+    def test_openrouter_errors(self):
+        failing = stub_env(start_stub(self, error_rate=1, error_status=429))
+        response = requests.post(failing['OPENROUTER_API_URL'], json={'messages': []}, timeout=5)
+        self.assertEqual(response.status_code, 429)
+
+
+class DriverReportTests(SimpleTestCase):
+
+    def test_percentile_is_nearest_rank(self):
+        ordered = [float(n) for n in range(1, 101)]
+        self.assertEqual(driver.percentile(ordered, 50), 50)
+        self.assertEqual(driver.percentile(ordered, 99), 99)
+        self.assertEqual(driver.percentile([0.5], 95), 0.5)
+        self.assertIsNone(driver.percentile([], 50))
+
+    def test_summary_per_step(self):
+        samples = [
+            driver.Sample('chat', 0.2, 200, True),
+            driver.Sample('chat', 0.4, 503, False),
+            driver.Sample('chat_stream', 1.0, 200, True),
+            driver.Sample('chat_stream_first_delta', 0.1, 200, True),
+        ]
+        report = driver.summarize(samples, 2.0, driver.DriverConfig(users=1), flows_completed=0)
+        self.assertEqual(report['steps']['chat']['count'], 2)
+        self.assertEqual(report['steps']['chat']['error_rate'], 0.5)
+        self.assertEqual(report['steps']['chat']['p95_ms'], 400.0)
+        # Time to first delta is not another request
+        self.assertEqual(report['overall']['count'], 3)
+        self.assertEqual(report['overall']['throughput_rps'], 1.5)
+        self.assertEqual(report['status_codes'], {'200': 2, '503': 1})
+        json.dumps(report)
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class DriverRunTests(LiveServerTestCase):
+
+    def setUp(self):
+        cache.clear()
+        server = start_stub(self, latency_ms=20, chunks=3)
+        patcher = mock.patch.object(views, 'ai_service', make_service(**stub_env(server)))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_flows_run_end_to_end(self):
+        config = driver.DriverConfig(url=self.live_server_url, users=2, concurrency=1, chats=2, stream_share=0.5)
+        report = driver.run(config)
+        self.assertEqual(report['flows_completed'], 2)
+        self.assertEqual(report['overall']['errors'], 0)
+        self.assertEqual(set(report['status_codes']), {'200', '201'})
+        steps = report['steps']
+        self.assertEqual(steps['signup']['count'], 2)
+        self.assertEqual(steps['export']['count'], 2)
+        self.assertEqual(steps.get('chat', {}).get('count', 0) + steps.get('chat_stream', {}).get('count', 0), 4)
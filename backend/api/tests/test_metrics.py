@@ -0,0 +1,103 @@
+from unittest import mock, skipUnless
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import resolve
+from rest_framework.test import APIClient
+
+from .. import metrics, views
+from ..ai_service import AIResult
+from ..authentication import issue_tokens
+from ..models import Chat
+from .utils import MODEL_ID, make_chat, make_service, start_stub, stub_env
+
+if metrics.ENABLED:
+    from prometheus_client import REGISTRY
+
+
+def sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0
+
+
+@skipUnless(metrics.ENABLED, 'prometheus-client is not installed')
+class ObserveResultTests(SimpleTestCase):
+
+    def test_reply_latency_tokens_and_fallback_are_counted(self):
+        before = (
+            sample('ai_upstream_duration_seconds_count', provider=Chat.HUGGINGFACE, model='m-observe', outcome='ok'),
+            sample('ai_fallbacks_total', model='m-observe', reason='http_429'),
+            sample('ai_tokens_total', provider=Chat.HUGGINGFACE, model='m-observe', kind='completion'),
+        )
+        metrics.observe_result('m-observe', AIResult('reply', Chat.HUGGINGFACE, latency_ms=250,
+                                                     completion_tokens=7, fallback_reason='http_429'))
+        after = (
+            sample('ai_upstream_duration_seconds_count', provider=Chat.HUGGINGFACE, model='m-observe', outcome='ok'),
+            sample('ai_fallbacks_total', model='m-observe', reason='http_429'),
+            sample('ai_tokens_total', provider=Chat.HUGGINGFACE, model='m-observe', kind='completion'),
+        )
+        self.assertEqual([b - a for a, b in zip(before, after)], [1, 1, 7])
+
+    def test_errors_and_unmeasured_replies(self):
+        labels = {'provider': Chat.OPENROUTER, 'model': 'm-error'}
+        metrics.observe_result('m-error', AIResult('Error: upstream down', Chat.OPENROUTER, latency_ms=10))
+        self.assertEqual(sample('ai_upstream_duration_seconds_count', outcome='error', **labels), 1)
+        # A cached reply has no latency or tokens to record
+        metrics.observe_result('m-error', AIResult('reply', Chat.CACHE))
+        self.assertEqual(sample('ai_upstream_duration_seconds_count', provider=Chat.CACHE, model='m-error',
+                                outcome='ok'), 0)
+
+
+@skipUnless(metrics.ENABLED, 'prometheus-client is not installed')
+class MetricsEndpointTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('measured', password='pw')
+        self.client = APIClient()
+
+    def requests(self, view, **labels):
+        return sample('http_request_duration_seconds_count', view=view, **labels)
+
+    def test_requests_are_timed_per_view(self):
+        view = resolve('/health/').view_name
+        before = self.requests(view, method='GET', status='200')
+        queries = sample('http_request_db_queries_count', view=view)
+        self.assertEqual(self.client.get('/health/').status_code, 200)
+        self.assertEqual(self.requests(view, method='GET', status='200'), before + 1)
+        self.assertEqual(sample('http_request_db_queries_count', view=view), queries + 1)
+
+    def test_streamed_responses_are_timed_once_sent(self):
+        make_chat(self.user)
+        self.client.force_authenticate(self.user)
+        view = resolve('/api/chat/export/').view_name
+        before = self.requests(view, method='GET', status='200')
+        response = self.client.get('/api/chat/export/')
+        self.assertEqual(self.requests(view, method='GET', status='200'), before)
+        b''.join(response.streaming_content)
+        self.assertEqual(self.requests(view, method='GET', status='200'), before + 1)
+
+    def test_chat_records_upstream_latency_and_tokens(self):
+        server = start_stub(self, completion_words=5)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {issue_tokens(self.user).access_token}')
+        labels = {'provider': Chat.OPENROUTER, 'model': MODEL_ID}
+        calls = sample('ai_upstream_duration_seconds_count', outcome='ok', **labels)
+        tokens = sample('ai_tokens_total', kind='completion', **labels)
+        with mock.patch.object(views, 'ai_service', make_service(**stub_env(server))):
+            response = self.client.post('/api/chat/', {'message': 'measure me', 'model': MODEL_ID}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(sample('ai_upstream_duration_seconds_count', outcome='ok', **labels), calls + 1)
+        self.assertEqual(sample('ai_tokens_total', kind='completion', **labels), tokens + 5)
+
+    def test_scrape_serves_the_text_format(self):
+        self.client.get('/health/')
+        response = self.client.get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain'))
+        self.assertIn(b'http_request_duration_seconds_bucket', response.content)
+
+    @override_settings(METRICS_TOKEN='scrape-secret')
+    def test_scrape_token_is_required_when_set(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 401)
+        self.assertEqual(self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer wrong').status_code, 401)
+        self.assertEqual(self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer scrape-secret').status_code, 200)
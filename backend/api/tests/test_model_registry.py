@@ -0,0 +1,84 @@
+import os
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from ..model_registry import AUTO_MODEL_ID, ModelRegistry
+from .utils import MODEL_ID, make_service, start_stub, stub_env
+
+MODELS = [
+    {'id': 'fast', 'name': 'Fast', 'languages': ['en']},
+    {'id': 'slow', 'name': 'Slow', 'languages': ['en', 'ar']},
+    {'id': 'arabic', 'name': 'Arabic', 'languages': ['ar']},
+]
+
+
+def make_registry(**env):
+    with mock.patch.dict(os.environ, {'AI_AUTO_MIN_SAMPLES': '2', 'AI_AUTO_EXPLORE_RATE': '0', **env}):
+        return ModelRegistry(MODELS)
+
+
+def record(registry, model_id, latency, count=2, ok=True):
+    for _ in range(count):
+        registry.record(model_id, latency, ok)
+
+
+class ModelRegistryTests(SimpleTestCase):
+
+    def test_lookup_by_id_or_name(self):
+        registry = make_registry()
+        self.assertEqual(registry.get('Fast')['id'], 'fast')
+        self.assertEqual(registry.get('fast')['id'], 'fast')
+        self.assertIsNone(registry.get('missing'))
+
+    def test_models_without_enough_samples_are_tried_first(self):
+        registry = make_registry()
+        record(registry, 'fast', 0.1)
+        self.assertEqual(registry.resolve(AUTO_MODEL_ID, 'en')['id'], 'slow')
+
+    def test_auto_picks_the_fastest_healthy_model_for_the_language(self):
+        registry = make_registry()
+        record(registry, 'fast', 0.1)
+        record(registry, 'slow', 2.0)
+        record(registry, 'arabic', 0.5)
+        self.assertEqual(registry.resolve(AUTO_MODEL_ID, 'en')['id'], 'fast')
+        self.assertEqual(registry.resolve(AUTO_MODEL_ID, 'ar')['id'], 'arabic')
+
+    def test_failing_models_are_skipped(self):
+        registry = make_registry()
+        record(registry, 'fast', 0.1, ok=False)
+        record(registry, 'slow', 2.0)
+        self.assertEqual(registry.resolve(AUTO_MODEL_ID, 'en')['id'], 'slow')
+        # Nothing healthy: the least failing model still answers
+        record(registry, 'slow', 2.0, count=3, ok=False)
+        self.assertEqual(registry.resolve(AUTO_MODEL_ID, 'en')['id'], 'slow')
+
+    def test_describe_lists_stats_and_the_auto_model(self):
+        registry = make_registry()
+        record(registry, 'fast', 0.1)
+        described = registry.describe()
+        self.assertEqual(described[0]['stats']['samples'], 2)
+        self.assertEqual(described[-1]['id'], AUTO_MODEL_ID)
+        self.assertEqual(described[-1]['languages'], ['ar', 'en'])
+
+
+class AutoRoutingStatsTests(SimpleTestCase):
+
+    def setUp(self):
+        self.service = make_service(**stub_env(start_stub(self)))
+
+    def samples(self):
+        return self.service.registry.stats[MODEL_ID].snapshot()['samples']
+
+    def test_chats_feed_the_routing_stats(self):
+        self.service.get_result(MODEL_ID, 'hello', use_cache=False)
+        self.assertEqual(self.samples(), 1)
+
+    def test_background_calls_stay_out_of_the_routing_stats(self):
+        self.service.get_result(MODEL_ID, 'summarize this', use_cache=False, interactive=False)
+        self.assertEqual(self.samples(), 0)
+
+    def test_resolve_model_id_resolves_auto_only(self):
+        self.assertIn(self.service.resolve_model_id(AUTO_MODEL_ID, 'en'),
+                      {model['id'] for model in self.service.available_models})
+        self.assertEqual(self.service.resolve_model_id('unknown/model'), 'unknown/model')
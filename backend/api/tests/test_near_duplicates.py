@@ -0,0 +1,85 @@
+import time
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from ..models import Chat
+from ..near_duplicates import MinHasher, NearDuplicateIndex, normalize_text
+from .utils import MODEL_ID, make_service, start_stub, stub_env
+
+QUESTION = ("I deployed my Django project behind gunicorn and nginx, and every static file returns a 404 "
+            "even though collectstatic ran without errors and STATIC_ROOT points at the folder nginx "
+            "serves. The admin pages load but look unstyled, the browser console lists every CSS and "
+            "JavaScript request as missing, and restarting both services changes nothing at all. What "
+            "should I check first, and is there a way to make Django serve these files itself while I "
+            "debug the nginx configuration on the production server this week?")
+
+
+class NormalizeTextTests(SimpleTestCase):
+
+    def test_case_punctuation_and_whitespace_are_ignored(self):
+        self.assertEqual(normalize_text('  Hello,   WORLD!! '), 'hello world')
+
+    def test_arabic_variants_normalize_alike(self):
+        # Diacritics, tatweel and the hamza/madda alef forms
+        self.assertEqual(normalize_text('\u0623\u064e\u0647\u0652\u0640\u0644\u0627\u064b'),
+                         normalize_text('\u0627\u0647\u0644\u0627'))
+        self.assertEqual(normalize_text('\u0645\u062f\u0631\u0633\u0629'), '\u0645\u062f\u0631\u0633\u0647')
+
+
+class NearDuplicateIndexTests(SimpleTestCase):
+
+    def test_near_duplicate_prompt_finds_the_stored_answer(self):
+        index = NearDuplicateIndex()
+        index.add('scope', QUESTION, 'check nginx')
+        response, similarity = index.query('scope', QUESTION.replace('nginx', 'Nginx').replace('gunicorn', 'gunicron'))
+        self.assertEqual(response, 'check nginx')
+        self.assertGreaterEqual(similarity, index.threshold)
+        self.assertIsNone(index.query('scope', 'How do I write a recursive function in Python?'))
+        self.assertEqual((index.hits, index.misses), (1, 1))
+
+    def test_answers_never_cross_scopes(self):
+        index = NearDuplicateIndex()
+        index.add('model-a', QUESTION, 'answer')
+        self.assertIsNone(index.query('model-b', QUESTION))
+
+    def test_prompts_without_letters_are_not_indexed(self):
+        index = NearDuplicateIndex()
+        index.add('scope', '?!', 'answer')
+        self.assertEqual(len(index), 0)
+        self.assertIsNone(index.query('scope', '...'))
+
+    def test_expired_entries_are_swept(self):
+        index = NearDuplicateIndex(ttl=60)
+        index.add('scope', QUESTION, 'answer')
+        with mock.patch('api.near_duplicates.time.monotonic', return_value=time.monotonic() + 61):
+            self.assertIsNone(index.query('scope', QUESTION))
+        self.assertEqual(len(index), 0)
+        self.assertEqual(index.stats()['expired'], 1)
+
+    def test_oldest_entry_is_evicted_at_capacity(self):
+        index = NearDuplicateIndex(max_entries=2)
+        for n in range(3):
+            index.add('scope', f'{QUESTION} ({n})', str(n))
+        self.assertEqual(len(index), 2)
+        self.assertEqual(index.evicted, 1)
+        self.assertGreater(index.stats()['buckets'], 0)
+
+    def test_invalid_shapes_are_rejected(self):
+        with self.assertRaises(ValueError):
+            MinHasher(num_perm=64)
+        with self.assertRaises(ValueError):
+            NearDuplicateIndex(num_perm=32, bands=5)
+
+
+class NearDuplicateCacheTests(SimpleTestCase):
+
+    def test_service_answers_near_duplicates_from_the_index(self):
+        server = start_stub(self)
+        service = make_service(**stub_env(server, AI_NEAR_DUP_ENABLED='True'))
+        first = service.get_result(MODEL_ID, QUESTION)
+        again = service.get_result(MODEL_ID, QUESTION.replace('this week', 'this week!'))
+        self.assertEqual(first.provider, Chat.OPENROUTER)
+        self.assertEqual(again.provider, Chat.CACHE)
+        self.assertEqual(again.content, first.content)
+        self.assertIsNone(make_service(**stub_env(server)).near_duplicates)
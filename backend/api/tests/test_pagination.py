@@ -0,0 +1,61 @@
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.exceptions import NotFound
+from rest_framework.test import APIClient
+
+from ..models import Chat
+from ..pagination import ChatHistoryPagination
+from .utils import make_chat
+
+
+class ChatHistoryPaginationTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('reader', password='pw')
+        other = User.objects.create_user('other', password='pw')
+        now = timezone.now()
+        # Two chats share a timestamp so the id breaks the tie
+        for minutes in (5, 4, 3, 3, 1):
+            make_chat(self.user, created_at=now - timedelta(minutes=minutes))
+        make_chat(other, created_at=now)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def expected_ids(self):
+        return list(
+            Chat.objects.filter(user=self.user).order_by('-created_at', '-pk').values_list('pk', flat=True)
+        )
+
+    def test_cursor_round_trip(self):
+        paginator = ChatHistoryPagination()
+        chat = Chat.objects.filter(user=self.user).first()
+        self.assertEqual(paginator.decode_cursor(paginator.encode_cursor(chat)), (chat.created_at, chat.pk))
+        row = {'created_at': chat.created_at, 'id': chat.pk}
+        self.assertEqual(paginator.encode_cursor(row), paginator.encode_cursor(chat))
+        with self.assertRaises(NotFound):
+            paginator.decode_cursor('not-a-cursor')
+
+    def test_next_links_walk_every_chat_once(self):
+        pages, url = [], '/api/chat/history/?page_size=2'
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            pages.append([row['id'] for row in response.data['results']])
+            url = response.data['next']
+        self.assertEqual([len(page) for page in pages], [2, 2, 1])
+        self.assertEqual(sum(pages, []), self.expected_ids())
+
+    def test_previous_link_returns_the_newer_page(self):
+        first = self.client.get('/api/chat/history/?page_size=2').data
+        self.assertIsNone(first['previous'])
+        second = self.client.get(first['next']).data
+        back = self.client.get(second['previous']).data
+        self.assertEqual([row['id'] for row in back['results']], [row['id'] for row in first['results']])
+        self.assertIsNone(back['previous'])
+
+    def test_invalid_cursor_is_not_found(self):
+        response = self.client.get('/api/chat/history/?before=garbage')
+        self.assertEqual(response.status_code, 404)
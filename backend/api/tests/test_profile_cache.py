@@ -0,0 +1,54 @@
+import os
+import time
+import unittest
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from ..models import UserProfile
+from ..services import aget_or_create_profile, get_or_create_profile
+
+
+class ProfileCacheTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('cached-user', password='pw')
+
+    def test_profile_is_read_from_the_cache(self):
+        get_or_create_profile(self.user)
+        with self.assertNumQueries(0):
+            profile = get_or_create_profile(self.user)
+        self.assertEqual(profile.language_preference, 'en')
+        self.assertIs(profile.user, self.user)
+
+    async def test_async_reads_share_the_cache(self):
+        await aget_or_create_profile(self.user, default_language='ar')
+        # Bypasses the save signals, so only a cache read still sees 'ar'
+        await UserProfile.objects.filter(user=self.user).aupdate(language_preference='fr')
+        self.assertEqual((await aget_or_create_profile(self.user)).language_preference, 'ar')
+        self.assertEqual(get_or_create_profile(self.user).language_preference, 'ar')
+
+    def test_saves_invalidate_the_cached_profile(self):
+        get_or_create_profile(self.user)
+        client = APIClient()
+        client.force_authenticate(self.user)
+        self.assertEqual(client.put('/api/user/language/', {'language': 'ar'}, format='json').status_code, 200)
+        self.assertEqual(get_or_create_profile(self.user).language_preference, 'ar')
+
+    def test_unseen_changes_are_served_for_at_most_the_ttl(self):
+        get_or_create_profile(self.user)
+        # A save in another worker only invalidates that worker's cache
+        UserProfile.objects.filter(user=self.user).update(language_preference='ar')
+        self.assertEqual(get_or_create_profile(self.user).language_preference, 'en')
+        later = time.time() + settings.PROFILE_CACHE_TTL + 1
+        with mock.patch('django.core.cache.backends.locmem.time.time', return_value=later):
+            self.assertEqual(get_or_create_profile(self.user).language_preference, 'ar')
+
+    @unittest.skipIf(settings.REDIS_URL or 'PROFILE_CACHE_TTL' in os.environ, 'TTL configured explicitly')
+    def test_per_process_cache_keeps_profiles_briefly(self):
+        self.assertLessEqual(settings.PROFILE_CACHE_TTL, 5)
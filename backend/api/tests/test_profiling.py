@@ -0,0 +1,134 @@
+import os
+import tempfile
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+from rest_framework.test import APIClient
+
+from .. import profiling, views
+from ..authentication import issue_tokens
+from .utils import MODEL_ID, make_chat, make_service, start_stub, stub_env
+
+
+def timing(response):
+    """``Server-Timing`` entries as ``{name: (duration_ms, description)}``."""
+    entries = {}
+    for entry in response['Server-Timing'].split(', '):
+        name, *params = entry.split(';')
+        params = dict(param.split('=', 1) for param in params)
+        entries[name] = (float(params['dur']), params.get('desc', '').strip('"'))
+    return entries
+
+
+class RequestProfileTests(SimpleTestCase):
+
+    def test_queries_are_grouped_by_statement(self):
+        profile = profiling.RequestProfile()
+        profile.add_query('SELECT 1', 0.002)
+        profile.add_query('SELECT 2', 0.010)
+        profile.add_query('SELECT 1', 0.003)
+        self.assertEqual(profile.query_count, 3)
+        self.assertAlmostEqual(profile.query_seconds, 0.015)
+        top = profile.top_queries(5)
+        self.assertEqual([(sql, count) for sql, count, _ in top], [('SELECT 2', 1), ('SELECT 1', 2)])
+        self.assertAlmostEqual(top[1][2], 0.005)
+
+    def test_distinct_statements_are_capped(self):
+        profile = profiling.RequestProfile()
+        for n in range(profiling.MAX_STATEMENTS + 5):
+            profile.add_query(f'SELECT {n}', 0.001)
+        self.assertEqual(profile.query_count, profiling.MAX_STATEMENTS + 5)
+        self.assertEqual(len(profile.statements), profiling.MAX_STATEMENTS)
+
+    def test_server_timing_lists_phases_database_and_total(self):
+        profile = profiling.RequestProfile()
+        profile.add_phase('upstream', 0.25)
+        profile.add_phase('upstream', 0.25)
+        profile.add_query('SELECT 1', 0.004)
+        self.assertEqual(profiling.server_timing(profile, 0.6),
+                         'upstream;dur=500.0, db;dur=4.0;desc="1 queries", total;dur=600.0')
+
+    def test_phases_outside_a_request_are_ignored(self):
+        with profiling.phase('upstream'):
+            pass
+        profiling.record_phase('upstream', 1.0)
+        self.assertIsNone(profiling._current.get())
+
+    def test_finish_detaches_the_profile(self):
+        request = mock.Mock(spec=[])
+        profile = profiling.start(request)
+        self.assertIs(profiling.start(request), profile)
+        with profiling.phase('serialize'):
+            pass
+        self.assertIn('serialize', profile.phases)
+        profiling.finish(request)
+        profiling.finish(request)
+        self.assertIsNone(profiling._current.get())
+
+
+class ProfilingMiddlewareTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('profiled', password='pw')
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {issue_tokens(self.user).access_token}')
+
+    def test_chat_response_breaks_down_its_time(self):
+        server = start_stub(self, latency_ms=100)
+        with mock.patch.object(views, 'ai_service', make_service(**stub_env(server))):
+            response = self.client.post('/api/chat/', {'message': 'time me', 'model': MODEL_ID}, format='json')
+        self.assertEqual(response.status_code, 200)
+        entries = timing(response)
+        self.assertGreaterEqual(entries['upstream'][0], 100)
+        for name in ('profile', 'db_write', 'db', 'total'):
+            self.assertIn(name, entries)
+        self.assertRegex(entries['db'][1], r'^\d+ queries$')
+        self.assertGreaterEqual(entries['total'][0], entries['upstream'][0])
+        # Nothing is left attached to the thread for the next request
+        self.assertIsNone(profiling._current.get())
+
+    @override_settings(SERVER_TIMING_HEADER=False)
+    def test_header_can_be_turned_off(self):
+        self.assertNotIn('Server-Timing', self.client.get('/health/'))
+
+    @override_settings(SLOW_REQUEST_MS=0, SLOW_REQUEST_TOP_QUERIES=1)
+    def test_slow_requests_are_logged_with_their_top_queries(self):
+        make_chat(self.user)
+        with self.assertLogs('api.profiling', 'WARNING') as logs:
+            self.client.get('/api/chat/history/')
+        lines = logs.records[0].getMessage().splitlines()
+        self.assertRegex(lines[0], r'^Slow request GET /api/chat/history/ \(.+\) -> 200 in \d+ms; phases: ')
+        self.assertEqual(len(lines), 2)
+        self.assertRegex(lines[1], r'^  [\d.]+ms x\d+: SELECT ')
+
+    @override_settings(SLOW_REQUEST_MS=60_000)
+    def test_fast_requests_are_not_logged(self):
+        with mock.patch.object(profiling.logger, 'warning') as warning:
+            self.client.get('/health/')
+        warning.assert_not_called()
+
+    def test_streamed_response_is_logged_once_sent(self):
+        make_chat(self.user)
+        with override_settings(SLOW_REQUEST_MS=0), mock.patch.object(profiling.logger, 'warning') as warning:
+            response = self.client.get('/api/chat/export/')
+            self.assertIn('Server-Timing', response)
+            warning.assert_not_called()
+            b''.join(response.streaming_content)
+        warning.assert_called_once()
+        self.assertIn('/api/chat/export/', warning.call_args.args[0])
+        self.assertIsNone(profiling._current.get())
+
+    def test_sampled_slow_requests_save_their_profile(self):
+        with tempfile.TemporaryDirectory() as directory:
+            with override_settings(SLOW_REQUEST_MS=0, PROFILE_SAMPLE_RATE=1, PROFILE_DIR=directory), \
+                    self.assertLogs('api.profiling', 'WARNING') as logs:
+                self.client.get('/health/')
+            files = os.listdir(directory)
+            self.assertEqual(len(files), 1)
+            self.assertTrue(files[0].endswith('.prof'))
+            self.assertIn(f'  profile: {os.path.join(directory, files[0])}', logs.output[0])
+        self.assertFalse(profiling._profiler_lock.locked())
+        self.assertRegex(files[0], r'^\d{8}T\d{6}-')
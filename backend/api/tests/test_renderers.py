@@ -0,0 +1,67 @@
+import json
+import uuid
+from decimal import Decimal
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.test import SimpleTestCase, TestCase
+from django.utils.translation import gettext_lazy
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from .. import renderers
+from ..models import Chat
+from ..renderers import FastJSONRenderer, dumps
+from ..serializers import CHAT_ROW_FIELDS, ChatSerializer, chat_rows
+from .utils import make_chat
+
+PAYLOAD = {'text': '\u0645\u0631\u062d\u0628\u0627 "hi"\n', 'count': 3, 'ratio': 0.5, 'none': None, 'items': [1, 'two']}
+
+
+class DumpsTests(SimpleTestCase):
+
+    def test_output_matches_the_stdlib_encoder(self):
+        self.assertIsNotNone(renderers.orjson)
+        self.assertEqual(json.loads(dumps(PAYLOAD)), PAYLOAD)
+        # UTF-8 bytes, not \\u escapes
+        self.assertIn('\u0645\u0631\u062d\u0628\u0627'.encode(), dumps(PAYLOAD))
+
+    def test_types_orjson_lacks_use_the_drf_encoder(self):
+        value = uuid.uuid4()
+        data = json.loads(dumps({'price': Decimal('1.50'), 'id': value, 'label': gettext_lazy('Chat')}))
+        self.assertEqual(data, {'price': 1.5, 'id': str(value), 'label': 'Chat'})
+
+    def test_stdlib_fallback_without_orjson(self):
+        with mock.patch.object(renderers, 'orjson', None):
+            self.assertEqual(json.loads(dumps(PAYLOAD)), PAYLOAD)
+            self.assertEqual(FastJSONRenderer().render(PAYLOAD), JSONRenderer().render(PAYLOAD))
+
+
+class FastJSONRendererTests(SimpleTestCase):
+
+    def test_renders_like_drf(self):
+        self.assertEqual(json.loads(FastJSONRenderer().render(PAYLOAD)), json.loads(JSONRenderer().render(PAYLOAD)))
+        self.assertEqual(FastJSONRenderer().render(None), b'')
+
+    def test_indented_output_is_left_to_drf(self):
+        rendered = FastJSONRenderer().render(PAYLOAD, 'application/json; indent=2')
+        self.assertEqual(rendered, JSONRenderer().render(PAYLOAD, 'application/json; indent=2'))
+        self.assertIn(b'\n  ', rendered)
+
+
+class ChatRowsTests(TestCase):
+
+    def test_rows_match_the_model_serializer(self):
+        user = User.objects.create_user('rows-user', password='pw')
+        make_chat(user, 'question', 'answer', language='ar')
+        rows = chat_rows(Chat.objects.filter(user=user).values(*CHAT_ROW_FIELDS), user.username)
+        self.assertEqual(rows, ChatSerializer(Chat.objects.filter(user=user), many=True).data)
+
+    def test_history_endpoint_serves_the_fast_rows(self):
+        user = User.objects.create_user('history-user', password='pw')
+        chat = make_chat(user, 'question', 'answer')
+        client = APIClient()
+        client.force_authenticate(user)
+        response = client.get('/api/chat/history/', HTTP_ACCEPT='application/json')
+        self.assertEqual(response['Content-Type'], 'application/json')
+        self.assertEqual(response.json()['results'], [dict(ChatSerializer(chat).data)])
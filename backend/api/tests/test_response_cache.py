@@ -0,0 +1,72 @@
+import time
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from ..models import Chat
+from ..response_cache import LRUTTLCache, ResponseCache
+from .utils import MODEL_ID, make_service, start_stub, stub_env
+
+
+class LRUTTLCacheTests(SimpleTestCase):
+
+    def test_least_recently_used_entry_is_evicted(self):
+        store = LRUTTLCache(max_entries=2, ttl=60)
+        store.set('a', 1)
+        store.set('b', 2)
+        self.assertEqual(store.get('a'), 1)
+        store.set('c', 3)
+        self.assertIsNone(store.get('b'))
+        self.assertEqual(store.get('a'), 1)
+        self.assertEqual(store.get('c'), 3)
+        self.assertEqual(store.evictions, 1)
+
+    def test_total_size_is_bounded(self):
+        store = LRUTTLCache(max_entries=10, ttl=60, max_size=10)
+        store.set('a', 'x' * 6, size=6)
+        store.set('b', 'y' * 6, size=6)
+        self.assertIsNone(store.get('a'))
+        self.assertEqual(store.size, 6)
+        # Larger than the whole cache: never stored
+        store.set('c', 'z' * 11, size=11)
+        self.assertIsNone(store.get('c'))
+        self.assertEqual(store.get('b'), 'y' * 6)
+
+    def test_expired_entries_are_dropped(self):
+        store = LRUTTLCache(max_entries=10, ttl=60)
+        store.set('a', 1, size=3)
+        with mock.patch('api.response_cache.time.monotonic', return_value=time.monotonic() + 61):
+            self.assertIsNone(store.get('a'))
+        self.assertEqual(store.expirations, 1)
+        self.assertEqual(len(store), 0)
+        self.assertEqual(store.size, 0)
+
+
+class ResponseCacheTests(SimpleTestCase):
+
+    def test_response_cache_skips_failures_and_shares_normalized_keys(self):
+        responses = ResponseCache()
+        key = responses.make_key('m', 'en', 'system', 'Hello   World')
+        self.assertEqual(key, responses.make_key('m', 'en', 'system', 'hello world'))
+        responses.set(key, 'Error: upstream down')
+        self.assertIsNone(responses.get(key))
+        responses.set(key, 'Hi!')
+        self.assertEqual(responses.get(key), 'Hi!')
+        self.assertEqual((responses.hits, responses.misses), (1, 1))
+
+
+    def test_repeated_question_is_answered_from_cache(self):
+        server = start_stub(self)
+        service = make_service(**stub_env(server, AI_RESPONSE_CACHE_ENABLED='True'))
+        first = service.get_result(MODEL_ID, 'What is Django?')
+        again = service.get_result(MODEL_ID, 'what is   django?')
+        self.assertEqual(first.provider, Chat.OPENROUTER)
+        self.assertEqual(again.provider, Chat.CACHE)
+        self.assertEqual(again.content, first.content)
+        self.assertEqual(service.get_result(MODEL_ID, 'What is Django?', use_cache=False).provider, Chat.OPENROUTER)
+
+    def test_cache_is_off_by_default(self):
+        server = start_stub(self)
+        service = make_service(**stub_env(server))
+        service.get_result(MODEL_ID, 'What is Django?')
+        self.assertEqual(service.get_result(MODEL_ID, 'What is Django?').provider, Chat.OPENROUTER)
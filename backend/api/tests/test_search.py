@@ -0,0 +1,84 @@
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from ..models import Chat
+from ..search import ChatSearch, highlight
+from .utils import make_chat
+
+
+class ChatSearchTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('searcher', password='pw')
+        self.greeting = make_chat(self.user, 'Hello world', 'Greetings to you')
+        # "marhaban ya sadiqi" with diacritics; reply "ahlan" spelled with hamza on alef
+        self.arabic = make_chat(self.user, '\u0645\u064E\u0631\u0652\u062D\u064E\u0628\u064B\u0627 \u064A\u0627 \u0635\u062F\u064A\u0642\u064A',
+                                '\u0623\u0647\u0644\u0627')
+        self.asked = make_chat(self.user, 'python tips', 'sure thing')
+        self.answered = make_chat(self.user, 'sure thing', 'python tips')
+        make_chat(User.objects.create_user('stranger', password='pw'), 'Hello there', 'Hi')
+
+    def ids(self, query):
+        return [pk for pk, _ in ChatSearch(self.user.id, query)[0:10]]
+
+    def test_last_term_matches_as_prefix(self):
+        self.assertEqual(self.ids('hel'), [self.greeting.pk])
+        self.assertEqual(self.ids('hello wor'), [self.greeting.pk])
+        self.assertEqual(self.ids('wor hello'), [])
+
+    def test_arabic_is_matched_without_diacritics_or_letter_variants(self):
+        self.assertEqual(self.ids('\u0645\u0631\u062D\u0628\u0627'), [self.arabic.pk])
+        self.assertEqual(self.ids('\u0627\u0647\u0644\u0627'), [self.arabic.pk])
+
+    def test_user_message_ranks_above_ai_response(self):
+        self.assertEqual(self.ids('python'), [self.asked.pk, self.answered.pk])
+
+    def test_deleted_chats_leave_the_index(self):
+        self.greeting.delete()
+        self.assertEqual(self.ids('hello'), [])
+
+    def test_highlight_marks_matches_and_escapes_html(self):
+        self.assertEqual(highlight('<b>hello</b> world', ['hello']), '&lt;b&gt;<mark>hello</mark>&lt;/b&gt; world')
+        self.assertEqual(
+            highlight(self.arabic.user_message, ['\u0645\u0631\u062D\u0628\u0627']),
+            '<mark>\u0645\u064E\u0631\u0652\u062D\u064E\u0628\u064B\u0627</mark> \u064A\u0627 \u0635\u062F\u064A\u0642\u064A',
+        )
+        self.assertIsNone(highlight('nothing here', ['hello']))
+
+    def test_long_text_is_cut_around_the_first_match(self):
+        text = ' '.join(['filler'] * 60 + ['needle'] + ['filler'] * 60)
+        snippet = highlight(text, ['needle'], length=80)
+        self.assertTrue(snippet.startswith('\u2026filler'))
+        self.assertTrue(snippet.endswith('filler\u2026'))
+        self.assertIn('<mark>needle</mark>', snippet)
+
+    def test_search_endpoint(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        response = client.get('/api/chat/search/', {'q': 'python'})
+        self.assertEqual(response.status_code, 200)
+        first = response.data['results'][0]
+        self.assertEqual(first['id'], self.asked.pk)
+        self.assertEqual(first['highlights'], {'user_message': '<mark>python</mark> tips'})
+        self.assertEqual(client.get('/api/chat/search/', {'q': '  ?! '}).status_code, 400)
+
+    def test_edited_chats_are_reindexed(self):
+        self.greeting.ai_response = 'Farewell friend'
+        self.greeting.save()
+        self.assertEqual(self.ids('farewell'), [self.greeting.pk])
+        self.assertEqual(self.ids('greetings'), [])
+
+    def test_rebuild_restores_a_lost_index(self):
+        table = 'api_chat_fts' if connection.vendor == 'sqlite' else 'api_chat_search'
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {table}')
+        self.assertEqual(self.ids('hello'), [])
+        out = StringIO()
+        call_command('rebuild_search_index', stdout=out)
+        self.assertIn(f'Indexed {Chat.objects.count()} chat(s)', out.getvalue())
+        self.assertEqual(self.ids('hello'), [self.greeting.pk])
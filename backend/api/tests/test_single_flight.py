@@ -0,0 +1,71 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.cache import cache
+from django.test import SimpleTestCase
+
+from ..models import Chat
+from .utils import MODEL_ID, closed_port_url, make_service, start_stub, stub_env
+
+
+class SingleFlightTests(SimpleTestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.server = start_stub(self, latency_ms=300)
+
+    def ask_concurrently(self, service, count=3):
+        with ThreadPoolExecutor(count) as pool:
+            return list(pool.map(lambda _: service.get_result(MODEL_ID, 'same question', use_cache=False),
+                                 range(count)))
+
+    def test_identical_concurrent_chats_share_one_upstream_call(self):
+        service = make_service(**stub_env(self.server))
+        results = self.ask_concurrently(service)
+        self.assertEqual(sorted(result.provider for result in results),
+                         [Chat.CACHE, Chat.CACHE, Chat.OPENROUTER])
+        self.assertEqual(len({result.content for result in results}), 1)
+        self.assertEqual(self.server.connections, 1)
+        stats = service.single_flight.stats()
+        self.assertEqual((stats['leaders'], stats['coalesced'], stats['in_flight']), (1, 2, 0))
+
+    def test_shared_failures_are_not_reported_as_cache_hits(self):
+        server = start_stub(self, latency_ms=300, error_rate=1.0)
+        service = make_service(**stub_env(server, HUGGINGFACE_API_URL=closed_port_url()))
+        results = self.ask_concurrently(service)
+        self.assertEqual([result.provider for result in results], [Chat.HUGGINGFACE] * 3)
+        self.assertFalse(any(result.ok for result in results))
+        self.assertEqual(service.single_flight.stats()['coalesced'], 2)
+
+    def test_async_chats_share_one_upstream_call(self):
+        service = make_service(**stub_env(self.server))
+
+        async def chat():
+            results = await asyncio.gather(*(service.aget_result(MODEL_ID, 'same question', use_cache=False)
+                                             for _ in range(3)))
+            await service.async_transport.aclose()
+            return results
+
+        results = asyncio.run(chat())
+        self.assertEqual(sorted(result.provider for result in results),
+                         [Chat.CACHE, Chat.CACHE, Chat.OPENROUTER])
+        self.assertEqual(self.server.connections, 1)
+
+    def test_workers_share_calls_through_the_cache(self):
+        env = stub_env(self.server, AI_SINGLE_FLIGHT_SHARED='True', AI_SINGLE_FLIGHT_POLL_INTERVAL='0.02')
+        first, second = make_service(**env), make_service(**env)
+        results = {}
+        leader = threading.Thread(target=lambda: results.update(first=first.get_result(MODEL_ID, 'same question')))
+        leader.start()
+        # The leader holds the cache lock once its upstream call is out
+        while not self.server.connections:
+            time.sleep(0.005)
+        results['second'] = second.get_result(MODEL_ID, 'same question')
+        leader.join()
+        self.assertEqual(results['first'].provider, Chat.OPENROUTER)
+        self.assertEqual(results['second'].provider, Chat.CACHE)
+        self.assertEqual(results['second'].content, results['first'].content)
+        self.assertEqual(second.single_flight.stats()['shared_hits'], 1)
+        self.assertEqual(self.server.connections, 1)
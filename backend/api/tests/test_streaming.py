@@ -0,0 +1,126 @@
+import asyncio
+import json
+import time
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import path
+from rest_framework.test import APIClient
+
+from config.asgi import application
+
+from .. import async_views, views
+from ..authentication import issue_tokens
+from ..models import Chat
+from .utils import MODEL_ID, make_service, start_stub, stub_env
+
+urlpatterns = [path('api/chat/stream/', async_views.chat_stream)]
+
+
+def in_flight(service):
+    return service.admission.snapshot()['limits']['openrouter']['in_flight']
+
+
+class SyncChatStreamTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('stream-user', password='pw')
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {issue_tokens(self.user).access_token}')
+        # 20 deltas, 50ms apart
+        self.server = start_stub(self, latency_ms=1000, chunks=20)
+        patcher = mock.patch.object(views, 'ai_service', make_service(**stub_env(self.server)))
+        self.service = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def stream(self):
+        return self.client.post('/api/chat/stream/', {'message': 'hello stream', 'model': MODEL_ID}, format='json')
+
+    def test_completed_stream_is_saved_once(self):
+        response = self.stream()
+        body = b''.join(response.streaming_content).decode()
+        self.assertIn('event: done', body)
+        chat = Chat.objects.get(user=self.user)
+        self.assertEqual(chat.provider, Chat.OPENROUTER)
+        self.assertTrue(chat.ai_response.startswith('stream-0'))
+        self.assertIsNotNone(chat.completion_tokens)
+
+    def test_disconnect_saves_the_partial_reply(self):
+        response = self.stream()
+        for chunk in response.streaming_content:
+            if chunk.startswith(b'event: delta'):
+                break
+        started = time.monotonic()
+        response.close()
+        self.assertLess(time.monotonic() - started, 0.5)
+        chat = Chat.objects.get(user=self.user)
+        self.assertEqual(chat.provider, Chat.OPENROUTER)
+        self.assertTrue(chat.ai_response.startswith('stream-0'))
+        self.assertNotIn('stream-19', chat.ai_response)
+        self.assertIsNone(chat.completion_tokens)
+        self.assertLess(chat.upstream_latency_ms, 1000)
+        self.assertEqual(in_flight(self.service), 0)
+
+
+@override_settings(ROOT_URLCONF=__name__)
+class AsgiChatStreamTests(TransactionTestCase):
+    """Drives ``config.asgi.application`` the way an ASGI server would."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('asgi-stream-user', password='pw')
+        self.token = str(issue_tokens(self.user).access_token)
+        self.server = start_stub(self, latency_ms=2000, chunks=20)
+        patcher = mock.patch.object(async_views, 'ai_service', make_service(**stub_env(self.server)))
+        self.service = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def stream(self, disconnect=False, token=None):
+        """Run one request; with ``disconnect`` the client leaves after the first delta."""
+        body = json.dumps({'message': 'hello stream', 'model': MODEL_ID}).encode()
+        scope = {
+            'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'POST',
+            'scheme': 'http', 'path': '/api/chat/stream/', 'raw_path': b'/api/chat/stream/',
+            'query_string': b'', 'root_path': '', 'client': ('127.0.0.1', 50000), 'server': ('testserver', 80),
+            'headers': [(b'host', b'testserver'), (b'content-type', b'application/json'),
+                        (b'content-length', str(len(body)).encode()), (b'authorization', f'Bearer {token or self.token}'.encode())],
+        }
+        inbox = asyncio.Queue()
+        inbox.put_nowait({'type': 'http.request', 'body': body, 'more_body': False})
+        sent = []
+
+        async def send(message):
+            sent.append(message)
+            if disconnect and message.get('body', b'').startswith(b'event: delta'):
+                inbox.put_nowait({'type': 'http.disconnect'})
+
+        await asyncio.wait_for(application(scope, inbox.get, send), timeout=5)
+        return sent
+
+    async def test_completed_stream_is_saved_once(self):
+        sent = await self.stream()
+        self.assertEqual(sent[0]['status'], 200)
+        self.assertIn(b'event: done', b''.join(message.get('body', b'') for message in sent))
+        self.assertFalse(sent[-1].get('more_body', False))
+        chat = await Chat.objects.aget(user_id=self.user.pk)
+        self.assertIsNotNone(chat.completion_tokens)
+
+    async def test_disconnect_cancels_the_stream_and_saves_the_partial_reply(self):
+        started = time.monotonic()
+        await self.stream(disconnect=True)
+        # The upstream reply takes 2s; the handler returns as soon as the client leaves
+        self.assertLess(time.monotonic() - started, 1.5)
+        chat = await Chat.objects.aget(user_id=self.user.pk)
+        self.assertEqual(chat.provider, Chat.OPENROUTER)
+        self.assertTrue(chat.ai_response.startswith('stream-0'))
+        self.assertNotIn('stream-19', chat.ai_response)
+        self.assertIsNone(chat.completion_tokens)
+        self.assertEqual(in_flight(self.service), 0)
+
+    async def test_plain_responses_are_sent_normally(self):
+        sent = await self.stream(token='not-a-token')
+        self.assertEqual(sent[0]['status'], 401)
+        self.assertEqual(await Chat.objects.acount(), 0)
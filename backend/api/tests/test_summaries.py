@@ -0,0 +1,168 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+from django.utils import timezone
+
+from ..ai_service import ai_service
+from ..models import ChatSession, Job, UserProfile
+from ..summaries import SESSION_SUMMARY_JOB, SUMMARY_JOB, generate_profile_summary, summarize_session
+from .utils import make_chat
+
+
+def numbered_summaries(calls):
+    """``generate_*_summary`` stand-in answering 'summary 1', 'summary 2', ..."""
+    def generate(chats, language, previous):
+        calls.append(([chat['user_message'] for chat in chats], previous))
+        return f'summary {len(calls)}'
+    return generate
+
+
+class ProfileSummaryTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('summarized', password='pw')
+        self.profile = UserProfile.objects.create(user=self.user)
+        now = timezone.now()
+        self.older = make_chat(self.user, 'first question', created_at=now - timedelta(minutes=10))
+        self.newer = make_chat(self.user, 'second question', created_at=now - timedelta(minutes=5))
+
+    def run_job(self):
+        return generate_profile_summary(Job.objects.create(kind=SUMMARY_JOB, user=self.user))
+
+    def summarize(self, summary):
+        with mock.patch.object(ai_service, 'generate_user_summary', return_value=summary) as generate:
+            result = self.run_job()
+        self.profile.refresh_from_db()
+        return generate, result
+
+    def make_chats(self, count):
+        start = self.newer.created_at + timedelta(seconds=1)
+        return [make_chat(self.user, f'q{n}', created_at=start + timedelta(seconds=n)) for n in range(count)]
+
+    def test_first_summary_covers_every_chat(self):
+        generate, _ = self.summarize('Likes questions')
+        chats, _, previous = generate.call_args.args
+        self.assertEqual([chat['user_message'] for chat in chats], ['second question', 'first question'])
+        self.assertIsNone(previous)
+        self.assertEqual(self.profile.ai_summary, 'Likes questions')
+        self.assertEqual(self.profile.summary_updated_at, self.newer.created_at)
+
+    def test_only_new_chats_are_folded_into_the_summary(self):
+        self.summarize('Likes questions')
+        make_chat(self.user, 'third question')
+
+        generate, _ = self.summarize('Likes many questions')
+        chats, _, previous = generate.call_args.args
+        self.assertEqual([chat['user_message'] for chat in chats], ['third question'])
+        self.assertEqual(previous, 'Likes questions')
+        self.assertEqual(self.profile.ai_summary, 'Likes many questions')
+
+    def test_no_new_chats_skips_the_upstream_call(self):
+        self.summarize('Likes questions')
+        generate, result = self.summarize('unused')
+        generate.assert_not_called()
+        self.assertTrue(result['unchanged'])
+        self.assertEqual(self.profile.ai_summary, 'Likes questions')
+
+    def test_failed_generation_keeps_the_watermark(self):
+        self.summarize('Likes questions')
+        make_chat(self.user, 'third question')
+        with mock.patch.object(ai_service, 'generate_user_summary', return_value='Error: upstream down'):
+            with self.assertRaises(RuntimeError):
+                self.run_job()
+        self.profile.refresh_from_db()
+        self.assertEqual(self.profile.ai_summary, 'Likes questions')
+        self.assertEqual(self.profile.summary_updated_at, self.newer.created_at)
+
+    def test_stored_error_is_not_used_as_previous_summary(self):
+        UserProfile.objects.filter(pk=self.profile.pk).update(ai_summary='Error generating summary: boom')
+        generate, _ = self.summarize('Fresh summary')
+        chats, _, previous = generate.call_args.args
+        self.assertEqual(len(chats), 2)
+        self.assertIsNone(previous)
+
+    def test_many_chats_are_folded_oldest_first_in_batches(self):
+        self.summarize('Likes questions')
+        chats = self.make_chats(120)
+        calls = []
+        with mock.patch.object(ai_service, 'generate_user_summary', side_effect=numbered_summaries(calls)):
+            result = self.run_job()
+        self.profile.refresh_from_db()
+        self.assertEqual([len(messages) for messages, _ in calls], [50, 50, 20])
+        # Each batch is sent newest first and folded into the previous batch's summary
+        self.assertEqual(calls[0][0][-1], 'q0')
+        self.assertEqual(calls[0][0][0], 'q49')
+        self.assertEqual([previous for _, previous in calls], ['Likes questions', 'summary 1', 'summary 2'])
+        self.assertEqual(self.profile.ai_summary, 'summary 3')
+        self.assertEqual(self.profile.summary_updated_at, chats[-1].created_at)
+        self.assertNotIn('continued_by', result)
+
+    def test_batches_fit_the_summary_token_budget(self):
+        self.make_chats(30)
+        calls = []
+        with mock.patch.object(ai_service, 'summary_token_budget', 100), \
+                mock.patch.object(ai_service, 'generate_user_summary', side_effect=numbered_summaries(calls)):
+            self.run_job()
+        sent = [message for messages, _ in calls for message in reversed(messages)]
+        self.assertGreater(len(calls), 1)
+        self.assertEqual(sent, ['first question', 'second question'] + [f'q{n}' for n in range(30)])
+
+    def test_failure_keeps_the_batches_already_folded(self):
+        chats = self.make_chats(120)
+        replies = iter(['summary 1', 'Error: upstream down'])
+        with mock.patch.object(ai_service, 'generate_user_summary', side_effect=lambda *args: next(replies)):
+            with self.assertRaises(RuntimeError):
+                self.run_job()
+        self.profile.refresh_from_db()
+        self.assertEqual(self.profile.ai_summary, 'summary 1')
+        # The first batch: the two setUp chats and q0..q47
+        self.assertEqual(self.profile.summary_updated_at, chats[47].created_at)
+
+    def test_chats_left_after_the_last_batch_go_to_a_follow_up_job(self):
+        chats = self.make_chats(120)
+        calls = []
+        with mock.patch('api.summaries.SUMMARY_BATCHES', 1), \
+                mock.patch.object(ai_service, 'generate_user_summary', side_effect=numbered_summaries(calls)):
+            result = self.run_job()
+        self.assertEqual(len(calls), 1)
+        follow_up = Job.objects.get(pk=result['continued_by'])
+        self.assertEqual((follow_up.kind, follow_up.status), (SUMMARY_JOB, Job.QUEUED))
+        self.profile.refresh_from_db()
+        self.assertEqual(self.profile.summary_updated_at, chats[47].created_at)
+
+
+class SessionSummaryTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('session-summarized', password='pw')
+        self.session = ChatSession.objects.create(user=self.user)
+        start = timezone.now() - timedelta(hours=1)
+        self.chats = [
+            make_chat(self.user, f't{n}', session=self.session, created_at=start + timedelta(seconds=n))
+            for n in range(60)
+        ]
+
+    def fold(self):
+        calls = []
+        job = Job.objects.create(kind=SESSION_SUMMARY_JOB, user=self.user, payload={'session_id': self.session.pk})
+        # No turn fits the kept half of the context, so every turn is folded
+        with mock.patch.object(ai_service, 'context_budget', return_value=0), \
+                mock.patch.object(ai_service, 'generate_session_summary', side_effect=numbered_summaries(calls)):
+            result = summarize_session(job)
+        self.session.refresh_from_db()
+        return calls, result
+
+    def test_oldest_turns_are_folded_first(self):
+        calls, result = self.fold()
+        messages, previous = calls[0]
+        self.assertEqual((messages[-1], messages[0], previous), ('t0', 't49', None))
+        self.assertEqual(self.session.summary, 'summary 1')
+        self.assertEqual(self.session.summarized_through, self.chats[49].created_at)
+        self.assertEqual(Job.objects.get(pk=result['continued_by']).payload, {'session_id': self.session.pk})
+
+        calls, result = self.fold()
+        self.assertEqual(calls[0][0][-1], 't50')
+        self.assertEqual(self.session.summarized_through, self.chats[-1].created_at)
+        self.assertNotIn('continued_by', result)
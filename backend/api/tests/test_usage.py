@@ -0,0 +1,127 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from .. import usage, views
+from ..authentication import issue_tokens
+from ..models import Chat
+from ..usage import cached_usage_summary, usage_summary
+from .utils import MODEL_ID, make_chat, make_service, start_stub, stub_env
+
+
+class UsageSummaryTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('counted', password='pw')
+        make_chat(self.user, model='a', provider=Chat.OPENROUTER, upstream_latency_ms=100,
+                  prompt_tokens=10, completion_tokens=20)
+        make_chat(self.user, model='a', provider=Chat.OPENROUTER, upstream_latency_ms=301,
+                  prompt_tokens=5, completion_tokens=5)
+        make_chat(self.user, model='a', provider=Chat.HUGGINGFACE, upstream_latency_ms=50,
+                  fallback_reason='http_429')
+        # Answered from the response cache: no upstream call
+        make_chat(self.user, model='a', provider=Chat.CACHE)
+        make_chat(self.user, model='a', provider=Chat.OPENROUTER, upstream_latency_ms=999,
+                  prompt_tokens=1, completion_tokens=1, created_at=timezone.now() - timedelta(hours=25))
+
+    def test_totals_and_breakdown_cover_the_window(self):
+        summary = usage_summary(24)
+        self.assertEqual(summary['totals'], {
+            'chats': 4, 'upstream_calls': 3, 'avg_latency_ms': 150, 'max_latency_ms': 301,
+            'prompt_tokens': 15, 'completion_tokens': 25, 'fallbacks': 1,
+        })
+        rows = {row['provider']: row for row in summary['by_model']}
+        self.assertEqual(set(rows), {Chat.OPENROUTER, Chat.HUGGINGFACE, Chat.CACHE})
+        self.assertEqual((rows[Chat.OPENROUTER]['chats'], rows[Chat.OPENROUTER]['avg_latency_ms']), (2, 200))
+        self.assertEqual(rows[Chat.CACHE]['upstream_calls'], 0)
+        self.assertEqual(summary['fallback_reasons'], {'http_429': 1})
+        self.assertEqual(usage_summary(48)['totals']['chats'], 5)
+
+    @override_settings(USAGE_CACHE_TTL=60)
+    def test_cached_summary_is_reused(self):
+        first = cached_usage_summary()
+        make_chat(self.user, model='a')
+        with self.assertNumQueries(0):
+            self.assertEqual(cached_usage_summary(), first)
+        self.assertEqual(cached_usage_summary(48)['totals']['chats'], 6)
+        cache.clear()
+        self.assertEqual(cached_usage_summary()['totals']['chats'], 5)
+
+
+# The manifest only exists after collectstatic
+@override_settings(STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage',
+                   USAGE_CACHE_TTL=60)
+class AdminUsageTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'pw'))
+        make_chat(User.objects.create_user('counted', password='pw'), provider=Chat.OPENROUTER)
+
+    def test_changelist_reuses_the_usage_summary(self):
+        with mock.patch.object(usage, 'usage_summary', wraps=usage.usage_summary) as summarize:
+            for _ in range(2):
+                response = self.client.get('/admin/api/chat/')
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.context['usage']['totals']['chats'], 1)
+        summarize.assert_called_once()
+
+
+class UsageEndpointTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('member', password='pw')
+        self.staff = User.objects.create_user('operator', password='pw', is_staff=True)
+        self.client = APIClient()
+
+    def get(self, user, **params):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {issue_tokens(user).access_token}')
+        return self.client.get('/api/monitoring/usage/', params)
+
+    def test_staff_only(self):
+        self.assertEqual(self.get(self.user).status_code, 403)
+        response = self.get(self.staff, hours=1)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['hours'], 1)
+
+    def test_window_is_validated(self):
+        for hours in ('0', 'day', str(24 * 31 + 1)):
+            self.assertEqual(self.get(self.staff, hours=hours).status_code, 400)
+
+
+class ChatAccountingTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('accounted', password='pw')
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {issue_tokens(self.user).access_token}')
+
+    def chat(self, **config):
+        server = start_stub(self, completion_words=7, **config)
+        with mock.patch.object(views, 'ai_service', make_service(**stub_env(server))):
+            response = self.client.post('/api/chat/', {'message': 'count my tokens', 'model': MODEL_ID},
+                                        format='json')
+        self.assertEqual(response.status_code, 200)
+        return Chat.objects.get(pk=response.json()['id'])
+
+    def test_openrouter_reply_records_latency_and_tokens(self):
+        chat = self.chat(latency_ms=50)
+        self.assertEqual(chat.provider, Chat.OPENROUTER)
+        self.assertGreaterEqual(chat.upstream_latency_ms, 50)
+        self.assertGreater(chat.prompt_tokens, 0)
+        self.assertEqual(chat.completion_tokens, 7)
+        self.assertEqual(chat.fallback_reason, '')
+
+    def test_fallback_records_its_reason(self):
+        chat = self.chat(error_rate=1, error_status=500)
+        self.assertEqual(chat.provider, Chat.HUGGINGFACE)
+        self.assertNotEqual(chat.fallback_reason, '')
+        self.assertIsNone(chat.prompt_tokens)
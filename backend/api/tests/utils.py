@@ -0,0 +1,73 @@
+import os
+import socket
+import time
+from unittest import mock
+
+from loadtest import stub_provider
+
+from ..ai_service import AIService
+from ..models import Chat
+
+MODEL_ID = 'meta-llama/llama-3.3-70b-instruct:free'
+
+
+def start_stub(test, **config):
+    """Local stub OpenRouter/Hugging Face provider, stopped when ``test`` ends.
+
+    ``server.connections`` counts the TCP connections it accepted.
+    """
+    server = stub_provider.start(config=stub_provider.StubConfig(**{'latency_ms': 0, 'jitter_ms': 0, **config}))
+    server.connections = 0
+    accept = server.get_request
+
+    def get_request():
+        server.connections += 1
+        return accept()
+
+    server.get_request = get_request
+    test.addCleanup(server.server_close)
+    test.addCleanup(server.shutdown)
+    return server
+
+
+def stub_env(server, **overrides):
+    """Environment pointing ``AIService`` at a stub provider."""
+    host, port = server.server_address[:2]
+    return {
+        'OPENROUTER_API_KEY': 'test-key',
+        'OPENROUTER_API_URL': f'http://{host}:{port}/api/v1/chat/completions',
+        'HUGGINGFACE_API_KEY': 'test-key',
+        'HUGGINGFACE_API_URL': f'http://{host}:{port}/models/',
+        **overrides,
+    }
+
+
+def closed_port_url(path='/models/'):
+    """URL of a local port nothing listens on: calls to it fail right away."""
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+    return f'http://127.0.0.1:{port}{path}'
+
+
+def make_service(**env):
+    """An ``AIService`` configured from ``env`` on top of the process environment."""
+    with mock.patch.dict(os.environ, env):
+        return AIService()
+
+
+def make_chat(user, user_message='question', ai_response='answer', created_at=None, **fields):
+    chat = Chat.objects.create(user=user, model=fields.pop('model', 'test-model'),
+                               user_message=user_message, ai_response=ai_response, **fields)
+    if created_at is not None:
+        Chat.objects.filter(pk=chat.pk).update(created_at=created_at)
+        chat.created_at = created_at
+    return chat
+
+
+def wait_until(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("Timed out waiting for condition")
+        time.sleep(0.005)
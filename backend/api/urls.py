@@ -1,6 +1,10 @@
 # api/urls.py
+from django.conf import settings
 from django.urls import path
-from . import views
+from . import views, async_views
+
+# Under ASGI, serve the upstream-bound endpoints from their async variants
+chat_views = async_views if settings.ASYNC_CHAT_VIEWS else views
 
 urlpatterns = [
     # API root - this will be at /api/
@@ -15,16 +19,29 @@ urlpatterns = [
     path('models/', views.get_models, name='get_models'),
 
     # Chat - these will be at /api/chat/
-    path('chat/', views.chat, name='chat'),
+    path('chat/', chat_views.chat, name='chat'),
+    path('chat/stream/', chat_views.chat_stream, name='chat_stream'),
     path('chat/history/', views.chat_history, name='chat_history'),
     path('chat/history/<int:chat_id>/', views.delete_chat, name='delete_chat'),
     path('chat/export/', views.export_history, name='export_history'),
+    path('chat/search/', views.chat_search, name='chat_search'),
+    path('chat/sessions/', views.chat_sessions, name='chat_sessions'),
 
     # User profile - these will be at /api/user/
     path('user/profile/', views.user_profile, name='user_profile'),
     path('user/profile/summary/', views.generate_profile_summary, name='generate_profile_summary'),
     path('user/profile/generate-summary/', views.generate_profile_summary, name='generate_profile_summary_alias'),
     path('user/language/', views.update_language, name='update_language'),
+
+    # Background jobs - these will be at /api/jobs/
+    path('jobs/<int:job_id>/', views.job_status, name='job_status'),
     
+    # Monitoring - these will be at /api/monitoring/
+    path('monitoring/cache/', views.cache_stats, name='cache_stats'),
+    path('monitoring/breakers/', views.breaker_stats, name='breaker_stats'),
+    path('monitoring/admission/', views.admission_stats, name='admission_stats'),
+    path('monitoring/hedging/', views.hedge_stats, name='hedge_stats'),
+    path('monitoring/usage/', views.usage_stats, name='usage_stats'),
+
     path('debug/db/', views.debug_db, name='debug_db'),
 ]
\ No newline at end of file
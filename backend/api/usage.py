@@ -0,0 +1,70 @@
+from datetime import timedelta
+from typing import Any, Dict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Avg, Count, Max, Q, Sum
+from django.utils import timezone
+
+from .models import Chat
+
+# Default and longest window of the usage aggregates, in hours
+USAGE_WINDOW_HOURS = 24
+MAX_USAGE_WINDOW_HOURS = 24 * 31
+
+
+def _aggregates():
+    return {
+        'chats': Count('pk'),
+        # Chats that made an upstream call (cache hits have no latency)
+        'upstream_calls': Count('upstream_latency_ms'),
+        'avg_latency_ms': Avg('upstream_latency_ms'),
+        'max_latency_ms': Max('upstream_latency_ms'),
+        'prompt_tokens': Sum('prompt_tokens'),
+        'completion_tokens': Sum('completion_tokens'),
+        'fallbacks': Count('pk', filter=~Q(fallback_reason='')),
+    }
+
+
+def _clean(row: Dict[str, Any]) -> Dict[str, Any]:
+    if row['avg_latency_ms'] is not None:
+        row['avg_latency_ms'] = round(row['avg_latency_ms'])
+    row['prompt_tokens'] = row['prompt_tokens'] or 0
+    row['completion_tokens'] = row['completion_tokens'] or 0
+    return row
+
+
+def usage_summary(hours: int = USAGE_WINDOW_HOURS) -> Dict[str, Any]:
+    """Chat volume, upstream latency, token usage and fallbacks over the last ``hours``.
+
+    Totals, a breakdown per provider and model, and fallback counts per
+    reason, read through the ``created_at`` index.
+    """
+    since = timezone.now() - timedelta(hours=hours)
+    chats = Chat.objects.filter(created_at__gte=since).order_by()
+    by_model = chats.values('provider', 'model').annotate(**_aggregates()).order_by('provider', 'model')
+    reasons = (
+        chats.exclude(fallback_reason='').values('fallback_reason')
+        .annotate(chats=Count('pk')).order_by('-chats')
+    )
+    return {
+        'since': since,
+        'hours': hours,
+        'totals': _clean(chats.aggregate(**_aggregates())),
+        'by_model': [_clean(row) for row in by_model],
+        'fallback_reasons': {row['fallback_reason']: row['chats'] for row in reasons},
+    }
+
+
+def cached_usage_summary(hours: int = USAGE_WINDOW_HOURS) -> Dict[str, Any]:
+    """``usage_summary`` reused for ``USAGE_CACHE_TTL`` seconds.
+
+    For pages rendered on every visit, like the chat changelist, where the
+    aggregates would otherwise scan the window's chats each time.
+    """
+    key = f"api:usage-summary:{hours}"
+    summary = cache.get(key)
+    if summary is None:
+        summary = usage_summary(hours)
+        cache.set(key, summary, settings.USAGE_CACHE_TTL)
+    return summary
@@ -1,28 +1,67 @@
 # api/views.py
-from django.http import HttpResponse
+import json
+import time
+from dataclasses import replace
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils.crypto import constant_time_compare
 from rest_framework import status
-from rest_framework.decorators import api_view, permission_classes
-from rest_framework.permissions import IsAuthenticated, AllowAny
+from rest_framework.decorators import api_view, authentication_classes, permission_classes, renderer_classes
+from rest_framework.permissions import IsAuthenticated, AllowAny, IsAdminUser
+from rest_framework.renderers import BrowsableAPIRenderer
 from rest_framework.response import Response
-from rest_framework_simplejwt.tokens import RefreshToken
 from django.contrib.auth import authenticate
 from django.contrib.auth.models import User
-from .models import Chat, UserProfile
+from .models import Chat, ChatSession, Job, UserProfile
 from django.conf import settings
 from django.urls import reverse
-from .serializers import ChatSerializer, UserProfileSerializer
+from .serializers import (
+    CHAT_ROW_FIELDS, ChatSessionSerializer, JobSerializer, UserProfileSerializer, chat_rows,
+)
+from .renderers import FastJSONRenderer
+from .pagination import ChatHistoryPagination, ChatSearchPagination
+from .search import ChatSearch, highlights
+from .exports import (
+    EXPORT_CHUNK_SIZE, EXPORT_FIELDS, aiter_chunks, gzip_stream, iter_json_export, iter_ndjson_export,
+)
 from .ai_service import ai_service
-from .services import get_or_create_profile
+from .admission import AdmissionRejected
+from .services import get_or_create_profile, load_counters
+from .jobs import enqueue
+from .summaries import SUMMARY_JOB, previous_summary, schedule_session_summary, unsummarized_chats
+from .context import build_context, load_session
+from .usage import MAX_USAGE_WINDOW_HOURS, USAGE_WINDOW_HOURS, usage_summary
+from . import metrics as prometheus_metrics
+from .profiling import phase, record_phase
+from .authentication import hot_path_authentication_classes, issue_tokens
 from django.utils import timezone
 import logging
 
 logger = logging.getLogger('api.views')
 
+# Most recent sessions returned by GET /api/chat/sessions/
+SESSION_LIST_LIMIT = 50
+
 # Root endpoint
 def index(request):
     """Root endpoint"""
     return HttpResponse("AI Chatbot API is running! Use /api/ endpoints.")
 
+# Prometheus scrape endpoint
+def metrics(request):
+    """Pipeline metrics in the Prometheus text format.
+
+    When ``METRICS_TOKEN`` is set, scrapers must send it as a bearer token.
+    """
+    if not prometheus_metrics.ENABLED:
+        return HttpResponse("Metrics are disabled or prometheus-client is not installed.\n",
+                            status=404, content_type='text/plain')
+    if settings.METRICS_TOKEN:
+        supplied = request.headers.get('Authorization', '').removeprefix('Bearer ').strip()
+        if not constant_time_compare(supplied, settings.METRICS_TOKEN):
+            return HttpResponse("Unauthorized\n", status=401, content_type='text/plain')
+    return HttpResponse(prometheus_metrics.render(), content_type=prometheus_metrics.CONTENT_TYPE)
+
 # Health check
 @api_view(['GET'])
 @permission_classes([AllowAny])
@@ -85,7 +124,7 @@ def signup(request):
         profile = get_or_create_profile(user, default_language=language)
         
         # Generate tokens
-        refresh = RefreshToken.for_user(user)
+        refresh = issue_tokens(user)
         
         return Response({
             'refresh': str(refresh),
@@ -116,7 +155,7 @@ def login(request):
     
     if user:
         profile = get_or_create_profile(user)
-        refresh = RefreshToken.for_user(user)
+        refresh = issue_tokens(user)
         
         return Response({
             'refresh': str(refresh),
@@ -161,36 +200,60 @@ def get_models(request):
             status=status.HTTP_500_INTERNAL_SERVER_ERROR
         )
 
+def cache_bypassed(request):
+    """True when the client asks to skip the response cache (``X-Chat-Cache: bypass``)."""
+    return request.headers.get('X-Chat-Cache', '').strip().lower() == 'bypass'
+
 # Chat endpoints
 @api_view(['POST'])
+@authentication_classes(hot_path_authentication_classes())
 @permission_classes([IsAuthenticated])
 def chat(request):
     """Handle chat requests with AI models"""
     try:
         message = request.data.get('message')
-        model = request.data.get('model', 'grok')
+        model = request.data.get('model', 'auto')
         
         profile = get_or_create_profile(request.user)
         language = profile.language_preference
+        model = ai_service.resolve_model_id(model, language)
+
+        session = context = None
+        if request.data.get('session_id') is not None:
+            session = load_session(request.user.id, request.data['session_id'])
+            if session is None:
+                return Response({'error': 'Session not found'}, status=status.HTTP_404_NOT_FOUND)
+            context = build_context(session, ai_service.context_budget(model, language), message)
         
-        ai_response = ai_service.get_response(model, message, language)
+        with phase('upstream'):
+            result = ai_service.get_result(model, message, language, use_cache=not cache_bypassed(request),
+                                           context=context, user=request.user.id)
+        ai_response = result.content
         
-        chat = Chat.objects.create(
-            user=request.user,
-            model=model,
-            user_message=message,
-            ai_response=ai_response,
-            language=language
-        )
+        with phase('db_write'):
+            chat = Chat.objects.create(
+                user_id=request.user.id,
+                model=model,
+                user_message=message,
+                ai_response=ai_response,
+                language=language,
+                session_id=session['id'] if session else None,
+                **result.chat_fields()
+            )
+            if context and context.overflow:
+                schedule_session_summary(request.user.id, session['id'])
         
         return Response({
             'id': chat.id,
             'message': message,
             'response': ai_response,
             'model': model,
+            'session_id': chat.session_id,
             'timestamp': chat.created_at
         })
         
+    except AdmissionRejected as e:
+        return admission_rejected(e)
     except Exception as e:
         logger.exception("Chat error")
         return Response(
@@ -198,13 +261,174 @@ def chat(request):
             status=status.HTTP_500_INTERNAL_SERVER_ERROR
         )
 
+def admission_rejected(rejection):
+    """503 telling the client when to retry a call shed by admission control."""
+    response = Response(
+        {'error': 'The AI service is busy, please retry shortly', 'retry_after': rejection.retry_after},
+        status=status.HTTP_503_SERVICE_UNAVAILABLE
+    )
+    response['Retry-After'] = str(rejection.retry_after)
+    return response
+
+
+def sse_event(event, data):
+    """Format one Server-Sent Events frame."""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n"
+
+
+def abandoned_result(pending, parts, started: float):
+    """Accounting for a streamed reply the client disconnected from.
+
+    ``pending`` is the result of the stream's ``start`` (or latest
+    ``fallback``) event; tokens are unknown, latency runs until now.
+    """
+    return replace(pending, content=''.join(parts), latency_ms=int((time.monotonic() - started) * 1000))
+
+
+def sse_response(stream):
+    response = StreamingHttpResponse(stream, content_type='text/event-stream; charset=utf-8')
+    response['Cache-Control'] = 'no-cache'
+    # Stop nginx-style proxies from buffering the stream
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+@api_view(['POST'])
+@authentication_classes(hot_path_authentication_classes())
+@permission_classes([IsAuthenticated])
+def chat_stream(request):
+    """Stream the AI reply as Server-Sent Events.
+
+    Emits ``start``, then ``delta`` events carrying text chunks, an optional
+    ``fallback`` event (discard the partial text, the Hugging Face reply
+    follows) and a final ``done`` event with the saved chat id. The Chat row is
+    written exactly once, when the stream completes or the client disconnects.
+    """
+    message = request.data.get('message')
+    model = request.data.get('model', 'auto')
+    user = request.user
+    profile = get_or_create_profile(user)
+    language = profile.language_preference
+    model = ai_service.resolve_model_id(model, language)
+    use_cache = not cache_bypassed(request)
+
+    session = context = None
+    if request.data.get('session_id') is not None:
+        session = load_session(user.id, request.data['session_id'])
+        if session is None:
+            return Response({'error': 'Session not found'}, status=status.HTTP_404_NOT_FOUND)
+        context = build_context(session, ai_service.context_budget(model, language), message)
+    session_id = session['id'] if session else None
+
+    events = ai_service.stream_response(model, message, language, use_cache=use_cache, context=context,
+                                        user=user.id)
+    try:
+        # Waits for admission, so a shed call still gets a plain 503
+        pending = next(events)['result']
+    except AdmissionRejected as e:
+        return admission_rejected(e)
+    started = time.monotonic()
+
+    def event_stream():
+        nonlocal pending
+        parts = []
+        result = None
+        try:
+            yield sse_event('start', {'model': model, 'session_id': session_id})
+            for event in events:
+                if event['type'] == 'result':
+                    result = event['result']
+                elif event['type'] == 'fallback':
+                    parts.clear()
+                    pending = replace(pending, provider=Chat.HUGGINGFACE, fallback_reason=event['fallback_reason'])
+                    yield sse_event('fallback', {'reason': event['reason']})
+                else:
+                    parts.append(event['content'])
+                    yield sse_event('delta', {'content': event['content']})
+        except GeneratorExit:
+            # Client went away: keep what was generated so far
+            partial = abandoned_result(pending, parts, started)
+            Chat.objects.create(user_id=user.id, model=model, user_message=message,
+                                ai_response=partial.content, language=language, session_id=session_id,
+                                **partial.chat_fields())
+            if context and context.overflow:
+                schedule_session_summary(user.id, session_id)
+            raise
+        except Exception:
+            logger.exception("Chat stream error")
+            yield sse_event('error', {'error': 'Internal server error'})
+            return
+        finally:
+            # Ends the upstream call and frees its admission slot right away
+            events.close()
+        if result.latency_ms is not None:
+            record_phase('upstream', result.latency_ms / 1000)
+        with phase('db_write'):
+            chat = Chat.objects.create(user_id=user.id, model=model, user_message=message,
+                                       ai_response=result.content, language=language, session_id=session_id,
+                                       **result.chat_fields())
+            if context and context.overflow:
+                schedule_session_summary(user.id, session_id)
+        yield sse_event('done', {'id': chat.id, 'model': model, 'timestamp': chat.created_at.isoformat()})
+
+    return sse_response(event_stream())
+
+@api_view(['GET', 'POST'])
+@permission_classes([IsAuthenticated])
+def chat_sessions(request):
+    """List the user's recent conversations, or start a new one.
+
+    Pass the new session's id as ``session_id`` to the chat endpoints to have
+    earlier turns of the conversation sent along with each message.
+    """
+    if request.method == 'POST':
+        serializer = ChatSessionSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        serializer.save(user_id=request.user.id)
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+    sessions = ChatSession.objects.filter(user_id=request.user.id).order_by('-updated_at')[:SESSION_LIST_LIMIT]
+    return Response({'results': ChatSessionSerializer(sessions, many=True).data})
+
 @api_view(['GET'])
+@authentication_classes(hot_path_authentication_classes())
 @permission_classes([IsAuthenticated])
+@renderer_classes([FastJSONRenderer, BrowsableAPIRenderer])
 def chat_history(request):
-    """Get user's chat history"""
-    chats = Chat.objects.filter(user=request.user).order_by('-created_at')
-    serializer = ChatSerializer(chats, many=True)
-    return Response(serializer.data)
+    """Get user's chat history, newest first, one cursor page at a time"""
+    paginator = ChatHistoryPagination()
+    rows = Chat.objects.filter(user_id=request.user.id).values(*CHAT_ROW_FIELDS)
+    page = paginator.paginate_queryset(rows, request)
+    return paginator.get_paginated_response(chat_rows(page, request.user.username))
+
+@api_view(['GET'])
+@authentication_classes(hot_path_authentication_classes())
+@permission_classes([IsAuthenticated])
+@renderer_classes([FastJSONRenderer, BrowsableAPIRenderer])
+def chat_search(request):
+    """Full-text search over the user's chats, best matches first.
+
+    Each result is a history row plus its ``score`` and ``highlights``:
+    HTML-escaped snippets of the matching fields with hits in ``<mark>``.
+    """
+    search = ChatSearch(request.user.id, request.query_params.get('q', ''))
+    if not search.terms:
+        return Response(
+            {'error': 'q must contain at least one word'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    paginator = ChatSearchPagination()
+    matches = paginator.paginate_queryset(search, request)
+    rows = Chat.objects.filter(user_id=request.user.id, pk__in=[pk for pk, _ in matches]).values(*CHAT_ROW_FIELDS)
+    by_id = {row['id']: row for row in rows}
+    # Keep the ranking order; ids whose chat is gone are skipped
+    ranked = [(by_id[pk], score) for pk, score in matches if pk in by_id]
+    results = chat_rows([row for row, _ in ranked], request.user.username)
+    for result, (row, score) in zip(results, ranked):
+        result['score'] = round(score, 4)
+        result['highlights'] = highlights(row, search.terms)
+    return paginator.get_paginated_response(results)
 
 @api_view(['DELETE'])
 @permission_classes([IsAuthenticated])
@@ -226,7 +450,7 @@ def delete_chat(request, chat_id):
 def user_profile(request):
     """Get user profile"""
     try:
-        profile = get_or_create_profile(request.user)
+        profile = load_counters(get_or_create_profile(request.user))
         serializer = UserProfileSerializer(profile)
         return Response(serializer.data)
     except Exception as e:
@@ -239,27 +463,29 @@ def user_profile(request):
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def generate_profile_summary(request):
-    """Generate user profile summary"""
+    """Queue a profile summary update; poll the returned status URL for the result.
+
+    Answers 200 with the current summary when no chat is newer than it.
+    """
     try:
         profile = get_or_create_profile(request.user)
-        chats = Chat.objects.filter(user=request.user).order_by('-created_at')[:50]
-        chat_data = [
-            {
-                'user_message': chat.user_message,
-                'ai_response': chat.ai_response
-            }
-            for chat in chats
-        ]
-
-        if not chat_data:
+        if not unsummarized_chats(profile).exists():
+            if previous_summary(profile):
+                # Summary already covers every chat: nothing to queue
+                return Response({
+                    'summary': profile.ai_summary,
+                    'updated_at': profile.summary_updated_at,
+                    'unchanged': True,
+                })
             return Response({'error': 'No chat data to summarize'}, status=status.HTTP_400_BAD_REQUEST)
 
-        summary = ai_service.generate_user_summary(chat_data, profile.language_preference)
-        profile.ai_summary = summary
-        profile.summary_updated_at = timezone.now()
-        profile.save()
-
-        return Response({'summary': summary, 'updated_at': profile.summary_updated_at})
+        job = enqueue(SUMMARY_JOB, request.user.id)
+        status_url = request.build_absolute_uri(reverse('job_status', args=[job.id]))
+        return Response(
+            {**JobSerializer(job).data, 'status_url': status_url},
+            status=status.HTTP_202_ACCEPTED,
+            headers={'Location': status_url},
+        )
     except Exception as e:
         logger.exception("Profile summary error")
         return Response(
@@ -267,6 +493,16 @@ def generate_profile_summary(request):
             status=status.HTTP_500_INTERNAL_SERVER_ERROR
         )
 
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def job_status(request, job_id):
+    """Status, progress and result of one of the user's background jobs"""
+    try:
+        job = Job.objects.get(id=job_id, user_id=request.user.id)
+    except Job.DoesNotExist:
+        return Response({'error': 'Job not found'}, status=status.HTTP_404_NOT_FOUND)
+    return Response(JobSerializer(job).data)
+
 @api_view(['PUT'])
 @permission_classes([IsAuthenticated])
 def update_language(request):
@@ -275,7 +511,7 @@ def update_language(request):
         language = request.data.get('language')
         profile = get_or_create_profile(request.user)
         profile.language_preference = language
-        profile.save()
+        profile.save(update_fields=['language_preference', 'updated_at'])
         return Response({'message': 'Language updated successfully'})
     except Exception as e:
         logger.exception("Language update error")
@@ -285,27 +521,99 @@ def update_language(request):
         )
 
 @api_view(['GET'])
+@authentication_classes(hot_path_authentication_classes())
 @permission_classes([IsAuthenticated])
 def export_history(request):
-    """Export chat history as JSON"""
-    chats = Chat.objects.filter(user=request.user).order_by('-created_at')
-    export_data = [
-        {
-            'date': chat.created_at.isoformat(),
-            'model': chat.model,
-            'user_message': chat.user_message,
-            'ai_response': chat.ai_response,
-            'language': chat.language
-        }
-        for chat in chats
-    ]
+    """Stream chat history as a JSON document, or NDJSON with ?output=ndjson.
+
+    Rows are read in chunks through a server-side cursor and written as they
+    arrive, so memory stays flat for any history size (under ASGI too, where
+    the chunks are served through an async iterator). Add ?compress=gzip to
+    download a gzipped file instead.
+    """
+    output = request.query_params.get('output', 'json')
+    if output not in ('json', 'ndjson'):
+        return Response(
+            {'error': "output must be 'json' or 'ndjson'"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    compress = request.query_params.get('compress') == 'gzip'
+
+    rows = (
+        Chat.objects.filter(user_id=request.user.id)
+        .order_by('-created_at')
+        .values(*EXPORT_FIELDS)
+        .iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    )
+    export = iter_ndjson_export if output == 'ndjson' else iter_json_export
+    stream = export(rows, request.user.username, timezone.now().isoformat())
+    if compress:
+        stream = gzip_stream(stream)
+    if isinstance(request._request, ASGIRequest):
+        stream = aiter_chunks(stream)
+
+    if compress:
+        response = StreamingHttpResponse(stream, content_type='application/gzip')
+        filename = f"chat_history_{timezone.now():%Y%m%d%H%M%S}.{output}.gz"
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    else:
+        content_type = 'application/x-ndjson' if output == 'ndjson' else 'application/json'
+        response = StreamingHttpResponse(stream, content_type=f'{content_type}; charset=utf-8')
+    response['X-Accel-Buffering'] = 'no'
+    return response
+     
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def cache_stats(request):
+    """Response cache and request coalescing counters for monitoring"""
+    stats = ai_service.response_cache.stats()
+    if ai_service.near_duplicates is not None:
+        stats['near_duplicates'] = ai_service.near_duplicates.stats()
+    stats['single_flight'] = ai_service.single_flight.stats()
+    return Response(stats)
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def breaker_stats(request):
+    """Circuit breaker state per provider and per model"""
     return Response({
-        'user': request.user.username,
-        'export_date': timezone.now().isoformat(),
-        'total_chats': len(export_data),
-        'chats': export_data
+        'enabled': ai_service.breakers.enabled,
+        'breakers': ai_service.breakers.snapshot(),
     })
-     
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def admission_stats(request):
+    """Upstream admission slots, tokens, pauses and queue per provider and model"""
+    return Response({
+        'enabled': ai_service.admission.enabled,
+        **ai_service.admission.snapshot(),
+    })
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def hedge_stats(request):
+    """Hedged fallback request and win counters per model"""
+    return Response(ai_service.hedging.stats())
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def usage_stats(request):
+    """Chat volume, upstream latency, token usage and fallbacks per provider and model.
+
+    Covers the last ``?hours=`` hours (default 24).
+    """
+    try:
+        hours = int(request.query_params.get('hours', USAGE_WINDOW_HOURS))
+    except ValueError:
+        hours = 0
+    if not 1 <= hours <= MAX_USAGE_WINDOW_HOURS:
+        return Response(
+            {'error': f'hours must be between 1 and {MAX_USAGE_WINDOW_HOURS}'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    return Response(usage_summary(hours))
+
 # api/views.py - Update api_root function
 @api_view(['GET'])
 @permission_classes([AllowAny])
@@ -328,7 +636,9 @@ def api_root(request):
             },
             "chat": {
                 "send_message": f"{base_url}chat/",
+                "stream_message": f"{base_url}chat/stream/",
                 "get_history": f"{base_url}chat/history/",  # Updated
+                "search_chats": f"{base_url}chat/search/?q=<query>",
                 "delete_chat": f"{base_url}chat/history/<id>/",  # Updated
                 "export_chats": f"{base_url}chat/export/"  # Updated
             },
@@ -343,7 +653,7 @@ def api_root(request):
             "2": "Login: POST /api/auth/login/", 
             "3": "Get models: GET /api/models/",
             "4": "Start chatting: POST /api/chat/",
-            "5": "View history: GET /api/chat/history/"  # Updated
+            "5": "View history: GET /api/chat/history/ (?before=<cursor> for older pages)"  # Updated
         }
     }
     
@@ -5,12 +5,76 @@ It exposes the ASGI callable as a module-level variable named ``application``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/4.2/howto/deployment/asgi/
+
+Run with ASYNC_CHAT_VIEWS=True so the chat endpoints use the async pipeline:
+
+    gunicorn config.asgi:application -k uvicorn.workers.UvicornWorker
 """
 
+import asyncio
+import contextvars
 import os
 
-from django.core.asgi import get_asgi_application
+import django
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIHandler
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
 
-application = get_asgi_application()
+_receive = contextvars.ContextVar('asgi_receive')
+
+
+class DisconnectAwareASGIHandler(ASGIHandler):
+    """Django's ASGI handler, cancelling a streamed response when the client leaves.
+
+    Django 4.2 stops reading from the connection once the request body is in,
+    so a client closing a chat stream goes unnoticed: the server drops the
+    writes while the view keeps the upstream call (and its admission slot)
+    until the model finishes. Here ``http.disconnect`` is watched while a
+    streaming response is sent, and the stream is cancelled like a closed WSGI
+    response, which lets ``chat_stream`` save the partial reply. Django 5.0
+    does this itself; drop the class when upgrading.
+    """
+
+    async def handle(self, scope, receive, send):
+        _receive.set(receive)
+        await super().handle(scope, receive, send)
+
+    async def send_response(self, response, send):
+        if not response.streaming:
+            return await super().send_response(response, send)
+        finished = False
+
+        async def tracking_send(message):
+            nonlocal finished
+            if message['type'] == 'http.response.body' and not message.get('more_body', False):
+                finished = True
+            await send(message)
+
+        sending = asyncio.ensure_future(super().send_response(response, tracking_send))
+        disconnect = asyncio.ensure_future(self._disconnected(_receive.get()))
+        try:
+            await asyncio.wait({sending, disconnect}, return_when=asyncio.FIRST_COMPLETED)
+        except asyncio.CancelledError:
+            sending.cancel()
+            disconnect.cancel()
+            raise
+        if sending.done() or finished:
+            disconnect.cancel()
+            return await sending
+        sending.cancel()
+        try:
+            await sending
+        except asyncio.CancelledError:
+            pass
+        # Django only closes the response (request_finished) after the last chunk
+        await sync_to_async(response.close, thread_sensitive=True)()
+
+    @staticmethod
+    async def _disconnected(receive):
+        while (await receive())['type'] != 'http.disconnect':
+            pass
+
+
+django.setup(set_prefix=False)
+application = DisconnectAwareASGIHandler()
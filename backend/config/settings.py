@@ -13,6 +13,7 @@ https://docs.djangoproject.com/en/4.2/ref/settings/
 from pathlib import Path
 from dotenv import load_dotenv
 import os
+import tempfile
 
 # Load environment variables from .env file
 load_dotenv()
@@ -54,6 +55,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # First, so request latency covers every other middleware
+    'api.metrics.MetricsMiddleware',
+    'api.profiling.ProfilingMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
@@ -85,6 +89,27 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'config.wsgi.application'
 
+# Prometheus metrics at /metrics (needs prometheus-client). Set METRICS_TOKEN
+# to require it as a bearer token from the scraper.
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+
+# Per-request profiling (api.profiling.ProfilingMiddleware): a Server-Timing
+# header with the auth, profile, upstream, db_write and serialize phases and
+# the database time, and a warning on the 'api.profiling' logger, with the
+# slowest queries, for requests taking SLOW_REQUEST_MS or longer. A
+# PROFILE_SAMPLE_RATE share (0-1) of sync requests also runs under cProfile;
+# the stats of those that turn out slow are written to PROFILE_DIR.
+PROFILING_ENABLED = os.getenv('PROFILING_ENABLED', 'True').lower() in ('1', 'true', 'yes')
+SERVER_TIMING_HEADER = os.getenv('SERVER_TIMING_HEADER', 'True').lower() in ('1', 'true', 'yes')
+SLOW_REQUEST_MS = int(os.getenv('SLOW_REQUEST_MS', '3000'))
+SLOW_REQUEST_TOP_QUERIES = int(os.getenv('SLOW_REQUEST_TOP_QUERIES', '5'))
+PROFILE_SAMPLE_RATE = float(os.getenv('PROFILE_SAMPLE_RATE', '0'))
+PROFILE_DIR = os.getenv('PROFILE_DIR', os.path.join(tempfile.gettempdir(), 'ai-chatbot-profiles'))
+
+# Serve /api/chat/ and /api/chat/stream/ from async views.
+# Enable when running under config/asgi.py (e.g. with a uvicorn worker).
+ASYNC_CHAT_VIEWS = os.getenv('ASYNC_CHAT_VIEWS', 'False').lower() in ('1', 'true', 'yes')
+
 
 
 DATABASES = {
@@ -94,6 +119,51 @@ DATABASES = {
     }
 }
 
+# Per-process memory cache by default; set REDIS_URL to share the cache
+# (profile cache, cross-worker request coalescing) between workers
+REDIS_URL = os.getenv('REDIS_URL')
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'ai-chatbot',
+        }
+    }
+
+# Seconds a user's profile stays in the cache. Saves invalidate it, but only
+# in the cache they reach: with the per-process default another worker keeps
+# serving its copy until it expires, so the default TTL there is a few seconds.
+PROFILE_CACHE_TTL = int(os.getenv('PROFILE_CACHE_TTL', '300' if REDIS_URL else '5'))
+
+# Background jobs (api.jobs), run by `manage.py run_jobs`. While no worker
+# heartbeat is fresh, web processes run them on a background thread; JOBS_EAGER
+# runs them inside the request instead, for development and tests.
+JOBS_EAGER = os.getenv('JOBS_EAGER', 'False').lower() in ('1', 'true', 'yes')
+JOB_WORKER_CONCURRENCY = int(os.getenv('JOB_WORKER_CONCURRENCY', '2'))
+JOB_MAX_ATTEMPTS = int(os.getenv('JOB_MAX_ATTEMPTS', '3'))
+# First retry delay in seconds, doubled on every further attempt
+JOB_RETRY_DELAY = int(os.getenv('JOB_RETRY_DELAY', '30'))
+# Running jobs not finished after this many seconds are assumed lost and re-queued
+JOB_STALE_AFTER = int(os.getenv('JOB_STALE_AFTER', '600'))
+# Workers check in this often; one silent for JOB_WORKER_TIMEOUT counts as gone
+JOB_HEARTBEAT_INTERVAL = int(os.getenv('JOB_HEARTBEAT_INTERVAL', '15'))
+JOB_WORKER_TIMEOUT = int(os.getenv('JOB_WORKER_TIMEOUT', '60'))
+# Jobs of a kind allowed to run at once across all workers
+JOB_KIND_LIMITS = {
+    'profile_summary': int(os.getenv('JOB_SUMMARY_CONCURRENCY', '2')),
+    'session_summary': int(os.getenv('JOB_SESSION_SUMMARY_CONCURRENCY', '4')),
+}
+
+# Seconds the admin chat list reuses its usage totals (api.usage)
+USAGE_CACHE_TTL = int(os.getenv('USAGE_CACHE_TTL', '60'))
+
 
 
 AUTH_PASSWORD_VALIDATORS = [
@@ -141,7 +211,7 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # REST Framework configuration
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'api.authentication.JWTAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
@@ -151,6 +221,12 @@ REST_FRAMEWORK = {
 # JWT Settings
 from datetime import timedelta
 
+# Authenticate chat, history and export requests from token claims alone
+# (see api.authentication.StatelessJWTAuthentication). Deactivated users are
+# rejected once their cached state expires, after AUTH_USER_STATE_TTL seconds.
+JWT_STATELESS_AUTH = os.getenv('JWT_STATELESS_AUTH', 'False').lower() in ('1', 'true', 'yes')
+AUTH_USER_STATE_TTL = int(os.getenv('AUTH_USER_STATE_TTL', '60'))
+
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(minutes=60),
     'REFRESH_TOKEN_LIFETIME': timedelta(days=7),
@@ -173,6 +249,10 @@ if _render_host:
 
 CORS_ALLOW_CREDENTIALS = True
 
+# Allow clients to opt out of the response cache per request
+from corsheaders.defaults import default_headers
+CORS_ALLOW_HEADERS = (*default_headers, 'x-chat-cache')
+
 # CSRF settings - FIXED
 CSRF_TRUSTED_ORIGINS = [
     'https://ai-chatbot-project-2-chyi.onrender.com',
@@ -12,6 +12,9 @@ urlpatterns = [
     
     # Health check at root level
     path('health/', views.health_check, name='health_check'),
+
+    # Prometheus scrape target
+    path('metrics', views.metrics, name='metrics'),
     
     # Include all API routes under /api/
     path('api/', include('api.urls')),
@@ -0,0 +1,35 @@
+# gunicorn.conf.py - picked up automatically when gunicorn is started from backend/
+import os
+import glob
+import tempfile
+
+# Workers write Prometheus samples here and /metrics merges them (see api.metrics).
+# Set before the workers fork so every one of them inherits it.
+os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', os.path.join(tempfile.gettempdir(), 'ai-chatbot-metrics'))
+
+
+def on_starting(server):
+    """Start every run with empty metric files."""
+    path = os.environ['PROMETHEUS_MULTIPROC_DIR']
+    os.makedirs(path, exist_ok=True)
+    for stale in glob.glob(os.path.join(path, '*.db')):
+        os.remove(stale)
+
+
+def post_worker_init(worker):
+    """Pre-warm pooled upstream connections once the worker has loaded Django."""
+    if os.getenv('AI_HTTP_PREWARM', 'True').lower() not in ('1', 'true', 'yes'):
+        return
+    try:
+        from api.ai_service import ai_service
+        ai_service.warm_connections()
+    except Exception:
+        worker.log.exception("Failed to pre-warm AI provider connections")
+
+
+def child_exit(server, worker):
+    try:
+        from prometheus_client import multiprocess
+    except ImportError:
+        return
+    multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,5 @@
+"""Offline load testing: a stub AI provider, a settings override and a driver.
+
+Run ``python -m loadtest`` from backend/ to start the stub and the app,
+drive signup -> chat -> history -> export flows and print a JSON report.
+"""
@@ -0,0 +1,114 @@
+"""Run an offline benchmark: stub provider, app server, driver, JSON report.
+
+Starts the stub provider, migrates a throwaway database with
+``loadtest.settings``, serves the app with gunicorn (sync workers, or
+uvicorn workers and the async chat views with ``--server asgi``), drives
+the flows and prints the report. ``--url`` skips the stub and server and
+drives an app that is already running.
+
+    python -m loadtest --users 200 --concurrency 20 --latency-ms 500 --output report.json
+"""
+import os
+import sys
+import time
+import socket
+import shutil
+import argparse
+import tempfile
+import subprocess
+from dataclasses import asdict
+from pathlib import Path
+
+import requests
+
+from . import driver, stub_provider
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+SERVER_START_TIMEOUT = 60
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def _wait_until_up(url: str, server: subprocess.Popen):
+    deadline = time.monotonic() + SERVER_START_TIMEOUT
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise SystemExit(f"App server exited with status {server.returncode}")
+        try:
+            if requests.get(f"{url}/health/", timeout=2).status_code == 200:
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(0.25)
+    raise SystemExit(f"App server did not answer {url}/health/ within {SERVER_START_TIMEOUT}s")
+
+
+def _server_command(args, port: int):
+    command = [sys.executable, '-m', 'gunicorn', '--bind', f'127.0.0.1:{port}',
+               '--workers', str(args.workers), '--timeout', '120']
+    if args.server == 'asgi':
+        return command + ['--worker-class', 'uvicorn.workers.UvicornWorker', 'config.asgi:application']
+    return command + ['--threads', str(args.threads), 'config.wsgi:application']
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--url', help='Drive this running backend instead of starting one')
+    parser.add_argument('--server', choices=['wsgi', 'asgi'], default='wsgi')
+    parser.add_argument('--workers', type=int, default=2, help='gunicorn worker processes')
+    parser.add_argument('--threads', type=int, default=8, help='Threads per sync worker')
+    stub_provider.add_arguments(parser)
+    driver.add_arguments(parser)
+    args = parser.parse_args()
+
+    if args.url:
+        report = driver.run(driver.config_from_args(args, args.url))
+        report['server'] = {'url': args.url}
+        driver.write_report(report, args.output)
+        return
+
+    stub_config = stub_provider.config_from_args(args)
+    stub = stub_provider.start(config=stub_config)
+    stub_url = f'http://127.0.0.1:{stub.server_address[1]}'
+    workdir = tempfile.mkdtemp(prefix='ai-chatbot-loadtest-')
+    db_path = os.path.join(workdir, 'db.sqlite3')
+    env = {
+        **os.environ,
+        'DJANGO_SETTINGS_MODULE': 'loadtest.settings',
+        'LOADTEST_DB': db_path,
+        'OPENROUTER_API_KEY': 'loadtest',
+        'OPENROUTER_API_URL': f'{stub_url}/api/v1/chat/completions',
+        'HUGGINGFACE_API_KEY': 'loadtest',
+        'HUGGINGFACE_API_URL': f'{stub_url}/models/',
+        'ASYNC_CHAT_VIEWS': 'True' if args.server == 'asgi' else 'False',
+    }
+    server = None
+    try:
+        subprocess.run([sys.executable, 'manage.py', 'migrate', '--noinput', '-v0'],
+                       cwd=BACKEND_DIR, env=env, check=True)
+        port = _free_port()
+        url = f'http://127.0.0.1:{port}'
+        server = subprocess.Popen(_server_command(args, port), cwd=BACKEND_DIR, env=env)
+        _wait_until_up(url, server)
+        report = driver.run(driver.config_from_args(args, url))
+    finally:
+        if server is not None:
+            server.terminate()
+            try:
+                server.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                server.kill()
+        stub.shutdown()
+        shutil.rmtree(workdir, ignore_errors=True)
+    report['server'] = {'kind': args.server, 'workers': args.workers,
+                        'threads': args.threads if args.server == 'wsgi' else None}
+    report['stub'] = asdict(stub_config)
+    driver.write_report(report, args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,223 @@
+"""Drive user flows against a running backend and summarize the timings.
+
+Each virtual user signs up, sends ``chats`` messages (a ``stream_share`` of
+them through /api/chat/stream/), reads its history and exports it.
+``concurrency`` users run at a time until ``users`` flows have finished.
+
+    python -m loadtest.driver --url http://127.0.0.1:8000 --users 200 --concurrency 20
+"""
+import json
+import math
+import time
+import uuid
+import random
+import argparse
+import threading
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass
+from typing import Dict, List, Optional
+
+import requests
+
+# Generous, so a slow server shows up as latency rather than as errors
+REQUEST_TIMEOUT = 120
+
+
+@dataclass
+class DriverConfig:
+    url: str = 'http://127.0.0.1:8000'
+    users: int = 50
+    concurrency: int = 10
+    chats: int = 3
+    stream_share: float = 0.5
+    model: str = 'auto'
+    export_output: str = 'ndjson'
+
+
+@dataclass
+class Sample:
+    step: str
+    seconds: float
+    status: int  # 0 when the request itself failed
+    ok: bool
+
+
+def percentile(ordered: List[float], pct: float) -> Optional[float]:
+    """Nearest-rank percentile of an ascending list."""
+    if not ordered:
+        return None
+    return ordered[max(0, math.ceil(pct / 100 * len(ordered)) - 1)]
+
+
+class VirtualUser:
+    def __init__(self, config: DriverConfig, run_id: str, number: int):
+        self.config = config
+        self.api = config.url.rstrip('/') + '/api'
+        self.username = f"lt_{run_id}_{number}"
+        self.session = requests.Session()
+        self.samples: List[Sample] = []
+
+    def _timed(self, step: str, method: str, path: str, ok_status=200, **kwargs) -> Optional[requests.Response]:
+        started = time.perf_counter()
+        try:
+            # Reads the whole body, streamed exports included
+            response = self.session.request(method, self.api + path, timeout=REQUEST_TIMEOUT, **kwargs)
+        except requests.RequestException:
+            self.samples.append(Sample(step, time.perf_counter() - started, 0, False))
+            return None
+        ok = response.status_code == ok_status
+        self.samples.append(Sample(step, time.perf_counter() - started, response.status_code, ok))
+        return response if ok else None
+
+    def signup(self) -> bool:
+        response = self._timed('signup', 'POST', '/auth/signup/', ok_status=201, json={
+            'username': self.username,
+            'email': f"{self.username}@loadtest.example.com",
+            'password': 'LoadTest-Passw0rd!',
+        })
+        if response is None:
+            return False
+        self.session.headers['Authorization'] = f"Bearer {response.json()['access']}"
+        return True
+
+    def _message(self, n: int) -> str:
+        # Unique per user and turn, so replies never come from the response cache
+        return f"Load test question {n} from {self.username}: what is {random.randint(1, 10 ** 6)}?"
+
+    def chat(self, n: int):
+        self._timed('chat', 'POST', '/chat/', json={'message': self._message(n), 'model': self.config.model})
+
+    def chat_stream(self, n: int):
+        started = time.perf_counter()
+        status, ok, first = 0, False, None
+        try:
+            with self.session.post(self.api + '/chat/stream/', stream=True, timeout=REQUEST_TIMEOUT,
+                                   json={'message': self._message(n), 'model': self.config.model}) as response:
+                status = response.status_code
+                for line in response.iter_lines(decode_unicode=True):
+                    if line.startswith('event: '):
+                        event = line[len('event: '):]
+                        if event == 'delta' and first is None:
+                            first = time.perf_counter() - started
+                        elif event == 'done':
+                            ok = status == 200
+                        elif event == 'error':
+                            ok = False
+        except requests.RequestException:
+            ok = False
+        self.samples.append(Sample('chat_stream', time.perf_counter() - started, status, ok))
+        if first is not None:
+            self.samples.append(Sample('chat_stream_first_delta', first, status, True))
+
+    def run(self) -> List[Sample]:
+        try:
+            if not self.signup():
+                return self.samples
+            for n in range(self.config.chats):
+                if random.random() < self.config.stream_share:
+                    self.chat_stream(n)
+                else:
+                    self.chat(n)
+            self._timed('history', 'GET', '/chat/history/')
+            self._timed('export', 'GET', '/chat/export/', params={'output': self.config.export_output})
+            return self.samples
+        finally:
+            self.session.close()
+
+
+def _step_summary(samples: List[Sample], elapsed: float) -> Dict:
+    seconds = sorted(sample.seconds for sample in samples)
+    errors = sum(1 for sample in samples if not sample.ok)
+
+    def ms(value):
+        return None if value is None else round(value * 1000, 1)
+
+    return {
+        'count': len(samples),
+        'errors': errors,
+        'error_rate': round(errors / len(samples), 4) if samples else 0.0,
+        'throughput_rps': round(len(samples) / elapsed, 2) if elapsed else None,
+        'mean_ms': ms(sum(seconds) / len(seconds)) if seconds else None,
+        'p50_ms': ms(percentile(seconds, 50)),
+        'p95_ms': ms(percentile(seconds, 95)),
+        'p99_ms': ms(percentile(seconds, 99)),
+        'max_ms': ms(seconds[-1]) if seconds else None,
+    }
+
+
+def summarize(samples: List[Sample], elapsed: float, config: DriverConfig, flows_completed: int) -> Dict:
+    """JSON-serializable report of one run."""
+    by_step = defaultdict(list)
+    for sample in samples:
+        by_step[sample.step].append(sample)
+    # Time to first delta is a view of chat_stream, not another request
+    requests_made = [sample for sample in samples if sample.step != 'chat_stream_first_delta']
+    return {
+        'config': asdict(config),
+        'elapsed_s': round(elapsed, 3),
+        'flows_completed': flows_completed,
+        'flows_per_s': round(flows_completed / elapsed, 2) if elapsed else None,
+        'overall': _step_summary(requests_made, elapsed),
+        'steps': {step: _step_summary(step_samples, elapsed) for step, step_samples in sorted(by_step.items())},
+        'status_codes': dict(sorted(Counter(str(sample.status) for sample in requests_made).items())),
+    }
+
+
+def run(config: DriverConfig) -> Dict:
+    """Run ``config.users`` flows and return the report."""
+    run_id = uuid.uuid4().hex[:8]
+    samples: List[Sample] = []
+    lock = threading.Lock()
+    completed = 0
+
+    def flow(number: int):
+        nonlocal completed
+        user_samples = VirtualUser(config, run_id, number).run()
+        with lock:
+            samples.extend(user_samples)
+            if user_samples and all(sample.ok for sample in user_samples):
+                completed += 1
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=config.concurrency, thread_name_prefix='vuser') as pool:
+        list(pool.map(flow, range(config.users)))
+    return summarize(samples, time.perf_counter() - started, config, completed)
+
+
+def add_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument('--users', type=int, default=50, help='Flows to run in total')
+    parser.add_argument('--concurrency', type=int, default=10, help='Flows running at once')
+    parser.add_argument('--chats', type=int, default=3, help='Messages per flow')
+    parser.add_argument('--stream-share', type=float, default=0.5, help='Share of messages sent as streams (0-1)')
+    parser.add_argument('--model', default='auto')
+    parser.add_argument('--export-output', choices=['json', 'ndjson'], default='ndjson')
+    parser.add_argument('--output', help='Write the JSON report here instead of stdout')
+
+
+def config_from_args(args, url: str) -> DriverConfig:
+    return DriverConfig(
+        url=url, users=args.users, concurrency=args.concurrency, chats=args.chats,
+        stream_share=args.stream_share, model=args.model, export_output=args.export_output,
+    )
+
+
+def write_report(report: Dict, output: Optional[str]):
+    text = json.dumps(report, indent=2)
+    if output:
+        with open(output, 'w', encoding='utf-8') as handle:
+            handle.write(text + '\n')
+    else:
+        print(text)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--url', default='http://127.0.0.1:8000', help='Backend base URL')
+    add_arguments(parser)
+    args = parser.parse_args()
+    write_report(run(config_from_args(args, args.url)), args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,32 @@
+"""Settings for load-test runs: the project settings on a throwaway database.
+
+Provider URLs and keys come from the environment that ``python -m loadtest``
+sets up. Point ``LOADTEST_DATABASE_URL`` at PostgreSQL to benchmark the
+production database instead of SQLite.
+"""
+import os
+import tempfile
+
+import dj_database_url
+
+from config.settings import *  # noqa: F401,F403
+from config.settings import LOGGING
+
+DEBUG = False
+ALLOWED_HOSTS = ['*']
+
+_db_url = os.getenv('LOADTEST_DATABASE_URL') or (
+    'sqlite:///' + os.getenv('LOADTEST_DB', os.path.join(tempfile.gettempdir(), 'ai-chatbot-loadtest.sqlite3'))
+)
+DATABASES = {'default': dj_database_url.parse(_db_url, conn_max_age=60)}
+if DATABASES['default']['ENGINE'].endswith('sqlite3'):
+    # Concurrent writers queue on SQLite's lock instead of failing after 5s
+    DATABASES['default']['OPTIONS'] = {'timeout': 30}
+
+# Signup would otherwise measure PBKDF2 rather than the app
+PASSWORD_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+
+# Every chat of a run would be a "slow request" against the stub latency
+SLOW_REQUEST_MS = int(os.getenv('SLOW_REQUEST_MS', '60000'))
+
+LOGGING['loggers']['api']['level'] = os.getenv('LOADTEST_LOG_LEVEL', 'WARNING')
@@ -0,0 +1,167 @@
+"""Local stand-in for OpenRouter and Hugging Face inference.
+
+Speaks just enough of both protocols for ``api.ai_service``:
+
+- ``POST <anything>`` with ``messages``: OpenRouter chat completions, as JSON
+  or, with ``"stream": true``, as Server-Sent Events ending in a usage chunk
+  and ``[DONE]``
+- ``POST /models/<repo>`` with ``inputs``: HF inference,
+  ``[{"generated_text": ...}]``
+- ``HEAD``: answered empty (connection pre-warming)
+
+Replies take ``latency_ms`` +/- ``jitter_ms``. Streams spread that over
+``chunks`` deltas. An ``error_rate`` share of OpenRouter calls fail with
+``error_status``; HF calls never fail, so fallbacks succeed.
+
+    python -m loadtest.stub_provider --port 8765 --latency-ms 400 --error-rate 0.02
+"""
+import json
+import random
+import argparse
+import threading
+import time
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+@dataclass
+class StubConfig:
+    latency_ms: float = 300.0
+    jitter_ms: float = 50.0
+    error_rate: float = 0.0
+    error_status: int = 503
+    chunks: int = 20
+    completion_words: int = 60
+
+    def latency(self) -> float:
+        """One reply's latency in seconds."""
+        jitter = random.uniform(-self.jitter_ms, self.jitter_ms) if self.jitter_ms else 0.0
+        return max(0.0, self.latency_ms + jitter) / 1000
+
+
+def _reply_words(prompt: str, count: int):
+    seed = prompt.split()[-1] if prompt.split() else 'stub'
+    return [f"{seed}-{n}" for n in range(count)]
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # Flush every SSE chunk as soon as it is written
+    disable_nagle_algorithm = True
+    config = StubConfig()
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_HEAD(self):
+        self.send_response(200)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        try:
+            body = json.loads(self.rfile.read(length) or b'{}')
+        except ValueError:
+            return self._json(400, {'error': 'invalid JSON'})
+        if self.path.startswith('/models/') or 'inputs' in body:
+            return self._huggingface(body)
+        return self._openrouter(body)
+
+    def _json(self, status_code: int, data):
+        payload = json.dumps(data).encode()
+        self.send_response(status_code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _huggingface(self, body):
+        time.sleep(self.config.latency())
+        words = _reply_words(body.get('inputs', ''), self.config.completion_words)
+        self._json(200, [{'generated_text': ' '.join(words)}])
+
+    def _openrouter(self, body):
+        config = self.config
+        messages = body.get('messages') or [{}]
+        prompt = messages[-1].get('content') or ''
+        words = _reply_words(prompt, config.completion_words)
+        usage = {'prompt_tokens': sum(len((m.get('content') or '').split()) for m in messages),
+                 'completion_tokens': len(words)}
+        if random.random() < config.error_rate:
+            time.sleep(config.latency() / 4)
+            return self._json(config.error_status, {'error': {'message': 'stub provider error'}})
+        if not body.get('stream'):
+            time.sleep(config.latency())
+            return self._json(200, {
+                'model': body.get('model'),
+                'choices': [{'message': {'role': 'assistant', 'content': ' '.join(words)}}],
+                'usage': usage,
+            })
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Cache-Control', 'no-cache')
+        self.send_header('Connection', 'close')
+        self.end_headers()
+        chunks = max(1, config.chunks)
+        per_chunk = -(-len(words) // chunks)
+        pause = config.latency() / chunks
+        for start in range(0, len(words), per_chunk):
+            time.sleep(pause)
+            delta = ' '.join(words[start:start + per_chunk]) + ' '
+            self._event({'choices': [{'delta': {'content': delta}}]})
+        self._event({'choices': [], 'usage': usage})
+        self.wfile.write(b'data: [DONE]\n\n')
+        self.wfile.flush()
+        self.close_connection = True
+
+    def _event(self, data):
+        self.wfile.write(f"data: {json.dumps(data)}\n\n".encode())
+        self.wfile.flush()
+
+
+def start(host: str = '127.0.0.1', port: int = 0, config: StubConfig = None) -> ThreadingHTTPServer:
+    """Serve the stub on a daemon thread; ``port=0`` picks a free port."""
+    handler = type('ConfiguredStubHandler', (StubHandler,), {'config': config or StubConfig()})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='stub-provider', daemon=True).start()
+    return server
+
+
+def add_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument('--latency-ms', type=float, default=300.0, help='Mean reply latency')
+    parser.add_argument('--jitter-ms', type=float, default=50.0, help='Uniform +/- jitter on the latency')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Share of OpenRouter calls that fail (0-1)')
+    parser.add_argument('--error-status', type=int, default=503, help='HTTP status of the failures')
+    parser.add_argument('--chunks', type=int, default=20, help='Deltas per streamed reply')
+    parser.add_argument('--completion-words', type=int, default=60, help='Words per reply')
+
+
+def config_from_args(args) -> StubConfig:
+    return StubConfig(
+        latency_ms=args.latency_ms, jitter_ms=args.jitter_ms, error_rate=args.error_rate,
+        error_status=args.error_status, chunks=args.chunks, completion_words=args.completion_words,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    add_arguments(parser)
+    args = parser.parse_args()
+    server = start(args.host, args.port, config_from_args(args))
+    host, port = server.server_address[:2]
+    print(f"Stub provider on http://{host}:{port} "
+          f"(OPENROUTER_API_URL=http://{host}:{port}/api/v1/chat/completions "
+          f"HUGGINGFACE_API_URL=http://{host}:{port}/models/)")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -13,6 +13,8 @@ const ChatHistory = () => {
   const { t, i18n } = useTranslation();
   const [chats, setChats] = useState([]);
   const [loading, setLoading] = useState(true);
+  const [nextPage, setNextPage] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [selectedChat, setSelectedChat] = useState(null);
   const isRTL = i18n.language === 'ar';
 
@@ -26,7 +28,8 @@ const ChatHistory = () => {
       const response = await api.get('/api/chat/history/', {
         headers: { 'Authorization': `Bearer ${token}` }
       });
-      setChats(response.data);
+      setChats(response.data.results);
+      setNextPage(response.data.next);
     } catch (error) {
       console.error('Error fetching history:', error);
     } finally {
@@ -34,6 +37,24 @@ const ChatHistory = () => {
     }
   };
 
+  // The history endpoint is cursor-paginated; "next" points at older chats
+  const loadMore = async () => {
+    if (!nextPage || loadingMore) return;
+    setLoadingMore(true);
+    try {
+      const token = localStorage.getItem('token');
+      const response = await api.get(nextPage, {
+        headers: { 'Authorization': `Bearer ${token}` }
+      });
+      setChats(prev => [...prev, ...response.data.results]);
+      setNextPage(response.data.next);
+    } catch (error) {
+      console.error('Error fetching history:', error);
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   const deleteChat = async (chatId) => {
     if (!window.confirm(t('history.delete_confirm'))) return;
 
@@ -67,12 +88,24 @@ const ChatHistory = () => {
         ) : (
           <div className="chat-history-grid">
             {/* Chat List */}
-            <ChatList
-              chats={chats}
-              selectedChatId={selectedChat?.id}
-              onSelect={setSelectedChat}
-              onDelete={deleteChat}
-            />
+            <div>
+              <ChatList
+                chats={chats}
+                selectedChatId={selectedChat?.id}
+                onSelect={setSelectedChat}
+                onDelete={deleteChat}
+              />
+              {nextPage && (
+                <button
+                  type="button"
+                  className="chat-history-load-more"
+                  onClick={loadMore}
+                  disabled={loadingMore}
+                >
+                  {t('history.load_more')}
+                </button>
+              )}
+            </div>
 
             {/* Chat Detail */}
             <div className="chat-detail">
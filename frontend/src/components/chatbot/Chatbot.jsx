@@ -28,6 +28,45 @@ const ChatBot = () => {
     }
   };
 
+  const getSessionStorageKey = () => {
+    try {
+      const user = JSON.parse(localStorage.getItem('user') || '{}');
+      const ns = user?.username || user?.email || 'guest';
+      return `chat_session_${ns}`;
+    } catch {
+      return 'chat_session_guest';
+    }
+  };
+
+  // The server keeps the conversation context for a session; start one on the first message
+  const getSessionId = async (title) => {
+    const stored = localStorage.getItem(getSessionStorageKey());
+    if (stored) return Number(stored);
+    const response = await api.post('/api/chat/sessions/', { title: title.slice(0, 50) });
+    localStorage.setItem(getSessionStorageKey(), String(response.data.id));
+    return response.data.id;
+  };
+
+  const postChat = async (message) => {
+    const sessionId = await getSessionId(message);
+    try {
+      return await api.post('/api/chat/', {
+        message,
+        model: selectedModel,
+        session_id: sessionId
+      });
+    } catch (error) {
+      if (error.response?.status !== 404) throw error;
+      // The stored session was deleted; start a new one
+      localStorage.removeItem(getSessionStorageKey());
+      return api.post('/api/chat/', {
+        message,
+        model: selectedModel,
+        session_id: await getSessionId(message)
+      });
+    }
+  };
+
   const tryParseMessages = (raw) => {
     try {
       const parsed = JSON.parse(raw);
@@ -122,10 +161,7 @@ const ChatBot = () => {
     setLoading(true);
 
     try {
-      const response = await api.post('/api/chat/', {
-        message: input,
-        model: selectedModel
-      });
+      const response = await postChat(input);
 
       const aiMessage = {
         role: 'assistant',
@@ -1,4 +1,4 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import { useTranslation } from 'react-i18next';
 import { User, Calendar, MessageSquare, Globe, Sparkles, Download, FileText, FileDown, RefreshCcw } from 'lucide-react';
 //import axios from 'axios';
@@ -11,10 +11,13 @@ export const UserProfile = () => {
   const [profile, setProfile] = useState(null);
   const [loading, setLoading] = useState(true);
   const [regenerating, setRegenerating] = useState(false);
+  const [summaryProgress, setSummaryProgress] = useState(0);
+  const pollTimer = useRef(null);
   const isRTL = i18n.language === 'ar';
 
   useEffect(() => {
     fetchProfile();
+    return () => clearTimeout(pollTimer.current);
   }, []);
 
   const fetchProfile = async () => {
@@ -31,17 +34,45 @@ export const UserProfile = () => {
     }
   };
 
+  // Summaries run as background jobs: queue one, then poll its status
+  const pollSummaryJob = async (statusUrl) => {
+    try {
+      const token = localStorage.getItem('token');
+      const { data: job } = await api.get(statusUrl, {
+        headers: { 'Authorization': `Bearer ${token}` }
+      });
+      setSummaryProgress(job.progress);
+      if (job.status === 'queued' || job.status === 'running') {
+        pollTimer.current = setTimeout(() => pollSummaryJob(statusUrl), 2000);
+        return;
+      }
+      if (job.status === 'failed') {
+        console.error('Summary generation failed:', job.error);
+      }
+      await fetchProfile();
+    } catch (error) {
+      console.error('Error checking summary status:', error);
+    }
+    setRegenerating(false);
+  };
+
   const regenerateSummary = async () => {
     try {
       setRegenerating(true);
+      setSummaryProgress(0);
       const token = localStorage.getItem('token');
-      await api.post('/api/user/profile/generate-summary/', {}, {
+      const response = await api.post('/api/user/profile/generate-summary/', {}, {
         headers: { 'Authorization': `Bearer ${token}` }
       });
+      if (response.status === 202) {
+        pollSummaryJob(`/api/jobs/${response.data.id}/`);
+        return;
+      }
+      // No new chats since the last summary
       await fetchProfile();
+      setRegenerating(false);
     } catch (error) {
       console.error('Error generating summary:', error);
-    } finally {
       setRegenerating(false);
     }
   };
@@ -284,7 +315,7 @@ export const UserProfile = () => {
             </h2>
             <button className="export-button" onClick={regenerateSummary} disabled={regenerating} style={{ marginLeft: 'auto', opacity: regenerating ? 0.7 : 1, cursor: regenerating ? 'not-allowed' : 'pointer' }}>
               <RefreshCcw size={18} className="export-button-icon" />
-              <span>{regenerating ? (t('common.loading') || 'Loading...') : (t('common.refresh') || 'Regenerate')}</span>
+              <span>{regenerating ? `${t('profile.ai_summary_loading')} ${summaryProgress}%` : (t('common.refresh') || 'Regenerate')}</span>
             </button>
           </div>
           
@@ -73,6 +73,10 @@ python manage.py runserver 8000 &
 BACKEND_PID=$!
 echo "Backend running on http://127.0.0.1:8000 (PID: $BACKEND_PID)"
 
+# Background job worker (profile summaries)
+python manage.py run_jobs &
+WORKER_PID=$!
+
 # Move to frontend
 cd ../frontend
 
@@ -104,5 +108,5 @@ echo -e "${YELLOW}Press Ctrl+C to stop all servers${NC}"
 echo ""
 
 # Wait for Ctrl+C
-trap "echo ''; echo 'Shutting down...'; kill $BACKEND_PID $FRONTEND_PID; exit" INT
+trap "echo ''; echo 'Shutting down...'; kill $BACKEND_PID $WORKER_PID $FRONTEND_PID; exit" INT
 wait
\ No newline at end of file